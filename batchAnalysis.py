@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Parallel Batch Analysis of Ride Logs
+
+Decodes a directory (or glob) of ride logs in a process pool. Every worker
+decodes one ride into its own BLEMessageAnalyzer, optionally writes the
+per ride CSV export and plot images, and hands back the analyzer's mergeable partial results:
+streaming statistics per data key, data type counters and, on request, the
+decoded columns. The parent merges them in file order into one fleet level
+summary. Rides are independent, so throughput scales with the number of cores.
+
+Both extracted _hex.txt files and raw nRF Connect logs are accepted; files
+ending in _hex.txt are read as extracted hex, anything else goes through the
+single pass pipeline of blePipeline. With NumPy installed the varint frames
+of a _hex.txt ride are batch decoded (vectorDecoder.load_batched) unless the
+message log is needed for an export.
+
+Usage:
+    python batchAnalysis.py logs_dir_or_glob [--jobs N] [--export-dir DIR] [--plot-dir DIR] [--columns]
+
+Example:
+    python batchAnalysis.py "logs/*_hex.txt" --jobs 8 --export-dir exports --plot-dir plots
+"""
+
+import argparse
+import contextlib
+import glob
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from hexAnalyser import BLEMessageAnalyzer, iter_hex_file
+from blePipeline import run_pipeline
+from columnStore import ColumnStore
+from vectorDecoder import can_load, load_batched
+
+
+def find_logs(pattern):
+    """Return the sorted log files of a directory or glob pattern"""
+    if os.path.isdir(pattern):
+        pattern = os.path.join(pattern, '*.txt')
+    return sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+
+
+def export_name(path, export_dir):
+    """Per ride export file, <export_dir>/<log name>_analyzed.csv"""
+    base_name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(export_dir, f"{base_name}_analyzed.csv")
+
+
+def plot_dir_name(path, plot_dir):
+    """Per ride plot directory, <plot_dir>/<log name>"""
+    return os.path.join(plot_dir, os.path.splitext(os.path.basename(path))[0])
+
+
+def analyse_ride(path, export_dir=None, keep_columns=False, plot_dir=None, plot_format='png', keep_raw=True):
+    """
+    Decode one ride log. Runs inside a worker process.
+
+    Args:
+        path: _hex.txt file or raw nRF Connect log
+        export_dir: If given, write the ride's CSV export there
+        keep_columns: Return the decoded columns, not only statistics and counters
+        plot_dir: If given, render the ride's plots into a subdirectory of it
+        keep_raw: With keep_columns also keep the message log and raw frames,
+            False returns the series only (e.g. for rideDatabase)
+
+    Returns:
+        tuple: (path, BLEMessageAnalyzer or None, error message or None)
+    """
+    analyzer = BLEMessageAnalyzer(keep_raw, keep_rows=export_dir is not None or (keep_columns and keep_raw))
+    try:
+        # keep the workers quiet
+        with contextlib.redirect_stdout(io.StringIO()):
+            if path.endswith('_hex.txt'):
+                with open(path, 'r') as f:
+                    if can_load(analyzer):
+                        load_batched(analyzer, iter_hex_file(f))
+                    else:
+                        analyzer.load_records(iter_hex_file(f))
+            else:
+                run_pipeline(path, analyzer, jobs=1)   # rides already run in parallel
+            if export_dir is not None:
+                analyzer.export_csv(export_name(path, export_dir))
+            if plot_dir is not None:
+                analyzer.render_plots(plot_dir_name(path, plot_dir), plot_format, jobs=1)
+    except Exception as e:
+        return path, None, str(e)
+    if not keep_columns:
+        analyzer.store = ColumnStore(keep_raw=False)
+    return path, analyzer, None
+
+
+def _analyse_ride_args(args):
+    return analyse_ride(*args)
+
+
+def analyse_rides(paths, jobs=None, export_dir=None, keep_columns=False, plot_dir=None, plot_format='png'):
+    """
+    Decode rides in parallel and merge their partial results in file order.
+
+    Args:
+        paths: Ride log files
+        jobs: Worker processes, defaults to the number of CPUs
+        export_dir: If given, every worker writes its ride's CSV export there
+        keep_columns: Also merge the decoded columns, needs memory for all rides
+        plot_dir: If given, every worker renders its ride's plots into <plot_dir>/<log name>
+        plot_format: 'png' or 'svg'
+
+    Returns:
+        tuple: (merged BLEMessageAnalyzer, {path: error message} of failed rides)
+    """
+    if export_dir is not None:
+        os.makedirs(export_dir, exist_ok=True)
+    fleet = BLEMessageAnalyzer(keep_rows=keep_columns)
+    errors = {}
+    tasks = [(path, export_dir, keep_columns, plot_dir, plot_format) for path in paths]
+    if jobs == 1 or len(tasks) <= 1:
+        _merge_results(fleet, map(_analyse_ride_args, tasks), errors)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            _merge_results(fleet, executor.map(_analyse_ride_args, tasks), errors)
+    return fleet, errors
+
+
+def _merge_results(fleet, results, errors):
+    for path, analyzer, error in results:
+        if error is not None:
+            errors[path] = error
+            print(f"Error processing {path}: {error}")
+            continue
+        fleet.merge(analyzer, new_ride=True)
+        print(f"Merged {path}: {sum(analyzer.data_types.values())} values")
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Decode many ride logs in parallel")
+    parser.add_argument('logs', help="directory of logs or glob pattern, e.g. 'logs/*_hex.txt'")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--export-dir', default=None, help="write a CSV export per ride into this directory")
+    parser.add_argument('--plot-dir', default=None, help="render the plots of every ride into this directory")
+    parser.add_argument('--plot-format', choices=('png', 'svg'), default='png', help="image format for --plot-dir")
+    parser.add_argument('--columns', action='store_true', help="merge decoded columns, not only statistics")
+    args = parser.parse_args()
+
+    paths = find_logs(args.logs)
+    if not paths:
+        print(f"Error: No log files found for '{args.logs}'")
+        raise SystemExit(1)
+
+    print(f"Analysing {len(paths)} rides")
+    print("-" * 50)
+    fleet, errors = analyse_rides(paths, args.jobs, args.export_dir, args.columns,
+                                  args.plot_dir, args.plot_format)
+    print()
+    fleet.print_summary()
+    if errors:
+        print(f"\n✗ {len(errors)} of {len(paths)} rides failed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+#!/usr/bin/env python3
+"""
+Benchmarks of the Extractor and Analyzer
+
+Measures how the tools scale on synthetic logs from logGenerator. For every
+size (number of 0x30 frames) and benchmark it reports frames/s, MB/s of the
+input (of the output for export_csv) and the peak RSS of the process:
+
+    extract_hex_messages    nRF Connect log -> _hex.txt, one process
+    decode_line             hex line -> decoded frames (the parse_hex_data and
+                            parse_message of the original analyzer, which
+                            decode_line replaced)
+    add_data                hex line -> decoded columns
+    add_data_reference      the same with hexAnalyser.py of a git revision,
+                            by default the first commit (string parser, lists)
+    export_csv              decoded columns -> CSV
+
+Every benchmark runs in a fresh process, so the peak RSS is its own. The
+generated logs are kept in the work directory and reused. Sizes default to
+10k and 1M frames, --large adds a 50M frame run (several GB of logs, opt-in).
+Results can be saved as a baseline (JSON, benchmarks/baseline.json, not
+tracked by git); later runs are compared with it and a benchmark more than
+--tolerance slower than its baseline is a regression (exit code 1).
+Baselines are per machine, save one before changing the code. This is a
+plain script rather than a pytest-benchmark or asv suite, neither is a
+dependency of the repo; each bench_* function is one such benchmark. add_data is
+also compared with add_data_reference of the same run, so the ingest path
+can be checked against the original code without a saved baseline.
+
+Usage:
+    python benchmark.py [--sizes 10k,1M] [--large] [--only add_data,export_csv] [--save] [--baseline FILE]
+                        [--reference REV]
+
+Example output:
+    add_data                  1M   2.41 s    415k frames/s   10.2 MB/s   RSS 310 MB   +3% vs baseline
+    add_data_reference        1M   3.12 s    321k frames/s    7.9 MB/s   RSS 420 MB
+    add_data                  1M   -23% vs reference
+"""
+
+import argparse
+import contextlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import types
+
+try:
+    import resource
+except ImportError:         # Windows
+    resource = None
+
+from logGenerator import write_nrf_log, write_hex_log
+
+BENCHMARKS = ('extract_hex_messages', 'decode_line', 'add_data', 'add_data_reference', 'export_csv')
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks', 'baseline.json')
+WORK_DIR = os.path.join(tempfile.gettempdir(), 'bosch-ble-bench')
+TOLERANCE = 0.2
+SIZES = '10k,1M'
+LARGE_SIZE = '50M'
+SEED = 1
+
+
+def parse_size(text):
+    """'10k' -> 10000, '1M' -> 1000000"""
+    factor = {'k': 1000, 'M': 1000000, 'G': 1000000000}.get(text[-1], 1)
+    return int(float(text.rstrip('kMG')) * factor)
+
+
+def format_size(frames):
+    for unit, factor in (('G', 1000000000), ('M', 1000000), ('k', 1000)):
+        if frames >= factor and frames % factor == 0:
+            return f"{frames // factor}{unit}"
+    return str(frames)
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB, None where unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def prepare_logs(frames, work_dir=WORK_DIR):
+    """Generate (or reuse) the nRF Connect log and _hex.txt file of a size"""
+    os.makedirs(work_dir, exist_ok=True)
+    base = os.path.join(work_dir, f"ride_{format_size(frames)}_s{SEED}")
+    nrf_log, hex_log = base + '.txt', base + '_hex.txt'
+    if not os.path.exists(nrf_log):
+        write_nrf_log(nrf_log + '.tmp', frames, SEED)
+        os.replace(nrf_log + '.tmp', nrf_log)
+    if not os.path.exists(hex_log):
+        write_hex_log(hex_log + '.tmp', frames, SEED)
+        os.replace(hex_log + '.tmp', hex_log)
+    return nrf_log, hex_log
+
+
+def _hex_lines(hex_log):
+    """Hex data of the _hex.txt lines"""
+    with open(hex_log, 'r') as f:
+        for line in f:
+            yield line.split(', ', 1)[1].rstrip('\n')
+
+
+def bench_extract_hex_messages(nrf_log, hex_log, work_dir):
+    from hexExtractor import extract_hex_messages
+    output = os.path.join(work_dir, 'extracted_hex.txt')
+    start = time.perf_counter()
+    extract_hex_messages(nrf_log, output, quiet=True, jobs=1)
+    elapsed = time.perf_counter() - start
+    os.remove(output)
+    return elapsed, os.path.getsize(nrf_log)
+
+
+def bench_decode_line(nrf_log, hex_log, work_dir):
+    from hexAnalyser import BLEMessageAnalyzer
+    analyzer = BLEMessageAnalyzer(keep_raw=False)
+    start = time.perf_counter()
+    for hex_data in _hex_lines(hex_log):
+        analyzer.decode_line(hex_data)
+    return time.perf_counter() - start, os.path.getsize(hex_log)
+
+
+def bench_add_data(nrf_log, hex_log, work_dir):
+    from hexAnalyser import BLEMessageAnalyzer, iter_hex_file
+    analyzer = BLEMessageAnalyzer()
+    with open(hex_log, 'r') as f:
+        start = time.perf_counter()
+        for _, tt, hex_data in iter_hex_file(f):
+            analyzer.add_data(hex_data, tt)
+        elapsed = time.perf_counter() - start
+    return elapsed, os.path.getsize(hex_log)
+
+
+def load_reference(rev=None):
+    """
+    hexAnalyser.py of a git revision as module, rev None for the first commit.
+
+    The reference runs against today's tree, so revisions whose analyzer
+    imports modules that changed since may not load.
+    """
+    root = os.path.dirname(os.path.abspath(__file__))
+    if rev is None:
+        rev = subprocess.check_output(['git', 'rev-list', '--max-parents=0', 'HEAD'], cwd=root, text=True).split()[0]
+    source = subprocess.check_output(['git', 'show', f"{rev}:hexAnalyser.py"], cwd=root, text=True)
+    module = types.ModuleType('hexAnalyser_reference')
+    exec(compile(source, f"{rev}:hexAnalyser.py", 'exec'), module.__dict__)
+    return module
+
+
+def bench_add_data_reference(nrf_log, hex_log, work_dir, reference=None):
+    from hexAnalyser import iter_hex_file
+    analyzer = load_reference(reference).BLEMessageAnalyzer()
+    with open(hex_log, 'r') as f:
+        start = time.perf_counter()
+        # the first analyzer takes no notification times
+        for _, tt, hex_data in iter_hex_file(f):
+            analyzer.add_data(hex_data)
+        elapsed = time.perf_counter() - start
+    return elapsed, os.path.getsize(hex_log)
+
+
+def bench_export_csv(nrf_log, hex_log, work_dir):
+    from hexAnalyser import BLEMessageAnalyzer, iter_hex_file
+    analyzer = BLEMessageAnalyzer(keep_rows=True)
+    with open(hex_log, 'r') as f:
+        analyzer.load_records(iter_hex_file(f))
+    output = os.path.join(work_dir, 'export.csv')
+    start = time.perf_counter()
+    analyzer.export_csv(output)
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(output)
+    os.remove(output)
+    return elapsed, size
+
+
+def run_one(name, frames, work_dir, reference=None):
+    """Run one benchmark in this process; returns its result dict"""
+    nrf_log, hex_log = prepare_logs(frames, work_dir)
+    bench = globals()['bench_' + name]
+    args = (nrf_log, hex_log, work_dir) + ((reference,) if name == 'add_data_reference' else ())
+    # the reference analyzer prints per array value, keep the output readable
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        elapsed, size = bench(*args)
+    return {
+        'seconds': elapsed,
+        'frames_per_s': frames / elapsed,
+        'mb_per_s': size / elapsed / 1e6,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def run_benchmarks(sizes, names=BENCHMARKS, work_dir=WORK_DIR, reference=None):
+    """
+    Run every benchmark at every size, each in a fresh process.
+
+    Returns:
+        dict: {'<name>@<size>': result dict}
+    """
+    results = {}
+    context = multiprocessing.get_context('spawn')
+    for frames in sizes:
+        prepare_logs(frames, work_dir)
+        for name in names:
+            with context.Pool(1) as pool:
+                results[f"{name}@{format_size(frames)}"] = pool.apply(run_one, (name, frames, work_dir, reference))
+    return results
+
+
+def machine_info():
+    return {'python': platform.python_version(), 'machine': platform.machine(),
+            'processor': platform.processor(), 'system': platform.system()}
+
+
+def load_baseline(filename):
+    try:
+        with open(filename, 'r') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_baseline(filename, results):
+    os.makedirs(os.path.dirname(os.path.abspath(filename)), exist_ok=True)
+    with open(filename, 'w') as f:
+        json.dump({'machine': machine_info(), 'results': results}, f, indent=2, sort_keys=True)
+    print(f"Baseline saved to {filename}")
+
+
+def print_results(results, baseline=None, tolerance=TOLERANCE):
+    """Print a table of results; returns the keys that regressed against the baseline or their reference"""
+    regressions = []
+    previous = baseline['results'] if baseline else {}
+    for key, result in results.items():
+        name, size = key.split('@')
+        rss = result['peak_rss_mb']
+        line = (f"{name:<22} {size:>5} {result['seconds']:>8.2f} s {result['frames_per_s'] / 1000:>9.0f}k frames/s "
+                f"{result['mb_per_s']:>7.1f} MB/s   RSS {'?' if rss is None else f'{rss:.0f}'} MB")
+        if key in previous:
+            change = result['seconds'] / previous[key]['seconds'] - 1
+            line += f"   {change:+.0%} vs baseline"
+            if change > tolerance:
+                line += "  REGRESSION"
+                regressions.append(key)
+        print(line)
+    for key, result in results.items():
+        name, size = key.split('@')
+        reference = results.get(f"{name}_reference@{size}")
+        if reference is not None:
+            change = result['seconds'] / reference['seconds'] - 1
+            line = f"{name:<22} {size:>5}   {change:+.0%} vs reference"
+            if change > tolerance:
+                line += "  REGRESSION"
+                regressions.append(key)
+            print(line)
+    return regressions
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Benchmark extractor and analyzer on synthetic logs")
+    parser.add_argument('--sizes', default=SIZES, help=f"frame counts, e.g. 10k,1M (default {SIZES})")
+    parser.add_argument('--large', action='store_true', help=f"also run {LARGE_SIZE} frames")
+    parser.add_argument('--only', default=None, help=f"comma separated benchmarks of {', '.join(BENCHMARKS)}")
+    parser.add_argument('--baseline', default=BASELINE_FILE, help="baseline JSON file")
+    parser.add_argument('--save', action='store_true', help="save the results as the new baseline")
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help="slow down counted as a regression (default 0.2 = 20%%)")
+    parser.add_argument('--work-dir', default=WORK_DIR, help="directory for the generated logs")
+    parser.add_argument('--reference', default=None,
+                        help="git revision of the add_data_reference analyzer (default: the first commit)")
+    args = parser.parse_args()
+
+    names = BENCHMARKS if args.only is None else tuple(args.only.split(','))
+    unknown = [name for name in names if name not in BENCHMARKS]
+    if unknown:
+        print(f"Error: unknown benchmark {', '.join(unknown)}, use {', '.join(BENCHMARKS)}")
+        raise SystemExit(1)
+    sizes = [parse_size(size) for size in args.sizes.split(',')]
+    if args.large and parse_size(LARGE_SIZE) not in sizes:
+        sizes.append(parse_size(LARGE_SIZE))
+
+    results = run_benchmarks(sizes, names, args.work_dir, args.reference)
+    baseline = None if args.save else load_baseline(args.baseline)
+    if baseline and baseline.get('machine') != machine_info():
+        print("Note: baseline was recorded on a different machine or Python version")
+    regressions = print_results(results, baseline, args.tolerance)
+    if args.save:
+        save_baseline(args.baseline, results)
+    elif regressions:
+        print(f"\n✗ {len(regressions)} regressions: {', '.join(regressions)}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+nRF Connect Log to BLE Analysis Pipeline
+
+Streams an nRF Connect log straight into BLEMessageAnalyzer in a single pass:
+
+    raw log -> hexExtractor.iter_log_file -> [write _hex.txt] -> BLEMessageAnalyzer
+
+Records flow through generators one line at a time, so no list of matches is
+kept and the intermediate _hex.txt file is only written when asked for.
+With --follow the log is tailed while nRF Connect writes it and the summary
+and plots are refreshed as data arrives, see logFollower.
+
+Usage:
+    python blePipeline.py input_log.txt [--hex-out [file]] [--csv [file] [--layout long|wide]] [--no-plot] [--jobs N] [--reassemble] [--follow]
+                          [--plot-dir DIR [--plot-format png|svg]]
+                          [--profile [json|prom|FILE]] [--cprofile FILE] [--tracemalloc N]
+
+Example:
+    python blePipeline.py "Log 2025-06-26 20_32_08.txt" --hex-out --csv
+"""
+
+import argparse
+import contextlib
+import os
+
+from hexExtractor import iter_log_file, write_hex_messages
+from hexAnalyser import BLEMessageAnalyzer
+from logFollower import run_follow, print_live_summary
+from pipelineMetrics import PipelineMetrics, capture, emit
+
+
+def run_pipeline(input_file, analyzer=None, hex_output=None, jobs=None):
+    """
+    Decode an nRF Connect log into an analyzer in one streaming pass.
+    
+    Args:
+        input_file: Path to the raw nRF Connect log
+        analyzer: BLEMessageAnalyzer to add to, a new one is created if None
+        hex_output: Optional path of a _hex.txt side output
+        jobs: Extraction worker processes for large logs, None for one per CPU
+    
+    Returns:
+        BLEMessageAnalyzer: the analyzer holding the decoded data
+    """
+    if analyzer is None:
+        analyzer = BLEMessageAnalyzer()
+    records = iter_log_file(input_file, jobs)
+    if hex_output:
+        records = write_hex_messages(records, hex_output)
+    count = analyzer.load_records(records)
+    print(f"Decoded {count} hex messages from {input_file}")
+    if hex_output:
+        print(f"Hex messages saved to: {hex_output}")
+    return analyzer
+
+
+def follow_pipeline(input_file, analyzer, hex_output=None, plot=True):
+    """
+    Decode a log that is still being written into analyzer until Ctrl+C.
+    
+    The summary, and with plot the plot window, is refreshed after new data.
+    """
+    def refresh(analyzer):
+        print_live_summary(analyzer)
+        if plot:
+            analyzer.plot_data(block=False)
+    
+    if hex_output:
+        with open(hex_output, 'w', encoding='utf-8') as out:
+            run_follow(input_file, analyzer, on_update=refresh, hex_output=out)
+    else:
+        run_follow(input_file, analyzer, on_update=refresh)
+    return analyzer
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Decode an nRF Connect log in a single pass")
+    parser.add_argument('input_file', help="nRF Connect log file")
+    parser.add_argument('--hex-out', nargs='?', const='', default=None, metavar='FILE',
+                        help="also write the extracted hex messages (default <name>_hex.txt)")
+    parser.add_argument('--csv', nargs='?', const='', default=None, metavar='FILE',
+                        help="export decoded data (default <name>_analyzed.csv), .parquet/.arrow need pyarrow")
+    parser.add_argument('--layout', choices=('long', 'wide'), default='long',
+                        help="export one row per value (long) or per second of the ride (wide)")
+    parser.add_argument('--no-plot', action='store_true', help="skip plotting")
+    parser.add_argument('--jobs', type=int, default=None,
+                        help="extraction worker processes for large logs (default: CPU count)")
+    parser.add_argument('--reassemble', action='store_true',
+                        help="complete frames that continue in the next notification")
+    parser.add_argument('--follow', action='store_true',
+                        help="keep decoding lines appended to the log, like tail -f, until Ctrl+C")
+    parser.add_argument('--profile', nargs='?', const='json', default=None, metavar='json|prom|FILE',
+                        help="time every decode stage and print (json, prom) or write the metrics")
+    parser.add_argument('--cprofile', default=None, metavar='FILE', help="also dump cProfile statistics to FILE")
+    parser.add_argument('--tracemalloc', type=int, default=0, metavar='N',
+                        help="also trace allocations and report the top N sites")
+    parser.add_argument('--plot-dir', default=None,
+                        help="write the plots as image files into this directory instead of showing them")
+    parser.add_argument('--plot-format', choices=('png', 'svg'), default='png', help="image format for --plot-dir")
+    args = parser.parse_args()
+    
+    if not args.follow and not os.path.exists(args.input_file):
+        print(f"Error: Input file '{args.input_file}' does not exist.")
+        raise SystemExit(1)
+    
+    base_name = os.path.splitext(args.input_file)[0]
+    hex_output = args.hex_out
+    if hex_output == '':
+        hex_output = f"{base_name}_hex.txt"
+    
+    profiling = args.profile or args.cprofile or args.tracemalloc
+    metrics = PipelineMetrics() if profiling else None
+    analyzer = BLEMessageAnalyzer(reassemble=args.reassemble, metrics=metrics,
+                                  keep_rows=args.csv is not None and args.layout == 'long')
+    with capture(metrics, args.cprofile, args.tracemalloc) if metrics else contextlib.nullcontext():
+        if args.follow:
+            follow_pipeline(args.input_file, analyzer, hex_output, plot=not args.no_plot)
+        else:
+            run_pipeline(args.input_file, analyzer, hex_output=hex_output, jobs=args.jobs)
+    if args.cprofile:
+        print(f"cProfile statistics written to {args.cprofile}")
+    analyzer.print_summary()
+    if metrics is not None:
+        metrics.collect(analyzer)
+        written = emit(metrics, args.profile or 'json', analyzer.data_ids)
+        if written:
+            print(f"Metrics written to {written}")
+    if args.plot_dir:
+        analyzer.render_plots(args.plot_dir, args.plot_format, args.jobs)
+    elif not args.no_plot:
+        analyzer.plot_data()
+    if args.csv is not None:
+        analyzer.export_data(args.csv or f"{base_name}_analyzed.csv", args.layout)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,395 @@
+"""
+Columnar Storage for Decoded BLE Data
+
+Instead of one dict per decoded value (with a copy of the raw hex string)
+plus a second and third copy in per ID lists, every data key gets compact
+typed columns:
+
+    SeriesColumns   raw values and times of one data key, array('q'), plus
+                    the values scaled to engineering units, array('d')
+    ColumnStore     all series plus, with keep_rows, a message log in arrival
+                    order whose rows point into the series; ID/type labels
+                    are interned and raw frames are kept once in a shared
+                    bytearray
+
+Only the long export and BLEMessageAnalyzer.messages read the message log,
+so it is off by default and a value costs three appends to its series.
+
+Times are unwrapped milliseconds (see timeIndex), NO_TIME marks values whose
+notification time was not logged. A run length store (run_length=True) keeps
+"value X repeated N times from t0 to t1" as one entry and one message row,
+so long idle stretches of identical values cost nothing. With NumPy installed, SeriesColumns.as_numpy
+returns zero copy views of the columns.
+
+Usage:
+    store = ColumnStore(keep_rows=True)
+    raw = store.add('982D_8', '982D', '30', 8, 252, 26952500, frame_bytes)
+    # further values of the same frame share its raw bytes
+    speed = store.series('982D_8')
+    print(speed.values[-5:], store.window('982D_8', "07:29", "07:45"))
+"""
+
+from array import array
+
+from timeIndex import TimeIndex
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+NO_TIME = -1
+NO_RAW = -1
+
+
+class Interner:
+    """Map repeated strings to small integer codes and back"""
+
+    def __init__(self):
+        self.codes = {}
+        self.names = []
+
+    def __len__(self):
+        return len(self.names)
+
+    def code(self, name):
+        """Return the code of name, assigning the next free one if new"""
+        code = self.codes.get(name)
+        if code is None:
+            code = self.codes[name] = len(self.names)
+            self.names.append(name)
+        return code
+
+
+class SeriesColumns:
+    """Value, scaled value and time columns of one data key, optionally run length encoded"""
+    __slots__ = ('values', 'scaled', 'times', 'unit', 'counts', 'end_times')
+
+    def __init__(self, unit='', run_length=False):
+        self.values = array('q')
+        self.scaled = array('d')        # values in engineering units, see decoderRegistry
+        self.times = array('q')         # time of the value, of the first value of a run
+        self.unit = unit
+        # run length encoding: repeats of each entry and time of its last repeat
+        self.counts = array('q') if run_length else None
+        self.end_times = array('q') if run_length else None
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def run_length(self):
+        return self.counts is not None
+
+    def append(self, value, scaled, time):
+        self.values.append(value)
+        self.scaled.append(scaled)
+        self.times.append(time)
+        if self.counts is not None:
+            self.counts.append(1)
+            self.end_times.append(time)
+
+    def extend_run(self, value, scaled, time):
+        """Count value as one more repeat of the last run, False if it starts a new run"""
+        if self.counts is None or not self.values or self.values[-1] != value or self.scaled[-1] != scaled:
+            return False
+        self.counts[-1] += 1
+        self.end_times[-1] = time
+        return True
+
+    def extend(self, other):
+        if self.run_length != other.run_length:
+            raise ValueError("cannot mix run length and plain series")
+        self.values.extend(other.values)
+        self.scaled.extend(other.scaled)
+        self.times.extend(other.times)
+        if self.counts is not None:
+            self.counts.extend(other.counts)
+            self.end_times.extend(other.end_times)
+        self.unit = self.unit or other.unit
+
+    @property
+    def sample_count(self):
+        """Number of values added, repeats included"""
+        return sum(self.counts) if self.counts is not None else len(self.values)
+
+    def iter_runs(self):
+        """Yield (value, count, first time, last time); count is 1 in a plain series"""
+        if self.counts is None:
+            for value, time in zip(self.values, self.times):
+                yield value, 1, time, time
+        else:
+            yield from zip(self.values, self.counts, self.times, self.end_times)
+
+    @property
+    def has_time(self):
+        """True if every value carries a notification time"""
+        return len(self.times) > 0 and self.times[0] != NO_TIME
+
+    def as_numpy(self, scaled=False):
+        """Return (values, times) as NumPy views sharing the column memory, float64 values if scaled"""
+        if not HAS_NUMPY:
+            raise ImportError("numpy is required for as_numpy, install with: pip install numpy")
+        if scaled:
+            values = np.frombuffer(self.scaled, dtype=np.float64)
+        else:
+            values = np.frombuffer(self.values, dtype=np.int64)
+        return values, np.frombuffer(self.times, dtype=np.int64)
+
+
+class ColumnStore:
+    """Per data key columns plus, optionally, an arrival ordered message log"""
+
+    def __init__(self, keep_raw=True, run_length=False, keep_rows=False):
+        self.keep_rows = keep_rows      # log one row per stored value, see iter_rows
+        self.keep_raw = keep_raw and keep_rows
+        self.run_length = run_length    # repeated values extend the last entry of their series
+        self.raw = bytearray()          # raw frames back to back, rows hold offsets
+        self.keys = Interner()          # series keys, e.g. '982D_8' or 'A252_10_0'
+        self.labels = Interner()        # message data_id labels, e.g. '982D' or 'A252_0'
+        self.types = Interner()         # message type strings, e.g. '30' or '30-01'
+        self._series = []
+        self._slots = {}                # key -> (code, SeriesColumns), one dict access per add
+        # message log, one row per stored value, empty unless keep_rows
+        self.row_key = array('i')
+        self.row_pos = array('q')       # index of the value within its series
+        self.row_label = array('i')
+        self.row_type = array('i')
+        self.row_data_type = array('h') # wire type, -1 for unknown
+        self.row_raw = array('q')
+
+    def __len__(self):
+        """Number of stored values, of runs in a run length store"""
+        return sum(len(series) for series in self._series)
+
+    def __contains__(self, key):
+        return key in self.keys.codes
+
+    def add_raw(self, frame):
+        """Keep one raw frame and return its offset for add(), NO_RAW if raw is not kept"""
+        if not self.keep_raw:
+            return NO_RAW
+        offset = len(self.raw)
+        self.raw += frame
+        return offset
+
+    def _slot(self, key, unit=''):
+        """(code, SeriesColumns) of key, creating the series if new"""
+        code = self.keys.code(key)
+        while len(self._series) <= code:
+            self._series.append(SeriesColumns(unit, self.run_length))
+        slot = self._slots[key] = (code, self._series[code])
+        return slot
+
+    def add_series(self, key, unit=''):
+        """SeriesColumns of key, created if new, for loaders that fill whole columns (no message log rows)"""
+        return (self._slots.get(key) or self._slot(key, unit))[1]
+
+    def add(self, key, label, type_name, data_type, value, time=None, raw=NO_RAW,
+            scaled=None, unit=''):
+        """
+        Append one decoded value to series key and, with keep_rows, to the message log.
+
+        raw is the offset of add_raw or the frame bytes, which are kept only
+        when a row is logged, not for a repeat folded into a run.
+
+        Returns:
+            The raw offset of the logged row, else raw unchanged; pass it on
+            for the other values of the same frame
+        """
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slot(key, unit)
+        code, series = slot
+        if scaled is None:
+            scaled = value
+        if time is None:
+            time = NO_TIME
+        if self.run_length and series.extend_run(value, scaled, time):
+            return raw
+        # value first, so a value that does not fit the column leaves no dangling row
+        series.append(value, scaled, time)
+        if self.keep_rows:
+            if not isinstance(raw, int):
+                raw = self.add_raw(raw)
+            self.row_key.append(code)
+            self.row_pos.append(len(series) - 1)
+            self.row_label.append(self.labels.code(label))
+            self.row_type.append(self.types.code(type_name))
+            self.row_data_type.append(data_type)
+            self.row_raw.append(raw)
+        return raw
+
+    def merge(self, other):
+        """
+        Append all series and message rows of another store, e.g. of a later log chunk.
+
+        Codes and raw offsets of other are remapped; the message log and raw
+        frames are only kept if both stores keep them.
+        """
+        key_map = [self.keys.code(name) for name in other.keys.names]
+        label_map = [self.labels.code(name) for name in other.labels.names]
+        type_map = [self.types.code(name) for name in other.types.names]
+        while len(self._series) < len(self.keys):
+            self._series.append(SeriesColumns(run_length=self.run_length))
+        base_pos = [len(self._series[code]) for code in key_map]
+        for code, series in zip(key_map, other._series):
+            self._series[code].extend(series)
+        if not (self.keep_rows and other.keep_rows):
+            self._drop_rows()
+            return self
+
+        raw_base = len(self.raw)
+        keep_raw = self.keep_raw and other.keep_raw
+        if keep_raw:
+            self.raw += other.raw
+        self.row_key.extend(array('i', (key_map[c] for c in other.row_key)))
+        self.row_pos.extend(array('q', (pos + base_pos[c] for c, pos in zip(other.row_key, other.row_pos))))
+        self.row_label.extend(array('i', (label_map[c] for c in other.row_label)))
+        self.row_type.extend(array('i', (type_map[c] for c in other.row_type)))
+        self.row_data_type.extend(other.row_data_type)
+        if keep_raw:
+            self.row_raw.extend(array('q', (r + raw_base if r != NO_RAW else NO_RAW for r in other.row_raw)))
+        else:
+            self.row_raw.extend(array('q', [NO_RAW]) * len(other.row_raw))
+        return self
+
+    def _drop_rows(self):
+        """Forget the message log, e.g. after merging a store without one"""
+        self.keep_rows = self.keep_raw = False
+        for name in ('row_key', 'row_pos', 'row_label', 'row_type', 'row_data_type', 'row_raw'):
+            setattr(self, name, array(getattr(self, name).typecode))
+        self.raw = bytearray()
+
+    def export_columns(self):
+        """
+        Flat columns of the store for saving, see from_columns.
+        
+        Returns:
+            dict: array columns, the series values/scaled/times concatenated in key
+            order with their lengths in 'series_len', plus the interned names and units
+        """
+        columns = {
+            'series_len': array('q', (len(series) for series in self._series)),
+            'values': array('q'), 'scaled': array('d'), 'times': array('q'),
+            'row_key': self.row_key, 'row_pos': self.row_pos, 'row_label': self.row_label,
+            'row_type': self.row_type, 'row_data_type': self.row_data_type, 'row_raw': self.row_raw,
+            'raw': self.raw,
+            'keys': list(self.keys.names), 'labels': list(self.labels.names),
+            'types': list(self.types.names), 'units': [series.unit for series in self._series],
+            'keep_raw': self.keep_raw, 'run_length': self.run_length, 'keep_rows': self.keep_rows,
+        }
+        if self.run_length:
+            columns['counts'] = array('q')
+            columns['end_times'] = array('q')
+        for series in self._series:
+            columns['values'].extend(series.values)
+            columns['scaled'].extend(series.scaled)
+            columns['times'].extend(series.times)
+            if self.run_length:
+                columns['counts'].extend(series.counts)
+                columns['end_times'].extend(series.end_times)
+        return columns
+    
+    @classmethod
+    def from_columns(cls, columns):
+        """Rebuild a store from export_columns output; array columns may be any buffer, e.g. NumPy arrays"""
+        store = cls(bool(columns['keep_raw']), bool(columns.get('run_length', False)),
+                    bool(columns.get('keep_rows', True)))
+        for name in ('keys', 'labels', 'types'):
+            interner = getattr(store, name)
+            for value in columns[name]:
+                interner.code(value)
+        values = array('q', bytes(columns['values']))
+        scaled = array('d', bytes(columns['scaled']))
+        times = array('q', bytes(columns['times']))
+        if store.run_length:
+            counts = array('q', bytes(columns['counts']))
+            end_times = array('q', bytes(columns['end_times']))
+        start = 0
+        for length, unit in zip(array('q', bytes(columns['series_len'])), columns['units']):
+            series = SeriesColumns(unit, store.run_length)
+            series.values = values[start:start + length]
+            series.scaled = scaled[start:start + length]
+            series.times = times[start:start + length]
+            if store.run_length:
+                series.counts = counts[start:start + length]
+                series.end_times = end_times[start:start + length]
+            store._series.append(series)
+            start += length
+        for name in ('row_key', 'row_pos', 'row_label', 'row_type', 'row_data_type', 'row_raw'):
+            column = getattr(store, name)
+            column.frombytes(bytes(columns[name]))
+        store.raw = bytearray(bytes(columns['raw']))
+        return store
+    
+    def series_keys(self):
+        """Data keys in order of first appearance"""
+        return list(self.keys.names)
+
+    def series(self, key):
+        """Return the SeriesColumns of key or None"""
+        code = self.keys.codes.get(key)
+        return None if code is None else self._series[code]
+
+    def items(self):
+        """Yield (key, SeriesColumns) in order of first appearance"""
+        return zip(self.keys.names, self._series)
+
+    def raw_hex(self, offset):
+        """Raw frame at offset as upper case hex without separators"""
+        if offset == NO_RAW:
+            return ''
+        end = offset + 2 + self.raw[offset + 1]
+        return self.raw[offset:end].hex().upper()
+
+    def window(self, key, start=None, end=None):
+        """
+        Return (times, values) of series key within start <= t <= end.
+
+        Bounds are unwrapped ms or time of day strings such as "07:29", either may be None.
+        In a run length series every run overlapping the window is returned,
+        with the time of its first value.
+        """
+        series = self.series(key)
+        if series is None:
+            raise KeyError(key)
+        if not series.has_time:
+            raise ValueError(f"No timestamps logged for {key}")
+        lo, hi = TimeIndex(series.times, series.end_times).window(start, end)
+        return series.times[lo:hi], series.values[lo:hi]
+
+    def check_rows(self):
+        """Raise ValueError if the message log is not kept"""
+        if not self.keep_rows:
+            raise ValueError("the message log is not kept, decode with keep_rows=True for the long layout")
+
+    def iter_rows(self):
+        """
+        Yield message log rows in arrival order.
+
+        Yields:
+            tuple: (type, data_id, data_type, value, raw, time, scaled, unit),
+            data_type is 'unknown' and time None where not available; in a
+            run length store one row per run, with the time of its first value
+
+        Raises:
+            ValueError: The store was created without keep_rows
+        """
+        self.check_rows()
+        labels = self.labels.names
+        types = self.types.names
+        for i in range(len(self.row_key)):
+            series = self._series[self.row_key[i]]
+            pos = self.row_pos[i]
+            data_type = self.row_data_type[i]
+            time = series.times[pos]
+            yield (types[self.row_type[i]],
+                   labels[self.row_label[i]],
+                   'unknown' if data_type < 0 else data_type,
+                   series.values[pos],
+                   self.raw_hex(self.row_raw[i]),
+                   None if time == NO_TIME else time,
+                   series.scaled[pos],
+                   series.unit)
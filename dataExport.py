@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+Streaming Export of Decoded Data
+
+Writes a ColumnStore to disk in chunks of CHUNK_ROWS rows, so memory stays
+constant however long the session is, and without pandas, so the output is
+the same whether or not pandas is installed. Two layouts:
+
+    long    one row per decoded value in arrival order (the message log):
+            type, data_id, data_type, value, raw, time, scaled, unit;
+            needs a store decoded with keep_rows. A run length store
+            adds count and end_time, a row stands for count repeats of
+            its value from time to end_time
+    wide    one row per step of a regular time grid, one column per data key
+            holding its scaled value (last value or linear interpolation,
+            see rideMetrics.resample_series); needs notification times
+
+and three formats, chosen by the file extension:
+
+    .csv                text, data IDs replaced by their names
+    .parquet            Parquet, needs pyarrow
+    .arrow / .feather   Arrow IPC file, needs pyarrow
+
+In CSV an unknown data_type is written as 'unknown', a missing time as an
+empty field and the raw frame with a leading ' so spreadsheets keep it as
+text; Parquet and Arrow use nulls and the plain hex string instead.
+
+Usage:
+    python dataExport.py Log_hex.txt out.csv [--layout long|wide] [--step MS]
+
+    export_data(analyzer.store, "ride.parquet", layout='wide', names=analyzer.data_ids)
+"""
+
+import argparse
+import os
+from itertools import chain
+
+from columnStore import HAS_NUMPY, NO_TIME, NO_RAW
+
+if HAS_NUMPY:
+    import numpy as np
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+CHUNK_ROWS = 65536
+LONG_COLUMNS = ('type', 'data_id', 'data_type', 'value', 'raw', 'time', 'scaled', 'unit')
+RUN_COLUMNS = ('count', 'end_time')     # long layout of a run length store
+FORMATS = {'.csv': 'csv', '.parquet': 'parquet', '.arrow': 'arrow', '.feather': 'arrow'}
+
+
+def export_format(filename):
+    """Format of an export file from its extension"""
+    ext = os.path.splitext(filename)[1].lower()
+    if ext not in FORMATS:
+        raise ValueError(f"unknown export format '{ext}', use one of {', '.join(FORMATS)}")
+    return FORMATS[ext]
+
+
+def _names(names):
+    return names if names is not None else {}
+
+
+def message_chunks(store, names=None, chunk_rows=CHUNK_ROWS):
+    """
+    Yield the message log in chunks.
+
+    Args:
+        store: ColumnStore
+        names: {data_id: name} applied to the data_id column, e.g. BLEMessageAnalyzer.data_ids
+        chunk_rows: Rows per chunk
+
+    Yields:
+        dict: LONG_COLUMNS (plus RUN_COLUMNS for a run length store) -> list,
+        data_type and times None where unknown
+
+    Raises:
+        ValueError: The store keeps no message log
+    """
+    store.check_rows()
+    names = _names(names)
+    labels = [names.get(label, label) for label in store.labels.names]
+    types = store.types.names
+    units = [series.unit for _, series in store.items()]
+    rows = len(store.row_key)
+    for start in range(0, rows, chunk_rows):
+        end = min(start + chunk_rows, rows)
+        if HAS_NUMPY:
+            yield _numpy_chunk(store, start, end, labels, types, units)
+        else:
+            yield _python_chunk(store, start, end, labels, types, units)
+
+
+def _python_chunk(store, start, end, labels, types, units):
+    series = store._series
+    chunk = {name: [] for name in LONG_COLUMNS + (RUN_COLUMNS if store.run_length else ())}
+    for i in range(start, end):
+        column = series[store.row_key[i]]
+        pos = store.row_pos[i]
+        data_type = store.row_data_type[i]
+        time = column.times[pos]
+        chunk['type'].append(types[store.row_type[i]])
+        chunk['data_id'].append(labels[store.row_label[i]])
+        chunk['data_type'].append(None if data_type < 0 else data_type)
+        chunk['value'].append(column.values[pos])
+        chunk['raw'].append(store.raw_hex(store.row_raw[i]))
+        chunk['time'].append(None if time == NO_TIME else time)
+        chunk['scaled'].append(column.scaled[pos])
+        chunk['unit'].append(units[store.row_key[i]])
+        if store.run_length:
+            end_time = column.end_times[pos]
+            chunk['count'].append(column.counts[pos])
+            chunk['end_time'].append(None if end_time == NO_TIME else end_time)
+    return chunk
+
+
+def _numpy_chunk(store, start, end, labels, types, units):
+    """Same as _python_chunk, gathering each series' rows of the chunk at once"""
+    keys = np.frombuffer(store.row_key, dtype=np.int32)[start:end]
+    pos = np.frombuffer(store.row_pos, dtype=np.int64)[start:end]
+    values = np.empty(end - start, dtype=np.int64)
+    scaled = np.empty(end - start, dtype=np.float64)
+    times = np.empty(end - start, dtype=np.int64)
+    counts = np.empty(end - start, dtype=np.int64)
+    end_times = np.empty(end - start, dtype=np.int64)
+    for code in np.unique(keys):
+        rows = keys == code
+        series = store._series[code]
+        series_values, series_times = series.as_numpy()
+        values[rows] = series_values[pos[rows]]
+        scaled[rows] = np.frombuffer(series.scaled, dtype=np.float64)[pos[rows]]
+        times[rows] = series_times[pos[rows]]
+        if store.run_length:
+            counts[rows] = np.frombuffer(series.counts, dtype=np.int64)[pos[rows]]
+            end_times[rows] = np.frombuffer(series.end_times, dtype=np.int64)[pos[rows]]
+    data_types = np.frombuffer(store.row_data_type, dtype=np.int16)[start:end].tolist()
+    chunk = {
+        'type': [types[code] for code in store.row_type[start:end]],
+        'data_id': [labels[code] for code in store.row_label[start:end]],
+        'data_type': [None if data_type < 0 else data_type for data_type in data_types],
+        'value': values.tolist(),
+        'raw': _raw_hex_chunk(store, start, end),
+        'time': [None if time == NO_TIME else time for time in times.tolist()],
+        'scaled': scaled.tolist(),
+        'unit': [units[code] for code in keys.tolist()],
+    }
+    if store.run_length:
+        chunk['count'] = counts.tolist()
+        chunk['end_time'] = [None if time == NO_TIME else time for time in end_times.tolist()]
+    return chunk
+
+
+def _raw_hex_chunk(store, start, end):
+    """raw_hex of the rows start:end, the frames of a chunk are converted to hex in one go"""
+    offsets = np.frombuffer(store.row_raw, dtype=np.int64)[start:end]
+    kept = offsets != NO_RAW
+    if not kept.any():
+        return [''] * len(offsets)
+    raw = np.frombuffer(store.raw, dtype=np.uint8)
+    ends = offsets[kept] + 2 + raw[offsets[kept] + 1]
+    base = int(offsets[kept].min())
+    text = store.raw[base:int(ends.max())].hex().upper()
+    starts = np.where(kept, 2 * (offsets - base), 0).tolist()
+    stops = np.zeros(len(offsets), dtype=np.int64)
+    stops[kept] = 2 * (ends - base)
+    return [text[a:b] for a, b in zip(starts, stops.tolist())]
+
+
+def column_name(key, names=None):
+    """Wide column of a data key, the ID replaced by its name, e.g. 'Speed_8'"""
+    name = _names(names).get(key[0:4])
+    return key if name is None else name + key[4:]
+
+
+def wide_chunks(store, keys=None, names=None, step_ms=1000, method='hold', max_gap_ms=None,
+                chunk_rows=CHUNK_ROWS):
+    """
+    Yield a regular time grid with one column per data key in chunks.
+
+    Args:
+        keys: Data keys, default all keys with notification times
+        step_ms, method, max_gap_ms: See rideMetrics.resample_series
+
+    Yields:
+        dict: 'time' -> int64 array, column_name(key) -> float64 array, NaN where unknown
+    """
+    from rideMetrics import time_grid, resample_series
+    if not HAS_NUMPY:
+        raise ImportError("numpy is required for the wide layout, install with: pip install numpy")
+    if keys is None:
+        keys = [key for key, series in store.items() if len(series) and series.has_time]
+    if not keys:
+        raise ValueError("no series with notification times, extract the log with times (hexExtractor.py)")
+    grid = time_grid(store, keys, step_ms)
+    series = {key: store.series(key).as_numpy(scaled=True) for key in keys}
+    for start in range(0, len(grid), chunk_rows):
+        grid_chunk = grid[start:start + chunk_rows]
+        chunk = {'time': grid_chunk}
+        for key, (values, times) in series.items():
+            chunk[column_name(key, names)] = resample_series(times, values, grid_chunk, method, max_gap_ms)
+        yield chunk
+
+
+def _long_csv(chunk):
+    columns = list(chunk.values())
+    columns[2] = ['unknown' if data_type is None else data_type for data_type in columns[2]]
+    columns[5] = ['' if time is None else time for time in columns[5]]
+    row = "%s,%s,%s,%d,'%s,%s,%r,%s"
+    if len(columns) > len(LONG_COLUMNS):
+        columns[9] = ['' if time is None else time for time in columns[9]]
+        row += ",%d,%s"
+    row += "\n"
+    # one format operation per chunk
+    return (row * len(columns[0])) % tuple(chain.from_iterable(zip(*columns)))
+
+
+def _wide_csv(chunk):
+    data = np.column_stack(list(chunk.values()))
+    row = '%d' + ',%.10g' * (data.shape[1] - 1) + '\n'
+    # one format operation per chunk, unknown (nan) values become empty fields
+    text = (row * len(data)) % tuple(data.ravel().tolist())
+    return text.replace('nan', '')
+
+
+def write_csv(chunks, filename, layout='long'):
+    """Write chunks as CSV; returns the number of rows"""
+    to_text = _long_csv if layout == 'long' else _wide_csv
+    rows = 0
+    header = False
+    with open(filename, 'w', newline='', buffering=1 << 20) as f:
+        for chunk in chunks:
+            if not header:
+                f.write(','.join(chunk) + '\n')
+                header = True
+            f.write(to_text(chunk))
+            rows += len(chunk['time'])
+        if not header and layout == 'long':     # empty message log
+            f.write(','.join(LONG_COLUMNS) + '\n')
+    return rows
+
+
+def _arrow_schema(layout, columns):
+    if layout == 'long':
+        fields = [('type', pa.string()), ('data_id', pa.string()), ('data_type', pa.int16()),
+                  ('value', pa.int64()), ('raw', pa.string()), ('time', pa.int64()),
+                  ('scaled', pa.float64()), ('unit', pa.string())]
+        if len(columns) > len(LONG_COLUMNS):
+            fields += [('count', pa.int64()), ('end_time', pa.int64())]
+        return pa.schema(fields)
+    return pa.schema([('time', pa.int64())] + [(name, pa.float64()) for name in columns[1:]])
+
+
+def write_arrow(chunks, filename, layout='long', fmt='parquet'):
+    """Write chunks as Parquet or Arrow IPC file, one row group / record batch per chunk"""
+    if not HAS_PYARROW:
+        raise ImportError("pyarrow is required for Parquet and Arrow export, install with: pip install pyarrow")
+    rows = 0
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                schema = _arrow_schema(layout, list(chunk))
+                writer = pq.ParquetWriter(filename, schema) if fmt == 'parquet' else pa.ipc.new_file(filename, schema)
+            batch = pa.record_batch([pa.array(column, type=field.type)
+                                     for column, field in zip(chunk.values(), schema)], schema=schema)
+            writer.write_batch(batch)
+            rows += batch.num_rows
+        if writer is None:          # empty message log
+            schema = _arrow_schema(layout, LONG_COLUMNS)
+            writer = pq.ParquetWriter(filename, schema) if fmt == 'parquet' else pa.ipc.new_file(filename, schema)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows
+
+
+def export_data(store, filename, layout='long', names=None, step_ms=1000, method='hold', max_gap_ms=None,
+                keys=None, chunk_rows=CHUNK_ROWS):
+    """
+    Export a ColumnStore to CSV, Parquet or Arrow, the format taken from the extension.
+
+    Args:
+        store: ColumnStore, e.g. BLEMessageAnalyzer.store
+        filename: .csv, .parquet, .arrow or .feather file
+        layout: 'long' (message log) or 'wide' (time grid)
+        names: {data_id: name} for data_id / column names
+        step_ms, method, max_gap_ms, keys: Grid of the wide layout, see wide_chunks
+
+    Returns:
+        int: Number of rows written
+    """
+    fmt = export_format(filename)
+    if layout == 'long':
+        chunks = message_chunks(store, names, chunk_rows)
+    elif layout == 'wide':
+        chunks = wide_chunks(store, keys, names, step_ms, method, max_gap_ms, chunk_rows)
+    else:
+        raise ValueError(f"layout must be 'long' or 'wide', not {layout!r}")
+    if fmt == 'csv':
+        return write_csv(chunks, filename, layout)
+    return write_arrow(chunks, filename, layout, fmt)
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Export a decoded log as CSV, Parquet or Arrow")
+    parser.add_argument('input_file', help="_hex.txt file")
+    parser.add_argument('output_file', help=".csv, .parquet, .arrow or .feather file")
+    parser.add_argument('--layout', choices=('long', 'wide'), default='long',
+                        help="one row per value (long) or per time grid step (wide)")
+    parser.add_argument('--step', type=int, default=1000, help="grid step in ms of the wide layout (default 1000)")
+    parser.add_argument('--method', choices=('hold', 'linear'), default='hold',
+                        help="hold the last value or interpolate in the wide layout")
+    args = parser.parse_args()
+
+    from hexAnalyser import BLEMessageAnalyzer
+    analyzer = BLEMessageAnalyzer(keep_rows=args.layout == 'long')
+    analyzer.load_from_file(args.input_file)
+    try:
+        analyzer.export_data(args.output_file, args.layout, args.step, args.method)
+    except (ValueError, ImportError) as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
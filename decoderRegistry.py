@@ -0,0 +1,179 @@
+"""
+Decoder Registry for Bosch Data IDs and Wire Types
+
+One table, keyed by (data_id, wire_type) as integers, tells the frame
+decoder how to turn a payload into a value and how to present it:
+
+    DecoderSpec(decoder, name, scale, unit)
+
+decoder(view, pos, end) decodes the payload behind the type byte, scale
+converts the raw value to engineering units (cadence * 0.5 rpm, speed
+* 0.01 km/h, torque * 0.005 Nm) and unit names the result. IDs without an
+entry of their own fall back to the default decoder of their wire type;
+those lookups are cached, so every lookup is a single dict access.
+
+Name, scale and unit belong to the wire type they were registered for;
+registered without one they apply to the varint values of 08 and 0A
+frames, not to protobuf fields the same ID may carry.
+
+Own decoders are added without touching the parser:
+
+    register_decoder(0x9874, WIRE_VARINT, name='MaxSpeed', scale=0.1, unit='km/h')
+    register_decoder(0xA0E2, 0x12, decoder=my_decoder, name='Serial')
+
+Type bytes other than 08/0A are the first tag of a protobuf message (10 =
+field 2 varint, 12 = field 2 length delimited, ...) and C0/C1 frames carry
+one behind a 3 byte header; these decode to a lazy protoDecoder.ProtoMessage.
+Only unnamed IDs get these protobuf defaults: other frames of a named ID
+(982D, 9818, ...) decode to 0 as they always did, unless a decoder is
+registered for their (data_id, wire_type).
+"""
+
+import hashlib
+from typing import Callable, NamedTuple, Optional
+
+from frameDecoder import (decode_varint, decode_varints, decode_dist_per_mode,
+                          WIRE_VARINT, WIRE_VARINT_ARRAY, WIRE_CUSTOM, WIRE_CUSTOM_C1)
+from protoDecoder import decode_proto, decode_proto_header
+
+
+class DecoderSpec(NamedTuple):
+    """How one (data_id, wire_type) is decoded and presented"""
+    decoder: Optional[Callable]     # decoder(view, pos, end) -> value, None decodes to 0
+    name: Optional[str]             # e.g. 'Speed', None for unnamed IDs
+    scale: float                    # engineering value = raw value * scale
+    unit: str
+
+
+def decode_varint_value(view, pos, end):
+    """Wire type 0x08: one varint, trailing fields are ignored"""
+    return decode_varint(view, pos, end)[0]
+
+
+def decode_varint_array(view, pos, end):
+    """Wire type 0x0A: the length byte and the packed varints as one tuple"""
+    return decode_varints(view, pos, end)
+
+
+def decode_short_varint(view, pos, end):
+    """9808 frames: varint within the first 3 payload bytes"""
+    return decode_varint(view, pos, min(end, pos + 3))[0]
+
+
+def decode_dist_per_mode_value(view, pos, end):
+    """108C frames: first varint of the distance per assist mode record"""
+    return decode_dist_per_mode(view, pos, end)[1][0]
+
+
+WIRE_DECODERS = {
+    WIRE_VARINT: decode_varint_value,
+    WIRE_VARINT_ARRAY: decode_varint_array,
+    WIRE_CUSTOM: decode_proto_header,
+    WIRE_CUSTOM_C1: decode_proto_header,
+}
+# wire types whose values a presentation registered without wire type applies to
+VARINT_WIRE_TYPES = (WIRE_VARINT, WIRE_VARINT_ARRAY)
+# protobuf tags of fields 2..4 as first type byte
+WIRE_DECODERS.update((tag, decode_proto) for tag in (0x10, 0x12, 0x18, 0x1A, 0x20, 0x22))
+
+
+class DecoderRegistry:
+    """Decoder specs keyed by (data_id, wire_type) with per wire type defaults"""
+
+    def __init__(self, wire_decoders=WIRE_DECODERS):
+        self.wire_decoders = dict(wire_decoders)
+        self.decoders = {}          # (data_id, wire_type) -> decoder registered for it
+        self.id_info = {}           # (data_id, wire_type or None) -> (name, scale, unit)
+        self.id_names = {}          # 'XXXX' -> name, as BLEMessageAnalyzer.data_ids
+        self._specs = {}            # lookup cache, (data_id, wire_type) -> DecoderSpec
+
+    def register(self, data_id, wire_type=None, decoder=None, name=None, scale=1.0, unit=''):
+        """
+        Register a decoder and/or the presentation of a data ID.
+
+        Args:
+            data_id: e.g. 0x982D
+            wire_type: Type byte the decoder applies to
+            decoder: decoder(view, pos, end) -> value, None keeps the wire type default
+            name, scale, unit: Presentation of the values of wire_type, of
+                VARINT_WIRE_TYPES if wire_type is None
+        """
+        if decoder is not None:
+            self.decoders[(data_id, wire_type)] = decoder
+        if name is not None or scale != 1.0 or unit:
+            self.id_info[(data_id, wire_type)] = (name, scale, unit)
+            if name is not None:
+                self.id_names[f"{data_id:04X}"] = name
+        self._specs.clear()
+
+    def register_wire_type(self, wire_type, decoder):
+        """Set the default decoder of a wire type"""
+        self.wire_decoders[wire_type] = decoder
+        self._specs.clear()
+
+    def lookup(self, data_id, wire_type):
+        """Return the DecoderSpec of (data_id, wire_type)"""
+        spec = self._specs.get((data_id, wire_type))
+        if spec is None:
+            decoder = self.decoders.get((data_id, wire_type))
+            if decoder is None and (wire_type in VARINT_WIRE_TYPES or f"{data_id:04X}" not in self.id_names):
+                decoder = self.wire_decoders.get(wire_type)
+            info = self.id_info.get((data_id, wire_type))
+            if info is None and wire_type in VARINT_WIRE_TYPES:
+                info = self.id_info.get((data_id, None))
+            name, scale, unit = info or (None, 1.0, '')
+            spec = self._specs[(data_id, wire_type)] = DecoderSpec(decoder, name, scale, unit)
+        return spec
+
+    def fingerprint(self):
+        """
+        Hash of the registered decoders and presentations, e.g. for cache keys.
+
+        Decoders are identified by module and qualified name, a changed body
+        of the same function is not seen.
+        """
+        def decoder_name(decoder):
+            return f"{getattr(decoder, '__module__', '')}.{getattr(decoder, '__qualname__', repr(decoder))}"
+
+        items = (sorted((wire_type, decoder_name(decoder)) for wire_type, decoder in self.wire_decoders.items()),
+                 sorted((data_id, -1 if wire_type is None else wire_type, decoder_name(decoder))
+                        for (data_id, wire_type), decoder in self.decoders.items()),
+                 sorted((data_id, -1 if wire_type is None else wire_type, info)
+                        for (data_id, wire_type), info in self.id_info.items()))
+        return hashlib.sha1(repr(items).encode('utf-8')).hexdigest()
+
+    def name(self, data_id):
+        """Name of a data ID or None"""
+        return self.id_names.get(f"{data_id:04X}")
+
+
+DEFAULT_REGISTRY = DecoderRegistry()
+
+def register_decoder(data_id, wire_type=None, decoder=None, name=None, scale=1.0, unit=''):
+    """Register with DEFAULT_REGISTRY, see DecoderRegistry.register"""
+    DEFAULT_REGISTRY.register(data_id, wire_type, decoder, name, scale, unit)
+
+
+# Known Bosch Smart System data IDs, see BLEdata.md
+register_decoder(0x985A, name='Cadence',          scale=0.5,   unit='rpm')
+register_decoder(0x985B, name='HumanPower',                    unit='W')
+register_decoder(0x985D, name='MotorPower',                    unit='W')
+register_decoder(0x9815, name='Torque?',          scale=0.005, unit='Nm')
+register_decoder(0x982D, name='Speed',            scale=0.01,  unit='km/h')
+register_decoder(0x9808, WIRE_VARINT, decode_short_varint,
+                         name='Speed1',           scale=0.01,  unit='km/h')
+register_decoder(0x80BC, name='Battery',                       unit='%')
+register_decoder(0x8088, name='Battery1',                      unit='%')
+register_decoder(0x80CA, name='Battery2',                      unit='%')
+register_decoder(0x9809, name='AssistMode')
+register_decoder(0x9818, name='TotalDist',                     unit='m')
+register_decoder(0xA252, name='TripDistPerMode',               unit='m')
+#register_decoder(0x80C5, name='NotPhoneBattery?')
+register_decoder(0x108C, WIRE_CUSTOM, decode_dist_per_mode_value,
+                         name='DistPerMode',                   unit='m')
+register_decoder(0x809C, name='BatteryDelivered',              unit='Wh')
+
+# large arrays of nested messages rather than packed varints, e.g. 984E holds
+# repeated 0A-0C-0A-0A-"A100M00040" records
+for _data_id in (0x988B, 0x984E, 0xA186, 0xA041):
+    register_decoder(_data_id, WIRE_VARINT_ARRAY, decode_proto)
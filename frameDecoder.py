@@ -0,0 +1,277 @@
+"""
+Bosch Smart System BLE Frame Decoder
+
+Byte level decoding of the 0x30 frames found in a notification line such as
+"30-04-98-5B-08-4F-30-02-98-09". Each line is converted once with
+bytes.fromhex and the frames are walked with offsets into a memoryview,
+so no per byte substrings are created and no hex text is parsed twice.
+
+Frame layout (see BLEdata.md):
+    30 | length | data id (2 bytes) | data type | payload ...
+
+Usage:
+    buf = hex_to_bytes("30-05-98-2D-08-FC-01")
+    for frame in decode_frames(buf):
+        print(frame.id_hex, frame.value)     # 982D 252
+
+How each (data_id, wire type) is decoded is looked up in decoderRegistry.
+Most frames of a ride repeat byte for byte (assist mode, zero cadence, ...).
+FrameMemo hands out one shared DecodedFrame per distinct frame instead of
+decoding it again. Building its key costs about as much as decoding a
+varint, so varint frames bypass it and it only pays off with decoders that
+are expensive; BLEMessageAnalyzer leaves it off unless frame_memo is given.
+"""
+
+from collections import OrderedDict
+from typing import Any, NamedTuple, Tuple, Union
+
+FRAME_START = 0x30
+
+WIRE_VARINT = 0x08          # single varint
+WIRE_VARINT_ARRAY = 0x0A    # length byte followed by concatenated varints
+WIRE_CUSTOM = 0xC0          # structured payload, e.g. 108C DistPerMode
+WIRE_CUSTOM_C1 = 0xC1       # structured payload behind the same 3 byte header as C0
+
+UNKNOWN = -1                # data_id / data_type of frames too short to carry one
+
+ID_SPEED1 = 0x9808
+ID_DIST_PER_MODE = 0x108C
+
+FRAME_MEMO_SIZE = 4096      # distinct frames kept by FrameMemo, a long ride has about a thousand
+
+
+class DecodedFrame(NamedTuple):
+    """One decoded 0x30 frame of a notification"""
+    start: int                      # start byte, 0x30
+    length: int                     # declared length byte
+    data_id: int                    # e.g. 0x982D, UNKNOWN if missing
+    data_type: int                  # wire type byte, UNKNOWN if missing
+    value: Union[int, Tuple[int, ...]]
+    offset: int                     # byte offset of the frame in its notification
+    spec: Any = None                # decoderRegistry.DecoderSpec used, None if unknown
+
+    @property
+    def id_hex(self):
+        """Data ID as used in BLEMessageAnalyzer.data_ids, e.g. '982D'"""
+        if self.data_id == UNKNOWN:
+            return 'unknown'
+        return f"{self.data_id:04X}"
+
+    @property
+    def end(self):
+        """Byte offset just behind the frame"""
+        return self.offset + 2 + self.length
+
+    def raw_hex(self, buf):
+        """Frame bytes as upper case hex without separators, e.g. '30052D...'"""
+        return bytes(buf[self.offset:self.end]).hex().upper()
+
+
+def hex_to_bytes(hex_string):
+    """
+    Convert one notification line to bytes.
+
+    Dashes and spaces are ignored and a dangling half byte at the end is
+    dropped. A pair with any other character is garbled and skipped like the
+    string parser used to skip it: the frames before and behind it are kept,
+    a frame the garbled pair falls into is dropped.
+    """
+    hex_clean = hex_string.replace(' ', '').replace('-', '')
+    if len(hex_clean) & 1:
+        hex_clean = hex_clean[:-1]
+    try:
+        return bytes.fromhex(hex_clean)
+    except ValueError:
+        return _skip_garbled(hex_clean)
+
+
+def _skip_garbled(hex_clean):
+    """hex_to_bytes of a line with garbled pairs, the scan resyncs behind each of them"""
+    parts = []
+    segment = bytearray()
+    for i in range(0, len(hex_clean), 2):
+        try:
+            segment += bytes.fromhex(hex_clean[i:i + 2])
+        except ValueError:
+            # cut behind the last complete frame, a frame running into the garbled pair is lost
+            end = 0
+            for _, end in iter_frame_spans(segment):
+                pass
+            parts.append(bytes(segment[:end]))
+            segment = bytearray()
+    parts.append(bytes(segment))
+    return b''.join(parts)
+
+
+def iter_frame_spans(buf):
+    """
+    Yield (offset, end) of every complete 0x30 frame in buf.
+
+    A 0x30 whose declared length runs past the end of the buffer is skipped
+    and the scan resyncs on the next byte.
+    """
+    view = memoryview(buf)
+    n = len(view)
+    i = 0
+    while i < n:
+        if view[i] == FRAME_START and i + 1 < n:
+            end = i + 2 + view[i + 1]
+            if end <= n:
+                yield i, end
+                i = end
+                continue
+        i += 1
+
+
+def decode_varint(view, pos, end):
+    """
+    Decode one varint starting at pos, not reading beyond end.
+
+    Returns:
+        tuple: (value, position behind the varint). An empty range decodes to 0.
+    """
+    if pos >= end:
+        return 0, pos
+    byte = view[pos]
+    value = byte & 0x7F
+    shift = 7
+    pos += 1
+    while pos < end and byte & 0x80:
+        byte = view[pos]
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        pos += 1
+    return value, pos
+
+
+def decode_varints(view, pos, end):
+    """Decode concatenated varints from pos to end. An empty range decodes to (0,)"""
+    if pos >= end:
+        return (0,)
+    values = []
+    while pos < end:
+        value, pos = decode_varint(view, pos, end)
+        values.append(value)
+    return tuple(values)
+
+
+def decode_dist_per_mode(view, pos, end):
+    """
+    Decode the payload of a 108C frame behind its 0xC0 type byte.
+
+    e.g. 30-10-10-8C-C0 -80-55-0A-09-08- 9A-D4-B5-02 -10-C1-89-02
+
+    Returns:
+        tuple: (key, varints) where key is the low nibble of the second byte
+    """
+    key = view[pos + 1] & 0xF if pos + 1 < end else 0
+    return key, decode_varints(view, pos + 5, end)
+
+
+def decode_frame(view, offset, end, registry, ignore_ids=()):
+    """
+    Decode the frame view[offset:end] with the decoder registry.lookup
+    returns for its (data_id, wire_type).
+
+    Returns:
+        DecodedFrame or None for frames that are too short or ignored
+    """
+    size = end - offset
+    if size < 3:
+        return None
+    start = view[offset]
+    length = view[offset + 1]
+    if size < 4:
+        return DecodedFrame(start, length, UNKNOWN, UNKNOWN, 0, offset)
+
+    data_id = (view[offset + 2] << 8) | view[offset + 3]
+    if data_id in ignore_ids:
+        return None
+    if size == 4:
+        # no payload means value 0
+        spec = registry.lookup(data_id, WIRE_VARINT)
+        return DecodedFrame(start, length, data_id, WIRE_VARINT, 0, offset, spec)
+
+    data_type = view[offset + 4]
+    spec = registry.lookup(data_id, data_type)
+    value = spec.decoder(view, offset + 5, end) if spec.decoder is not None else 0
+    return DecodedFrame(start, length, data_id, data_type, value, offset, spec)
+
+
+_MISSING = object()
+
+
+class FrameMemo:
+    """
+    Bounded LRU cache of decoded frames keyed by their raw bytes.
+
+    Cached frames are decoded at offset 0 and shared, a frame found at another
+    offset of its notification is a copy with that offset. Varint (08) frames
+    and frames without payload are not cached. Use one memo per registry and
+    ignore set, and clear() it after registering decoders.
+    """
+
+    def __init__(self, maxsize=FRAME_MEMO_SIZE):
+        self.maxsize = maxsize
+        self.frames = OrderedDict()     # raw frame bytes -> DecodedFrame or None
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getstate__(self):
+        # decoded values may hold memoryviews, only the counters are pickled
+        return {'maxsize': self.maxsize, 'hits': self.hits, 'misses': self.misses}
+
+    def __setstate__(self, state):
+        self.__init__(state['maxsize'])
+        self.hits = state['hits']
+        self.misses = state['misses']
+
+    def decode(self, view, offset, end, registry, ignore_ids=()):
+        """Memoized decode_frame; varint frames decode faster than they are looked up and bypass the memo"""
+        if end - offset < 6 or view[offset + 4] == WIRE_VARINT:
+            return decode_frame(view, offset, end, registry, ignore_ids)
+        key = view[offset:end].tobytes()
+        frame = self.frames.get(key, _MISSING)
+        if frame is _MISSING:
+            self.misses += 1
+            frame = decode_frame(memoryview(key), 0, end - offset, registry, ignore_ids)
+            self.frames[key] = frame
+            if len(self.frames) > self.maxsize:
+                self.frames.popitem(last=False)
+        else:
+            self.hits += 1
+            self.frames.move_to_end(key)
+        if frame is not None and offset:
+            frame = frame._replace(offset=offset)
+        return frame
+
+    def clear(self):
+        self.frames.clear()
+
+    def stats(self):
+        """Counters as dict"""
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'size': len(self.frames),
+                'hit_rate': self.hits / total if total else 0.0}
+
+
+def decode_frames(buf, ignore_ids=(), registry=None, memo=None):
+    """
+    Decode every complete frame of one notification into DecodedFrame records.
+
+    registry defaults to decoderRegistry.DEFAULT_REGISTRY, with a FrameMemo
+    repeated frames are not decoded again.
+    """
+    if registry is None:
+        from decoderRegistry import DEFAULT_REGISTRY as registry
+    decode = decode_frame if memo is None else memo.decode
+    view = memoryview(buf)
+    frames = []
+    for offset, end in iter_frame_spans(view):
+        frame = decode(view, offset, end, registry, ignore_ids)
+        if frame is not None:
+            frames.append(frame)
+    return frames
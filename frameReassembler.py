@@ -0,0 +1,174 @@
+"""
+Streaming Reassembly of 0x30 Frames Split Across BLE Notifications
+
+A frame whose declared length runs past the end of its notification is
+continued in the next notification, e.g.
+
+    ... 30-14-A2-41-0A-10-B2-B0          (notification n, 8 of 22 bytes)
+    6B-00-51-FC-11-F0-AB-7B-00-04-63-82-25-AC-30-04-98-09-08-01     (n + 1)
+
+FrameReassembler keeps the unfinished tail of a notification in a fixed size
+ring buffer and completes it with the following bytes, so only whole frames
+are emitted and the stream is never rescanned. Bytes that cannot start a
+frame are skipped (a resync); a partial frame is discarded when the next
+notification arrives more than max_gap ms later, when the next notification
+is whole frames by itself but no continuation of it (a stray 30-FF at the
+end of a line would otherwise swallow the lines behind it, also without
+times), or when the stream is flushed.
+
+Usage:
+    reassembler = FrameReassembler()
+    for tt, hex_data in records:
+        for frame in reassembler.feed(hex_to_bytes(hex_data), tt):
+            print(frame.hex('-'))
+    reassembler.flush()
+    print(reassembler.stats())
+"""
+
+from frameDecoder import FRAME_START
+
+MAX_FRAME = 2 + 255         # start byte, length byte and the longest payload
+RING_SIZE = 4096
+MAX_GAP_MS = 1000           # a frame is not continued over a longer pause
+
+
+def whole_frames(view, pos=0):
+    """True if view[pos:] is a sequence of complete 0x30 frames"""
+    end = len(view)
+    while pos < end:
+        if view[pos] != FRAME_START or pos + 1 >= end:
+            return False
+        pos += 2 + view[pos + 1]
+    return pos == end
+
+
+class FrameReassembler:
+    """Carry partial 0x30 frames from one notification into the next"""
+
+    def __init__(self, capacity=RING_SIZE, max_gap=MAX_GAP_MS):
+        """
+        Args:
+            capacity: Ring buffer size in bytes, at least one maximal frame
+            max_gap: Longest pause in ms between the parts of one frame, None for no limit
+        """
+        if capacity < MAX_FRAME:
+            raise ValueError(f"capacity must hold one frame of {MAX_FRAME} bytes")
+        self.ring = bytearray(capacity)
+        self.capacity = capacity
+        self.max_gap = max_gap
+        self.head = 0           # ring index of the first buffered byte
+        self.size = 0           # buffered bytes
+        self.last_time = None   # time of the notification that left bytes buffered
+        # counters
+        self.frames = 0         # complete frames emitted
+        self.carried = 0        # of these completed by a later notification
+        self.resyncs = 0        # times the stream had to search for the next 0x30
+        self.dropped_bytes = 0  # bytes skipped while resyncing or discarded as partial frames
+        self._in_sync = True
+
+    def _byte(self, i):
+        return self.ring[(self.head + i) % self.capacity]
+
+    def _write(self, data):
+        tail = (self.head + self.size) % self.capacity
+        first = min(len(data), self.capacity - tail)
+        self.ring[tail:tail + first] = data[:first]
+        self.ring[:len(data) - first] = data[first:]
+        self.size += len(data)
+
+    def _read(self, n):
+        """Remove n bytes from the front and return them"""
+        start = self.head
+        end = start + n
+        if end <= self.capacity:
+            frame = bytes(self.ring[start:end])
+        else:
+            frame = bytes(self.ring[start:]) + bytes(self.ring[:end - self.capacity])
+        self._skip(n)
+        return frame
+
+    def _skip(self, n):
+        self.head = (self.head + n) % self.capacity
+        self.size -= n
+
+    def _continues(self, view):
+        """True if view completes the buffered partial frame and is whole frames behind it"""
+        length = self._byte(1) if self.size > 1 else view[0]
+        rest = 2 + length - self.size
+        return rest <= len(view) and whole_frames(view, rest)
+
+    def _drop(self, n):
+        """Skip n bytes that are not part of a frame"""
+        if self._in_sync:
+            self.resyncs += 1
+            self._in_sync = False
+        self.dropped_bytes += n
+        self._skip(n)
+
+    def feed(self, data, tt=None):
+        """
+        Add one notification and return the frames it completes.
+
+        Args:
+            data: Notification bytes, e.g. frameDecoder.hex_to_bytes(hex_data)
+            tt: Notification time in ms, used for the max_gap check
+
+        Returns:
+            list: Complete frames as bytes, starting with 0x30
+        """
+        view = memoryview(data)
+        if self.size and tt is not None and self.last_time is not None and self.max_gap is not None:
+            if tt - self.last_time > self.max_gap:
+                self.discard()
+        if self.size and view and whole_frames(view) and not self._continues(view):
+            self.discard()
+        pending = self.size > 0
+        frames = []
+        pos = 0
+        while pos < len(view):
+            room = min(self.capacity - self.size, len(view) - pos)
+            self._write(view[pos:pos + room])
+            pos += room
+            pending = self._extract(frames, pending)
+        self.last_time = tt
+        return frames
+
+    def _extract(self, frames, pending):
+        """Move the complete frames of the buffer to frames, return whether the front was carried"""
+        while self.size:
+            if self._byte(0) != FRAME_START:
+                self._drop(1)
+                pending = False
+                continue
+            if self.size < 2:
+                break
+            need = 2 + self._byte(1)
+            if self.size < need:
+                break
+            frames.append(self._read(need))
+            self.frames += 1
+            self.carried += pending
+            pending = False
+            self._in_sync = True
+        return pending
+
+    def discard(self):
+        """Drop a buffered partial frame, e.g. after a pause or a reconnect"""
+        if self.size:
+            self._drop(self.size)
+            self._in_sync = True
+
+    def flush(self):
+        """End of stream: discard what is left, see discard"""
+        self.discard()
+        self.last_time = None
+
+    def stats(self):
+        """Counters as dict"""
+        return {
+            'frames': self.frames,
+            'carried': self.carried,
+            'resyncs': self.resyncs,
+            'dropped_bytes': self.dropped_bytes,
+            'buffered': self.size,
+        }
@@ -1,5 +1,19 @@
-import re
+import warnings
 from collections import defaultdict, Counter
+from functools import partial
+from time import perf_counter_ns
+
+from frameDecoder import (hex_to_bytes, decode_frames, decode_dist_per_mode, FrameMemo,
+                          UNKNOWN, WIRE_VARINT_ARRAY, WIRE_CUSTOM, ID_DIST_PER_MODE)
+from timeIndex import TimeUnwrapper
+from decoderRegistry import DEFAULT_REGISTRY
+from columnStore import ColumnStore, NO_RAW
+from onlineStats import SeriesStats, merge_id_stats
+from protoDecoder import ProtoMessage, SchemaCache
+from frameReassembler import FrameReassembler
+from plotRender import series_xy, draw_series, render_plots, PLOT_POINTS
+from dataExport import export_data
+from pipelineMetrics import TimedRegistry
 
 # Optional imports for enhanced features
 try:
@@ -9,305 +23,317 @@ except ImportError:
     HAS_MATPLOTLIB = False
     print("Note: matplotlib not available, plotting disabled")
 
-try:
-    import pandas as pd
-    HAS_PANDAS = True
-except ImportError:
-    HAS_PANDAS = False
-    print("Note: pandas not available, CSV export will use basic format")
+def iter_hex_file(lines):
+    """
+    Yield (line_num, tt, hex_data) records of a _hex.txt file.
+    
+    Lines are either "hex" or "tt, hex" with tt the time of day in milliseconds,
+    tt is None when not logged.
+    """
+    for line_num, line in enumerate(lines, 1):
+        line = line.strip()
+        if line and not line.startswith('#'):  # Skip empty lines and comments
+            tt = None
+            if ',' in line:
+                time_text, line = line.split(',', 1)
+                tt = int(time_text)
+                line = line.strip()
+            yield line_num, tt, line
 
 class BLEMessageAnalyzer:
-    data_ids   = {  '985A' :    'Cadence' ,         \
-                    '985B' :    'HumanPower' ,      \
-                    '985D' :    'MotorPower' ,      \
-                    '9815' :    'MotorPower1' ,     \
-                    '982D' :    'Speed' ,           \
-                    '9808' :    'Speed1' ,          \
-                    '9815' :    'Torque?' ,         \
-                    '80BC' :    'Battery' ,         \
-                    '8088' :    'Battery1' ,        \
-                    '80CA' :    'Battery2' ,        \
-                    '9809' :    'AssistMode' ,      \
-                    '9818' :    'TotalDist' ,       \
-                    'A252' :    'TripDistPerMode',  \
-                     #'80C5' :    'NotPhoneBattery?', \
-                    '108C' :    'DistPerMode',      \
-                    '809C' :    'BatteryDelivered'  \
-                    }
-    ignore_data_ids = ['988B', '984E', 'A186', 'A041']  # TBD seem to be large arrays, need to investigate later
-    def __init__(self):
-        self.messages = []
-        self.data_by_id = defaultdict(list)
+    data_ids = DEFAULT_REGISTRY.id_names     # 'XXXX' -> name, see decoderRegistry
+    # large array IDs the original parser skipped; they are decoded as protobuf now and add their own
+    # series, pass ignore_ids=ignore_data_ids to skip them as before
+    ignore_data_ids = ['988B', '984E', 'A186', 'A041']
+    def __init__(self, keep_raw=True, stat_trackers=None, registry=None, ignore_ids=(), reassemble=False,
+                 frame_memo=0, run_length=False, metrics=None, keep_rows=False, verbose=False):
+        self.registry = registry or DEFAULT_REGISTRY    # decoder, name, scale and unit per (data_id, wire type)
+        self.data_ids = self.registry.id_names
+        # decoded values and times per data key; run_length stores repeats as one entry,
+        # keep_rows also logs every value with its raw frame (keep_raw) for messages and the long export
+        self.store = ColumnStore(keep_raw, run_length, keep_rows)
+        self._frame_slots = {}      # data_id << 8 | wire type -> keys and presentation, see _frame_slot
+        # with frame_memo=N (e.g. FRAME_MEMO_SIZE) repeated non varint frames are decoded once
+        self.frame_memo = FrameMemo(frame_memo) if frame_memo else None
         self.data_types = Counter()
-        self.id_stats = defaultdict(lambda: {'count': 0, 'min': None, 'max': None, 'values': []})
-        
-    def parse_hex_data(self, hex_string):
-        """Parse hex string and extract individual messages"""
-        # Remove spaces and convert to uppercase
-        hex_clean = hex_string.replace(' ', '').replace('-', '').upper()
-        
-        messages = []
-        i = 0
-        
-        while i < len(hex_clean):
-            # Look for message start (30)
-            if i + 1 < len(hex_clean) and hex_clean[i:i+2] == '30':
-                # Get length
-                if i + 3 < len(hex_clean):
-                    length_hex = hex_clean[i+2:i+4]
-                    try:
-                        length = int(length_hex, 16)
-                        # Extract full message: 30 + length byte + payload
-                        msg_end = i + 4 + (length * 2)  # *2 because each byte is 2 hex chars
-                        if msg_end <= len(hex_clean):
-                            message = hex_clean[i:msg_end]
-                            messages.append(message)
-                            i = msg_end
-                        else:
-                            i += 2
-                    except ValueError:
-                        i += 2
-                else:
-                    i += 2
-            else:
-                i += 2
-                
-        return messages
+        # constant memory per data key; stat_trackers opts into more, e.g. onlineStats.trackers('quantiles')
+        self.stat_trackers = stat_trackers
+        self.id_stats = defaultdict(partial(SeriesStats, stat_trackers))
+        self._unwrap_time = TimeUnwrapper()
+        self._ignore_ids = frozenset(int(x, 16) for x in ignore_ids)    # e.g. ignore_data_ids
+        self.schemas = SchemaCache()            # protobuf field kinds per data ID
+        self.proto_samples = {}                 # 'XXXX' -> fields of its first protobuf payload
+        # carries frames split across notifications into the next line, see frameReassembler
+        self.reassembler = FrameReassembler() if reassemble else None
+        # pipelineMetrics.PipelineMetrics to time every stage, None costs nothing
+        self.metrics = metrics
+        self._timed_registry = TimedRegistry(self.registry, metrics) if metrics is not None else None
+        self.verbose = verbose      # print every array value while decoding
     
-    def parse_message(self, message):
-        """Parse individual 30-XX message - special handling for specific fields"""
-        if len(message) < 6:  # Minimum: 30 + length + some data
-            return None
-            
-        # Convert to byte array
-        bytes_data = [message[i:i+2] for i in range(0, len(message), 2)]
-        if bytes_data[0] != '30' and bytes_data[0] != '10':
-            return None
-            
-        start_byte = bytes_data[0]
-            
-        length = int(bytes_data[1], 16)
-        
-        if len(bytes_data) >= 4:
-            data_id = bytes_data[2] + bytes_data[3]
-            if data_id in self.ignore_data_ids:  # skip these large unknown
-                return None
-                
-            if len(bytes_data) == 4:
-                return {
-                    'type': start_byte,
-                    'data_id': data_id,
-                    'data_type': 8,
-                    'value': 0,
-                    'raw': message
-                }
-                
-            elif len(bytes_data) > 4:
-                data_type = int(bytes_data[4], 16)
-                values = 0
-                value_bytes = bytes_data[5:len(bytes_data)]
-                if data_id == '9808' and data_type == 8:
-                    #values = self.parse_for_int32( bytes_data[5:8] )
-                    values = self.parse_for_varint( bytes_data[5:8] )
-                else:
-                    if data_type == 8:
-                        #print(f"      {bytes_data} with data_id {data_id}: parse_for_varint in {value_bytes}  :")
-                        values = self.parse_for_varint( value_bytes)
-                    if data_type == 10:
-                        #print(f"      {bytes_data} with data_id {data_id}: parse_for_varint in {value_bytes}  :")
-                        values = []
-                        values = self.parse_for_vararrint(values, value_bytes)#
-                    if data_type == 192 and data_id == '108C':
-                        #      30-10-10-8C-C0  -80-55-0A-09-08-  9A-D4-B5-02  -10-C1-89-02-  sport 0100 0100
-                        key = int(value_bytes[1],16) & 0xF
-                        xxx = []
-                        #if key == 5:
-                        xxx = self.parse_for_vararrint( xxx, value_bytes[5:])
-                            #  - Turbo 3986 km
-                            #  - Sport 5073 km
-                            #  - Tour+ 3214 km
-                            #  - Eco 946 km
-                            #  - Off 60 km
-                        txt = "????"
-                        values = xxx[0]
-                        if abs(values/1000 - 3986) <50:
-                            txt = "TURBO"
-                        if abs(values/1000 - 5073) <50:
-                            txt = "SPORT"
-                        if abs(values/1000 - 3214) <50:
-                            txt = "TOUR+"
-                        if abs(values/1000 - 946) <50:
-                            txt = "ECO  "
-                        if abs(values/1000 - 60) <50:
-                            txt = "OFF  "
-                        arg2 = 0
-                        if len(xxx)>2:
-                            arg2 = xxx[2]
-                        print(f"  custom data_id {data_id}:  key {key:04b} {txt} has  {values:8d} arg2 = {arg2:6d}")
-                        
-                return {
-                    'type': start_byte,
-                    'data_id': data_id,  # Fixed ID for this special field
-                    'data_type': data_type,
-                    'value': values,
-                    'raw': message
-                }
-                
-                
-        # For any other format, capture what we can
-        return {
-            'type': f'{start_byte}-{length:02d}',
-            'data_id': 'unknown',
-            'data_type': 'unknown',
-            'value': 0,
-            'raw': message
-        }
+    @property
+    def messages(self):
+        """
+        Decoded messages as list of dicts, built on demand from the message log.
+
+        The log is only kept with keep_rows=True; without it the list is empty
+        and a warning says so.
+        """
+        if not self.store.keep_rows:
+            warnings.warn("messages is empty, the message log is only kept with keep_rows=True", stacklevel=2)
+            return []
+        fields = ('type', 'data_id', 'data_type', 'value', 'raw', 'time', 'scaled', 'unit')
+        return [dict(zip(fields, row)) for row in self.store.iter_rows()]
     
-    def parse_for_varint(self, bytes_data):
-        single_value = -9
-        match len(bytes_data):
-            case 0:
-                # no data means value 0
-                single_value =  0
-            case _:
-                single_value = int(bytes_data[0], 16) & 127
-                i = 1
-                while (i < len(bytes_data)) and ((int(bytes_data[i-1], 16) & 128) == 128):
-                    #print(f"     single_value {single_value} i {i} {bytes_data} len {len(bytes_data)}")
-                    single_value = single_value + ((int(bytes_data[i], 16) & 127 ) <<  (7 * i))
-                    i = i + 1
-                #print(f"     single_value {single_value} i {i} {bytes_data} len {len(bytes_data)}")
-        
-        return single_value
+    @property
+    def data_by_id(self):
+        """Value column per data key"""
+        return {key: series.values for key, series in self.store.items()}
         
-    def parse_for_vararrint(self, val_array, bytes_data):
-        single_value = -9
-        match len(bytes_data):
-            case 0:
-                # no data means value 0
-                single_value =  0
-            case _:
-                single_value = int(bytes_data[0], 16) & 127
-                i = 1
-                while (i < len(bytes_data)) and ((int(bytes_data[i-1], 16) & 128) == 128):
-                    #print(f"     single_value {single_value} i {i} {bytes_data} len {len(bytes_data)}")
-                    single_value = single_value + ((int(bytes_data[i], 16) & 127 ) <<  (7 * i))
-                    i = i + 1
-                #print(f"     single_value {single_value} i {i} {bytes_data} len {len(bytes_data)}")
-        val_array.append(single_value)
-        if len(bytes_data) - i > 0:
-            self.parse_for_vararrint(val_array, bytes_data[i:len(bytes_data)])
+    def decode_line(self, hex_data, tt=None, registry=None):
+        """
+        Decode one hex line into (bytes, [DecodedFrame, ...]) without string slicing.
         
-        return val_array
-              
-    def parse_for_int32(self, bytes_data):
-        single_value = -9
-        match len(bytes_data):
-            case 0:
-                # no data means value 0
-                single_value =  0
-            case 1:
-                # byte onlya
-                single_value =  int(bytes_data[0], 16) << 0
-            case 2:
-                single_value =  (int(bytes_data[0], 16) << 0)  + \
-                                (int(bytes_data[1], 16) << 8) 
-            case 4:
-                # e.g. data_type 9818 has little endian 32 bit decoding in 4 byte
-                single_value =  (int(bytes_data[0], 16) << 0)  + \
-                                (int(bytes_data[1], 16) << 8)  + \
-                                (int(bytes_data[2], 16) << 16) + \
-                                (int(bytes_data[3], 16) << 24)
-            case _:
-                single_value = -8        
-        return single_value
-    
-    def add_data(self, hex_data):
-        """Add hex data line and parse all messages in it"""
-        messages = self.parse_hex_data(hex_data)
-        
-        for msg in messages:
-            parsed = self.parse_message(msg)
-            if parsed:
-                # Store by data ID
-                # if data_type is an array type create individual outputs for each array index
-                if parsed['data_type'] in [10]:
-                    id = parsed['data_id']  
-                    key = f"{parsed['data_id']}"
-                    if id in self.data_ids:
-                        key = self.data_ids[parsed['data_id']]
-                    
-                    key += f"_{parsed['data_type']}"
-                    for i in range(len(parsed['value'])-1):
-                        key1 = key + f"_{i}"
-                        v = parsed['value'][i]
-                        print(f"key1 {key1}: v {v}")
+        With reassembly the bytes are the frames completed by this line, including
+        one started in an earlier line; tt is the unwrapped line time in ms.
+        registry defaults to self.registry, the measured path passes a TimedRegistry.
+        """
+        buf = hex_to_bytes(hex_data)
+        if self.reassembler is not None:
+            buf = b''.join(self.reassembler.feed(buf, tt))
+        return buf, decode_frames(buf, self._ignore_ids, registry or self.registry, self.frame_memo)
 
-                        self.data_by_id[key1].append(v)
-                        self.data_types[parsed['data_type']] += 1
-                    
-                        # Update statistics
-                        stats = self.id_stats[key1]
-                        stats['count'] += 1
-                        stats['values'].append(v)
-                        if stats['min'] is None or v < stats['min']:
-                            stats['min'] = v
-                        if stats['max'] is None or v > stats['max']:
-                            stats['max'] = v
-                        self.messages.append(               \
-                            {
-                                'type': parsed['type'],                    
-                                'data_id': parsed['data_id'] +  f"_{i}" ,
-                                'data_type': parsed['data_type'],        
-                                'value': v,                    
-                                'raw': msg                 
-                            }
-                            )
+    def add_data(self, hex_data, tt=None):
+        """Add hex data line and parse all messages in it, tt is its time of day in ms"""
+        if self.metrics is not None:
+            return self._add_data_measured(hex_data, tt)
+        if tt is not None:
+            tt = self._unwrap_time(tt)
+        buf, frames = self.decode_line(hex_data, tt)
+        self.add_frames(buf, frames, tt)
+
+    def _add_data_measured(self, hex_data, tt=None):
+        """add_data with every stage timed and counted into self.metrics"""
+        metrics = self.metrics
+        if tt is not None:
+            tt = self._unwrap_time(tt)
+        start = perf_counter_ns()
+        buf, frames = self.decode_line(hex_data, tt, self._timed_registry)
+        now = perf_counter_ns()
+        metrics.add_time('decode', now - start)
+        metrics.counters['lines'] += 1
+        metrics.counters['bytes_scanned'] += len(buf)
+        framed = 0
+        for frame in frames:
+            size = frame.length + 2
+            framed += size
+            metrics.id_frames[frame.id_hex] += 1
+            metrics.id_bytes[frame.id_hex] += size
+        metrics.counters['frames'] += len(frames)
+        metrics.counters['unframed_bytes'] += len(buf) - framed
+        self.add_frames(buf, frames, tt)
+        metrics.add_time('store', perf_counter_ns() - now)
+
+    def _frame_slot(self, frame):
+        """
+        Series key, row label, row type and presentation shared by all frames
+        of one (data_id, wire type), worked out once instead of per frame.
+
+        Array values are keyed '<name>_<type>_<index>' as the original
+        analyzer did, e.g. 'TripDistPerMode_10_0', with the ID for unnamed IDs.
 
-                else:
-                    self.messages.append(parsed)
-                    key = f"{parsed['data_id']}"
-                    if parsed['data_type']:
-                        key += f"_{parsed['data_type']}"
-                        
-                    self.data_by_id[key].append(parsed['value'])
-                    self.data_types[parsed['data_type']] += 1
+        Returns:
+            tuple: (key, label, type name or None if it depends on the length,
+                    scale, unit, spec, data_types key, [(key, label) per array index])
+        """
+        data_id = frame.id_hex
+        data_type = frame.data_type if frame.data_type != UNKNOWN else 'unknown'
+        key = data_id
+        if data_type:
+            key += f"_{data_type}"
+        type_name = None if frame.data_id == UNKNOWN else f'{frame.start:02X}'
+        scale, unit = (frame.spec.scale, frame.spec.unit) if frame.spec else (1.0, '')
+        return key, data_id, type_name, scale, unit, frame.spec, data_type, []
+
+    def add_frames(self, buf, frames, tt):
+        """Store the decoded frames of one line, see decode_line"""
+        store = self.store
+        keep_rows = store.keep_rows
+        slots = self._frame_slots
+        for frame in frames:
+            sig = (frame.data_id << 8) | (frame.data_type & 0xFF)
+            slot = slots.get(sig)
+            if slot is None or slot[5] is not frame.spec:
+                slot = slots[sig] = self._frame_slot(frame)
+            key, label, start_byte, scale, unit, _, data_type, index_keys = slot
+            if start_byte is None:
+                start_byte = f'{frame.start:02X}-{frame.length:02d}'
+            # frame bytes, kept by the store once a row of this frame is logged
+            raw = memoryview(buf)[frame.offset:frame.end] if keep_rows else NO_RAW
+            if frame.data_id == ID_DIST_PER_MODE and frame.data_type == WIRE_CUSTOM:
+                self.print_dist_per_mode(buf, frame)
+            
+            # Store by data ID
+            # protobuf payloads get one output per numeric field path
+            value = frame.value
+            if isinstance(value, ProtoMessage):
+                self.add_proto(frame, start_byte, tt, raw, scale, unit)
+            
+            # if data_type is an array type create individual outputs for each array index
+            elif frame.data_type == WIRE_VARINT_ARRAY:
+                while len(index_keys) < len(value) - 1:
+                    i = len(index_keys)
+                    name = self.data_ids.get(label, label)
+                    index_keys.append((f"{name}_{data_type}_{i}", f"{label}_{i}"))
+                for (key1, label1), v in zip(index_keys, value[:-1]):
+                    if self.verbose:
+                        print(f"key1 {key1}: v {v}")
                     
-                    # Update statistics
-                    stats = self.id_stats[key]
-                    stats['count'] += 1
-                    stats['values'].append(parsed['value'])
-                    if stats['min'] is None or parsed['value'] < stats['min']:
-                        stats['min'] = parsed['value']
-                    if stats['max'] is None or parsed['value'] > stats['max']:
-                        stats['max'] = parsed['value']
+                    raw = store.add(key1, label1, start_byte, frame.data_type, v, tt, raw, v * scale, unit)
+                    self.data_types[data_type] += 1
+                    self.id_stats[key1].update(v, tt)
+            
+            else:
+                store.add(key, label, start_byte, frame.data_type, value, tt, raw, value * scale, unit)
+                self.data_types[data_type] += 1
+                self.id_stats[key].update(value, tt)
+    
+    def add_proto(self, frame, start_byte, tt, raw, scale, unit):
+        """
+        Store the numeric fields of a protobuf payload as '<id>_<type>_<path>' series.
+
+        Every numeric leaf is walked and stored, the lazy decoding only saves
+        the fields of other kinds. Named IDs reach here only for wire types a
+        decoder is registered for, see decoderRegistry.
+        """
+        data_id = frame.id_hex
+        data_type = frame.data_type
+        if data_id not in self.proto_samples:
+            self.proto_samples[data_id] = self.schemas.to_dict(frame.data_id, frame.value)
+        key = f"{data_id}_{data_type}"
+        stored = False
+        for path, v in self.schemas.numeric(frame.data_id, frame.value):
+            key1 = f"{key}_{path}"
+            raw = self.store.add(key1, f"{data_id}_{path}", start_byte, data_type, v, tt, raw, v * scale, unit)
+            self.data_types[data_type] += 1
+            self.id_stats[key1].update(v, tt)
+            stored = True
+        if not stored:
+            # strings only or empty, keep the frame as value 0
+            self.store.add(key, data_id, start_byte, data_type, 0, tt, raw, 0, unit)
+            self.data_types[data_type] += 1
+            self.id_stats[key].update(0, tt)
+    
+    def print_dist_per_mode(self, buf, frame):
+        """Print the 108C distance per assist mode record"""
+        #      30-10-10-8C-C0  -80-55-0A-09-08-  9A-D4-B5-02  -10-C1-89-02-  sport 0100 0100
+        key, xxx = decode_dist_per_mode(memoryview(buf), frame.offset + 5, frame.end)
+            #  - Turbo 3986 km
+            #  - Sport 5073 km
+            #  - Tour+ 3214 km
+            #  - Eco 946 km
+            #  - Off 60 km
+        txt = "????"
+        values = xxx[0]
+        if abs(values/1000 - 3986) <50:
+            txt = "TURBO"
+        if abs(values/1000 - 5073) <50:
+            txt = "SPORT"
+        if abs(values/1000 - 3214) <50:
+            txt = "TOUR+"
+        if abs(values/1000 - 946) <50:
+            txt = "ECO  "
+        if abs(values/1000 - 60) <50:
+            txt = "OFF  "
+        arg2 = 0
+        if len(xxx)>2:
+            arg2 = xxx[2]
+        print(f"  custom data_id {frame.id_hex}:  key {key:04b} {txt} has  {values:8d} arg2 = {arg2:6d}")
     
-    def load_from_file(self, filename):
-        """Load hex data from file, one message per line"""
+    def load_records(self, records):
+        """Add (line_num, tt, hex_data) records, e.g. straight from hexExtractor.iter_hex_messages"""
+        count = 0
+        if self.metrics is not None:
+            records = self.metrics.timed_iter('extract', records)
+        for line_num, tt, hex_data in records:
+            try:
+                self.add_data(hex_data, tt)
+                count += 1
+            except Exception as e:
+                print(f"Error parsing line {line_num}: {hex_data}")
+                print(f"Error: {e}")
+        return count
+    
+    def load_from_file(self, filename, cache=None):
+        """
+        Load hex data from file, one message per line.
+        
+        With a sessionCache.SessionCache a file decoded before is loaded from the
+        cache and of a grown file only the new lines are decoded.
+        """
         try:
+            if cache is not None:
+                status = cache.analyse(filename, self)
+                print(f"Successfully loaded data from {filename} (cache {status})")
+                return
             with open(filename, 'r') as f:
-                for line_num, line in enumerate(f, 1):
-                    line = line.strip()
-                    if line and not line.startswith('#'):  # Skip empty lines and comments
-                        try:
-                            self.add_data(line)
-                        except Exception as e:
-                            print(f"Error parsing line {line_num}: {line}")
-                            print(f"Error: {e}")
+                self.load_records(iter_hex_file(f))
             print(f"Successfully loaded data from {filename}")
         except FileNotFoundError:
             print(f"Error: File '{filename}' not found")
         except Exception as e:
             print(f"Error reading file: {e}")
     
+    def time_window(self, key, start=None, end=None):
+        """
+        Return (times, values) of one data key within a time window.
+        
+        Args:
+            key: data_by_id key, e.g. '982D_8'
+            start, end: unwrapped ms or time of day strings such as "07:29" and "07:45",
+                either may be None for an open window; windows may span midnight
+        """
+        return self.store.window(key, start, end)
+    
+    def merge_stats(self, other, new_ride=False):
+        """
+        Merge statistics and type counts of an analyzer that decoded a later log chunk.
+
+        With new_ride the other analyzer decoded a separate ride, no rate of
+        change is computed across the two.
+        """
+        merge_id_stats(self.id_stats, other.id_stats, new_ride)
+        self.data_types.update(other.data_types)
+        for data_id, sample in other.proto_samples.items():
+            self.proto_samples.setdefault(data_id, sample)
+        if self.frame_memo is not None and other.frame_memo is not None:
+            self.frame_memo.hits += other.frame_memo.hits
+            self.frame_memo.misses += other.frame_memo.misses
+        if self.metrics is not None and other.metrics is not None:
+            self.metrics.merge(other.metrics)
+    
+    def merge(self, other, new_ride=False):
+        """Merge columns, statistics and type counts of an analyzer of a later log chunk or ride, see merge_stats"""
+        self.store.merge(other.store)
+        self.merge_stats(other, new_ride)
+    
     def print_summary(self):
         """Print analysis summary"""
         print("=== BLE Message Analysis Summary ===\n")
         
-        print(f"Total messages parsed: {len(self.messages)}")
-        print(f"Unique data IDs found: {len(self.data_by_id)}")
+        print(f"Total messages parsed: {sum(self.data_types.values())}")
+        print(f"Unique data IDs found: {len(self.id_stats)}")
         print()
         
+        if self.frame_memo is not None:
+            memo = self.frame_memo.stats()
+            print(f"Frame cache: {memo['hits']} hits, {memo['misses']} misses "
+                  f"({memo['hit_rate']:.1%}), {memo['size']} distinct frames kept")
+            print()
+        if self.reassembler is not None:
+            counters = self.reassembler.stats()
+            print("Frame reassembly: " + ", ".join(f"{name} {count}" for name, count in counters.items()))
+            print()
+        
         print("Data Types frequency:")
         for dtype, count in self.data_types.most_common():
             if dtype:
@@ -315,130 +341,166 @@ class BLEMessageAnalyzer:
         print()
         
         print("Data ID Statistics:")
-        print(f"{'Data ID':<20} {'Count':<8} {'Min':<8} {'Max':<8} {'Range':<10} {'Last 5 Values'}")
-        print("-" * 80)
+        print(f"{'Data ID':<20} {'Count':<8} {'Min':<8} {'Max':<8} {'Range':<10} {'Mean':<10} {'Std':<10} {'P50':<10} {'Last 5 Values'}")
+        print("-" * 110)
         
         for data_id, stats in sorted(self.id_stats.items()):
-            if stats['count'] > 0:
-                range_val = stats['max'] - stats['min'] if stats['min'] is not None else 0
-                recent_values = stats['values'][-5:]
-                print(f"{data_id:<20} {stats['count']:<8} {stats['min']:<8} {stats['max']:<8} {range_val:<10} {recent_values}")
+            if stats.count > 0:
+                range_val = stats.max - stats.min if stats.min is not None else 0
+                p50 = f"{stats['quantiles'].quantile(0.5):.1f}" if 'quantiles' in stats.trackers else '-'
+                print(f"{data_id:<20} {stats.count:<8} {stats.min:<8} {stats.max:<8} {range_val:<10} "
+                      f"{stats.mean:<10.2f} {stats.std:<10.2f} {p50:<10} {stats.recent}")
+        
+        if self.proto_samples:
+            print()
+            print("Protobuf payloads (first message per Data ID):")
+            for data_id, sample in sorted(self.proto_samples.items()):
+                name = self.data_ids.get(data_id, data_id)
+                fields = ', '.join(f"{path}={value!r}" for path, value in sample.items())
+                print(f"  {name:<18} {fields[:200]}")
     
-    def plot_data(self, max_plots=48):
-        """Plot time series for each data ID"""
+    def plot_keys(self, max_plots=48):
+        """Data keys worth plotting: at least two values that are not all equal"""
+        keys = []
+        for data_id, series in self.store.items():
+            if len(series) >= 2 and min(series.values) != max(series.values):
+                keys.append(data_id)
+        return keys[:max_plots]
+
+    def plot_title(self, data_id):
+        """Data key with the ID replaced by its name, e.g. 'Speed_8'"""
+        txt = data_id[0:4]
+        if txt in self.data_ids:
+            txt = self.data_ids[txt]
+        return txt + data_id[4:]
+
+    def plot_note(self, data_id):
+        stats = self.id_stats[data_id]
+        return f"Range: {stats.min}-{stats.max}\nCount: {stats.count}"
+
+    def plot_data(self, max_plots=48, block=True, max_points=PLOT_POINTS):
+        """
+        Plot time series for each data ID, block=False redraws one window without waiting (live mode).
+
+        Series are downsampled to about max_points points (LTTB, see plotRender)
+        and drawn over the time of day if notification times were logged.
+        """
         if not HAS_MATPLOTLIB:
             print("Matplotlib not available. Install with: pip install matplotlib")
             print("Alternatively, use the CSV export to plot in Excel/other tools.")
             return
-            
-        # Filter out IDs with too few data points or no variation
-        interesting_ids = {}
-        for data_id, values in self.data_by_id.items():
-            if len(values) >= 2:  # At least 3 data points
-                if len(set(values)) > 1:  # Has variation
-                    interesting_ids[data_id] = values
-        
-        if not interesting_ids:
+
+        plot_ids = self.plot_keys(max_plots)
+        if not plot_ids:
             print("No interesting data series found to plot.")
             return
-            
-        # Limit number of plots
-        plot_ids = list(interesting_ids.keys())[:max_plots]
         
         # Calculate grid size
         n_plots = len(plot_ids)
         cols = min(3, n_plots)
         rows = (n_plots + cols - 1) // cols
         
-        fig, axes = plt.subplots(rows, cols, figsize=(15, 4*rows))
-        if n_plots == 1:
-            axes = [axes]
-        elif rows == 1:
-            axes = [axes] if cols == 1 else axes
-        else:
-            axes = axes.flatten()
+        fig, axes = plt.subplots(rows, cols, figsize=(15, 4*rows), squeeze=False,
+                                 num=None if block else 'BLE Data', clear=True)
+        axes = axes.flatten()
         
-        for i, data_id in enumerate(plot_ids):
-            ax = axes[i] if n_plots > 1 else axes[0]
-            values = interesting_ids[data_id]
-            
-            ax.plot(values, 'o-', markersize=3)
-            txt = data_id[0:4]
-            if txt in self.data_ids:
-                txt = self.data_ids[txt]
-            txt = txt + data_id[4:(len(data_id)-0)]
-            print(txt + " " + data_id)
-            ax.set_title(f'Data ID: {txt}')
-            #ax.set_title(f'Data ID: {data_id}')
-            ax.set_xlabel('Message Index')
-            ax.set_ylabel('Value')
-            ax.grid(True, alpha=0.3)
-            
-            # Add statistics to plot
-            stats = self.id_stats[data_id]
-            ax.text(0.02, 0.98, f"Range: {stats['min']}-{stats['max']}\nCount: {stats['count']}", 
-                   transform=ax.transAxes, verticalalignment='top',
-                   bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+        for ax, data_id in zip(axes, plot_ids):
+            series = self.store.series(data_id)
+            x, y, has_time = series_xy(series, max_points)
+            draw_series(ax, x, y, has_time, self.plot_title(data_id), self.plot_note(data_id), series.unit)
         
         # Hide unused subplots
         for i in range(n_plots, len(axes)):
             axes[i].set_visible(False)
             
         plt.tight_layout()
-        plt.show()
+        if block:
+            plt.show()
+        else:
+            plt.pause(0.001)
+
+    def render_plots(self, output_dir, fmt='png', jobs=None, max_plots=48, max_points=PLOT_POINTS):
+        """Write every plot as its own PNG/SVG file into output_dir, without a display"""
+        paths = render_plots(self, output_dir, fmt, jobs, max_points, keys=self.plot_keys(max_plots))
+        print(f"{len(paths)} plots written to {output_dir}")
+        return paths
     
-    def export_csv(self, filename="ble_data.csv"):
+    def export_data(self, filename, layout='long', step_ms=1000, method='hold'):
+        """Export decoded data as CSV, Parquet or Arrow by file extension, see dataExport"""
+        rows = export_data(self.store, filename, layout, self.data_ids, step_ms, method)
+        print(f"Data exported to {filename} ({rows} rows)")
+
+    def export_csv(self, filename="ble_data.csv", layout='long', step_ms=1000):
         """Export parsed data to CSV"""
-        if HAS_PANDAS:
-            df = pd.DataFrame(self.messages)
-            df.to_csv(filename, index=False)
-        else:
-            # Basic CSV export without pandas
-            with open(filename, 'w') as f:
-                f.write("type,data_id,data_type,value,raw\n")
-                for msg in self.messages:
-                    id = msg['data_id']
-                    if id in self.data_ids:
-                        id = self.data_ids[msg['data_id']]
-                    f.write(f"{msg['type']},{id},{msg['data_type']},{msg['value']},\'{msg['raw']}\n")
-        print(f"Data exported to {filename}")
+        self.export_data(filename, layout, step_ms)
 
 # Example usage
 if __name__ == "__main__":
     import sys
+    import contextlib
+    from pipelineMetrics import PipelineMetrics, capture, emit
     
-    analyzer = BLEMessageAnalyzer()
     if 'idlelib' in sys.modules:
         sys.argv = [sys.argv[0], "C:\\Users\\anton\\Documents\\Ebike\\GitHub\\logs\\Log 2025-10-17 07_29_04large_hex.txt"]
-    if len(sys.argv) > 1:
-        # Load data from file
-        filename = sys.argv[1]
-        analyzer.load_from_file(filename)
-    else:
-        # Use sample data if no file provided
-        sample_data = [
-            "30-02-98-09",
-            "30-07-98-08-08-F4-09-10-01-30-07-98-2D-08-F4-09-10-01",
-            "30-02-98-09-30-04-A2-43-08-11-30-05-A2-4A-08-9B-01-30-04-A2-54-08-2E-30-04-A2-51-08-02-30-04-A2-48-08-6E-30-09-A2-52-0A-05-11-00-02-00-11",
-            "30-07-98-18-08-AF-D3-C0-01",
-            "30-07-98-08-08-A8-08-10-01-30-07-98-2D-08-D1-08-10-01",
-            "30-02-98-09",
-            "30-07-98-18-08-B1-D3-C0-01",
-            "30-07-98-08-08-9B-09-10-01-30-07-98-2D-08-9B-09-10-01",
-            "30-04-98-5A-08-76-30-04-A2-48-08-70-30-05-98-14-08-F2-01-30-04-98-5B-08-4B-30-05-A2-4A-08-93-01-30-04-A2-43-08-12-30-05-A2-4A-08-93-01",
-            "30-02-98-09-30-04-A2-54-08-2F-30-04-A2-51-08-02-30-04-A2-48-08-70-30-09-A2-52-0A-05-15-00-02-00-11",
-            "30-0B-98-74-08-D8-04-10-D8-04-18-D8-04-30-04-98-09-08-01-30-09-A2-52-0A-05-15-00-02-00-11"
-        ]
+    use_cache = '--no-cache' not in sys.argv
+    if not use_cache:
+        sys.argv.remove('--no-cache')
+    verbose = '--verbose' in sys.argv
+    if verbose:
+        sys.argv.remove('--verbose')
+    # --profile[=json|prom|FILE] times every stage, --cprofile=FILE and --tracemalloc=N capture more
+    profile = {}
+    for arg in list(sys.argv[1:]):
+        if arg.startswith(('--profile', '--cprofile', '--tracemalloc')):
+            name, _, value = arg[2:].partition('=')
+            profile[name] = value
+            sys.argv.remove(arg)
+    metrics = PipelineMetrics() if profile else None
+    analyzer = BLEMessageAnalyzer(metrics=metrics, keep_rows=True, verbose=verbose)    # rows for the CSV export
+    run = (capture(metrics, profile.get('cprofile'), int(profile.get('tracemalloc') or 0)) if metrics
+           else contextlib.nullcontext())
+    with run:
+        if len(sys.argv) > 1:
+            # Load data from file, decoded sessions are cached if numpy is available
+            filename = sys.argv[1]
+            cache = None
+            if use_cache and metrics is None:    # a cache hit would leave nothing to measure
+                from sessionCache import SessionCache, HAS_NUMPY
+                cache = SessionCache() if HAS_NUMPY else None
+            analyzer.load_from_file(filename, cache)
+        else:
+            # Use sample data if no file provided
+            sample_data = [
+                "30-02-98-09",
+                "30-07-98-08-08-F4-09-10-01-30-07-98-2D-08-F4-09-10-01",
+                "30-02-98-09-30-04-A2-43-08-11-30-05-A2-4A-08-9B-01-30-04-A2-54-08-2E-30-04-A2-51-08-02-30-04-A2-48-08-6E-30-09-A2-52-0A-05-11-00-02-00-11",
+                "30-07-98-18-08-AF-D3-C0-01",
+                "30-07-98-08-08-A8-08-10-01-30-07-98-2D-08-D1-08-10-01",
+                "30-02-98-09",
+                "30-07-98-18-08-B1-D3-C0-01",
+                "30-07-98-08-08-9B-09-10-01-30-07-98-2D-08-9B-09-10-01",
+                "30-04-98-5A-08-76-30-04-A2-48-08-70-30-05-98-14-08-F2-01-30-04-98-5B-08-4B-30-05-A2-4A-08-93-01-30-04-A2-43-08-12-30-05-A2-4A-08-93-01",
+                "30-02-98-09-30-04-A2-54-08-2F-30-04-A2-51-08-02-30-04-A2-48-08-70-30-09-A2-52-0A-05-15-00-02-00-11",
+                "30-0B-98-74-08-D8-04-10-D8-04-18-D8-04-30-04-98-09-08-01-30-09-A2-52-0A-05-15-00-02-00-11"
+            ]
         
-        print("No file provided, using sample data...")
-        print("Usage: python script.py <hex_data_file.txt>")
-        print()
+            print("No file provided, using sample data...")
+            print("Usage: python script.py <hex_data_file.txt> [--no-cache] [--verbose] [--profile[=json|prom|FILE]] "
+                  "[--cprofile=FILE] [--tracemalloc=N]")
+            print()
         
-        for line in sample_data:
-            analyzer.add_data(line)
+            for line in sample_data:
+                analyzer.add_data(line)
+    if profile.get('cprofile'):
+        print(f"cProfile statistics written to {profile['cprofile']}")
     
     # Analyze results
     analyzer.print_summary()
+    if metrics is not None:
+        metrics.collect(analyzer)
+        written = emit(metrics, profile.get('profile') or 'json', analyzer.data_ids)
+        if written:
+            print(f"Metrics written to {written}")
     analyzer.plot_data()
     
     # Optionally export to CSV
@@ -4,74 +4,223 @@ nRF Connect Hex Message Extractor
 
 This script extracts hex messages from nRF Connect log files.
 It looks for lines containing: "(0x) [hex-data]" received
-and outputs just the hex data to a text file.
+and outputs the notification time (milliseconds since midnight) and the
+hex data to a text file, one "time, hex-data" line per notification.
+
+Large logs are memory mapped and split into chunks at line boundaries that
+are scanned by worker processes; --quiet skips printing every match.
 
 Usage:
-    python hex_extractor.py input_file.txt [output_file.txt]
+    python hexExtractor.py input_file.txt [output_file.txt] [--quiet] [--jobs N]
     
 Example:
-    python hex_extractor.py paste.txt extracted_hex.txt
+    python hexExtractor.py paste.txt extracted_hex.txt
 """
 
 import re
 import sys
 import os
+import mmap
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+# Pattern to match lines with hex messages
+# Looks for: "(0x) [hex-data]" received
+#pattern = r'"?\(0x\)\s+([A-F0-9\-]+)"\s+received'
+#07:29:12.441
+HEX_PATTERN = r'A?([0-9]+):([0-9]+):([0-9]+).([0-9]+)."?\(0x\)\s+([A-F0-9\-]+)"\s+received'
+#pattern = r'A?([0-9\:\.]+)."?\(0x\)\s+([A-F0-9\-]+)"\s+received'
+HEX_REGEX = re.compile(HEX_PATTERN, re.IGNORECASE)
+HEX_REGEX_BYTES = re.compile(HEX_PATTERN.encode('ascii'), re.IGNORECASE)
+
+# cheap test run before the regex, on the lower-cased line like the IGNORECASE regex
+PREFILTER = 'received'
+PREFILTER_BYTES = b'received'
+
+# files are split into chunks of about this size for the worker processes
+CHUNK_SIZE = 16 * 1024 * 1024
+
+def match_time(match):
+    """Time of day in milliseconds of a HEX_PATTERN match"""
+    time_hour = match.group(1)
+    time_min = match.group(2)
+    time_sec = match.group(3)
+    time_milli = match.group(4)
+    return int(time_milli) + 1000 * int(time_sec) + 1000 * 60 * int(time_min) +  1000 * 60 * 60 * int(time_hour)
 
-def extract_hex_messages(input_file, output_file):
+def iter_hex_messages(lines):
+    """
+    Yield the hex messages of an nRF Connect log one at a time.
+    
+    Args:
+        lines: Iterable of log lines, e.g. an open file
+    
+    Yields:
+        tuple: (line_num, tt, hex_data) with tt the time of day in milliseconds
+    """
+    for line_num, line in enumerate(lines, 1):
+        if PREFILTER not in line and PREFILTER not in line.lower():
+            continue
+        match = HEX_REGEX.search(line)
+        if match:
+            yield line_num, match_time(match), match.group(5)
+
+def scan_chunk(data, start, end):
+    """
+    Extract the hex messages of data[start:end], a range of whole lines.
+    
+    Only lines containing PREFILTER (in any case) are handed to the regex,
+    the regex runs on the buffer in place without copying the line.
+    
+    Args:
+        data: bytes-like log content, e.g. an mmap
+    
+    Returns:
+        tuple: ([(line_num, tt, hex_data), ...] with line numbers counted
+                from the chunk start, number of newlines in the chunk)
+    """
+    records = []
+    line_num = 1
+    counted = 0
+    # offsets in lowered are relative to start
+    lowered = data[start:end].lower()
+    pos = lowered.find(PREFILTER_BYTES)
+    while pos != -1:
+        line_start = lowered.rfind(b'\n', 0, pos) + 1
+        line_end = lowered.find(b'\n', pos)
+        if line_end == -1:
+            line_end = len(lowered)
+        match = HEX_REGEX_BYTES.search(data, start + line_start, start + line_end)
+        if match:
+            line_num += lowered.count(b'\n', counted, line_start)
+            counted = line_start
+            records.append((line_num, match_time(match), match.group(5).decode('ascii')))
+        pos = lowered.find(PREFILTER_BYTES, line_end)
+    return records, lowered.count(b'\n')
+
+def chunk_bounds(data, size, chunk_size=CHUNK_SIZE):
+    """Split data[0:size] into (start, end) ranges of about chunk_size ending on newlines"""
+    bounds = []
+    start = 0
+    while start < size:
+        end = data.find(b'\n', min(start + chunk_size, size) - 1)
+        end = size if end == -1 else end + 1
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+def _scan_file_chunk(args):
+    """Worker: scan one chunk of a memory mapped log file"""
+    input_file, start, end = args
+    with open(input_file, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return scan_chunk(data, start, end)
+
+def iter_log_file(input_file, jobs=None, chunk_size=CHUNK_SIZE):
+    """
+    Yield the hex messages of an nRF Connect log file, scanning it memory mapped.
+    
+    Files larger than chunk_size are split at line boundaries and the chunks
+    are scanned by a pool of worker processes; records come back in file order.
+    At most two chunks per worker are scanned ahead of the consumer, so memory
+    stays bounded however slowly the records are consumed.
+    
+    Args:
+        input_file: Path to the input log file
+        jobs: Worker processes, None for one per CPU, 1 to scan in this process
+        chunk_size: Approximate chunk size in bytes
+    
+    Yields:
+        tuple: (line_num, tt, hex_data) as iter_hex_messages
+    """
+    size = os.path.getsize(input_file)
+    if size == 0:
+        return
+    with open(input_file, 'rb') as file:
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            bounds = chunk_bounds(data, size, chunk_size)
+            if jobs == 1 or len(bounds) == 1:
+                yield from _renumber(scan_chunk(data, start, end) for start, end in bounds)
+                return
+    workers = jobs or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        tasks = ((input_file, start, end) for start, end in bounds)
+        yield from _renumber(_bounded_map(executor, _scan_file_chunk, tasks, 2 * workers))
+
+def _bounded_map(executor, fn, tasks, ahead):
+    """executor.map in order with at most ahead tasks submitted but not yet yielded"""
+    pending = deque(executor.submit(fn, task) for task in islice(tasks, ahead))
+    while pending:
+        result = pending.popleft().result()
+        for task in islice(tasks, 1):
+            pending.append(executor.submit(fn, task))
+        yield result
+
+def _renumber(chunks):
+    """Turn chunk relative line numbers of scan_chunk results into file line numbers"""
+    line_offset = 0
+    for records, newlines in chunks:
+        for line_num, tt, hex_data in records:
+            yield line_num + line_offset, tt, hex_data
+        line_offset += newlines
+
+def write_hex_messages(records, output_file):
+    """
+    Write (line_num, tt, hex_data) records to output_file as "tt, hex_data" lines
+    while passing them through.
+    
+    Lets a pipeline keep the intermediate _hex.txt file as an optional side output.
+    """
+    with open(output_file, 'w', encoding='utf-8') as file:
+        for record in records:
+            file.write(f"{record[1]}, {record[2]}\n")
+            yield record
+
+def extract_hex_messages(input_file, output_file, quiet=False, jobs=None):
     """
     Extract hex messages from nRF Connect log file.
     
     Args:
         input_file: Path to the input log file
         output_file: Path to the output text file for hex messages
+        quiet: Do not print every match, only the final report
+        jobs: Worker processes for large files, None for one per CPU
     
     Returns:
         int: Number of hex messages extracted
     """
     
-    # Pattern to match lines with hex messages
-    # Looks for: "(0x) [hex-data]" received
-    #pattern = r'"?\(0x\)\s+([A-F0-9\-]+)"\s+received'
-    #07:29:12.441
-    pattern = r'A?([0-9]+):([0-9]+):([0-9]+).([0-9]+)."?\(0x\)\s+([A-F0-9\-]+)"\s+received'
-    #pattern = r'A?([0-9\:\.]+)."?\(0x\)\s+([A-F0-9\-]+)"\s+received'
-    hex_messages = []
+    count = 0
+    first_messages = []
     
     try:
-        with open(input_file, 'r', encoding='utf-8') as file:
-            for line_num, line in enumerate(file, 1):
-                match = re.search(pattern, line, re.IGNORECASE)
-                if match:
-                    time_hour = match.group(1)
-                    time_min = match.group(2)
-                    time_sec = match.group(3)
-                    time_milli = match.group(4)
-                    tt =  int(time_milli) + 1000 * int(time_sec) + 1000 * 60 * int(time_min) +  1000 * 60 * 60 * int(time_hour)
-                    hex_data = match.group(5)
-                    print(f"{tt}"  + ", " + hex_data)
-                    hex_messages.append(hex_data)
-                    #hex_messages.append(f"{tt}" + ", " + hex_data)
-                    if len(hex_messages) <= 10:  # Only show first 10 to avoid spam
-                        print(f"Line {line_num}: Found hex message")
-                    elif len(hex_messages) == 11:
-                        print("... (showing first 10, continuing extraction)")
-        
-        # Write extracted hex messages to output file
-        with open(output_file, 'w', encoding='utf-8') as file:
-            for hex_msg in hex_messages:
-                file.write(hex_msg + '\n')
+        with open(output_file, 'w', encoding='utf-8') as out:
+            for line_num, tt, hex_data in iter_log_file(input_file, jobs):
+                out.write(f"{tt}, {hex_data}\n")
+                count += 1
+                if count <= 3:
+                    first_messages.append(hex_data)
+                if quiet:
+                    continue
+                print(f"{tt}"  + ", " + hex_data)
+                if count <= 10:  # Only show first 10 to avoid spam
+                    print(f"Line {line_num}: Found hex message")
+                elif count == 11:
+                    print("... (showing first 10, continuing extraction)")
         
         print(f"\nExtraction complete!")
-        print(f"Found {len(hex_messages)} hex messages")
+        print(f"Found {count} hex messages")
         print(f"Output saved to: {output_file}")
         
         # Show first few examples
-        if hex_messages:
+        if first_messages:
             print(f"\nFirst 3 extracted messages:")
-            for i, msg in enumerate(hex_messages[:3]):
+            for i, msg in enumerate(first_messages):
                 print(f"{i+1}: {msg}")
         
-        return len(hex_messages)
+        return count
     
     except FileNotFoundError:
         print(f"Error: Could not find file '{input_file}'")
@@ -82,16 +231,20 @@ def extract_hex_messages(input_file, output_file):
 
 def main():
     """Main function to handle command line arguments."""
-    if len(sys.argv) < 2:
-        print("Usage: python hex_extractor.py input_file.txt [output_file.txt]")
-        print("Example: python hex_extractor.py paste.txt extracted_hex.txt")
-        sys.exit(1)
+    parser = argparse.ArgumentParser(description="Extract hex messages from an nRF Connect log",
+                                     epilog="Example: python hexExtractor.py paste.txt extracted_hex.txt")
+    parser.add_argument('input_file', help="nRF Connect log file")
+    parser.add_argument('output_file', nargs='?', help="output file (default <name>_hex.txt)")
+    parser.add_argument('-q', '--quiet', action='store_true', help="do not print every match")
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help="worker processes for large files (default: CPU count)")
+    args = parser.parse_args()
     
-    input_file = sys.argv[1]
+    input_file = args.input_file
     
     # Generate output filename if not provided
-    if len(sys.argv) >= 3:
-        output_file = sys.argv[2]
+    if args.output_file:
+        output_file = args.output_file
     else:
         base_name = os.path.splitext(input_file)[0]
         output_file = f"{base_name}_hex.txt"
@@ -105,7 +258,7 @@ def main():
     print(f"Output will be saved to: {output_file}")
     print("-" * 50)
     
-    count = extract_hex_messages(input_file, output_file)
+    count = extract_hex_messages(input_file, output_file, args.quiet, args.jobs)
     
     if count > 0:
         print(f"\n✓ Successfully extracted {count} hex messages!")
@@ -113,4 +266,4 @@ def main():
         print("\n✗ No hex messages found or extraction failed.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -0,0 +1,193 @@
+"""
+Live Follow Mode for a Growing nRF Connect Log
+
+Works like "tail -f" on the log nRF Connect is writing during a ride: new
+lines are picked up by a polling asyncio task and decoded into the same
+BLEMessageAnalyzer, so statistics and plots are current while riding.
+
+    nRF Connect log -> LogFollower.poll -> iter_hex_messages -> BLEMessageAnalyzer
+
+The file is polled every poll_interval while data arrives and backs off to
+idle_interval when it does not, so an idle log costs one stat call per
+interval. New lines refresh the summary as soon as they are read, unless
+the last refresh is less than refresh_interval ago; then the follower
+sleeps just until that gate opens and refreshes. Either way a written line
+shows up within max(idle_interval, refresh_interval), 100 ms. A log that is rotated (replaced by a new file) or truncated is
+reopened from its start; a line is only decoded once its newline is written.
+
+Usage:
+    analyzer = BLEMessageAnalyzer()
+    asyncio.run(follow_log("Log 2025-06-26 20_32_08.txt", analyzer))
+"""
+
+import asyncio
+import os
+import time
+
+from hexExtractor import iter_hex_messages
+
+POLL_INTERVAL = 0.02        # s between polls while the log grows
+IDLE_INTERVAL = 0.08        # s between polls of an idle log
+REFRESH_INTERVAL = 0.1      # s between summary refreshes, only after new data
+READ_SIZE = 1024 * 1024
+
+
+class LogFollower:
+    """Read the lines appended to a log file, across rotation and truncation"""
+
+    def __init__(self, path, from_start=True):
+        """
+        Args:
+            path: Log file, it may not exist yet
+            from_start: Read the lines already in the file, else only new ones
+        """
+        self.path = path
+        self.from_start = from_start
+        self.file = None
+        self.partial = b''          # bytes of a line without its newline yet
+        self.line_num = 0           # lines handed out so far, across rotations
+        self.rotations = 0
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def _open(self):
+        try:
+            self.file = open(self.path, 'rb')
+        except FileNotFoundError:
+            return False
+        if not self.from_start:
+            self.file.seek(0, os.SEEK_END)
+            self.from_start = True      # a rotated file is read from its start
+        return True
+
+    def _replaced(self):
+        """True if path now names another file or the file was truncated"""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return False                # rotation in progress, keep the old file
+        own = os.fstat(self.file.fileno())
+        return (st.st_ino, st.st_dev) != (own.st_ino, own.st_dev) or st.st_size < self.file.tell()
+
+    def _read(self):
+        chunks = []
+        while True:
+            data = self.file.read(READ_SIZE)
+            if not data:
+                return b''.join(chunks)
+            chunks.append(data)
+
+    def poll(self):
+        """
+        Return the complete lines appended since the last poll.
+
+        Returns:
+            list: (line_num, line) tuples, line numbers keep counting across rotations
+        """
+        if self.file is None and not self._open():
+            return []
+        data = self._read()
+        if not data and self._replaced():
+            self.close()
+            self.partial = b''
+            self.rotations += 1
+            if not self._open():
+                return []
+            data = self._read()
+        if not data:
+            return []
+        data = self.partial + data
+        end = data.rfind(b'\n') + 1
+        self.partial = data[end:]
+        lines = data[:end].decode('utf-8', errors='replace').splitlines()
+        first = self.line_num + 1
+        self.line_num += len(lines)
+        return list(enumerate(lines, first))
+
+
+def iter_new_messages(numbered_lines):
+    """Hex message records (line_num, tt, hex_data) of poll() output"""
+    if not numbered_lines:
+        return
+    offset = numbered_lines[0][0] - 1
+    for line_num, tt, hex_data in iter_hex_messages(line for _, line in numbered_lines):
+        yield line_num + offset, tt, hex_data
+
+
+def print_live_summary(analyzer):
+    """Default refresh: clear the terminal and print the analyzer summary"""
+    print("\033[H\033[J", end='')
+    analyzer.print_summary()
+
+
+async def follow_log(path, analyzer, on_update=print_live_summary, from_start=True,
+                     poll_interval=POLL_INTERVAL, idle_interval=IDLE_INTERVAL,
+                     refresh_interval=REFRESH_INTERVAL, idle_timeout=None, hex_output=None):
+    """
+    Decode a growing nRF Connect log into analyzer until cancelled.
+
+    Args:
+        path: nRF Connect log file
+        analyzer: BLEMessageAnalyzer that keeps the decoded state
+        on_update: on_update(analyzer) after new data, at most every refresh_interval
+        from_start: Also decode the lines already in the log
+        poll_interval, idle_interval: Polling period in s with and without new data
+        refresh_interval: Shortest period in s between two on_update calls
+        idle_timeout: Stop after this many s without new data, None to run until cancelled
+        hex_output: Optional open text file, every record is appended as "tt, hex_data"
+
+    Returns:
+        LogFollower: the follower, for its line and rotation counters
+    """
+    follower = LogFollower(path, from_start)
+    interval = poll_interval
+    last_data = last_refresh = time.monotonic()
+    pending = False
+    try:
+        while True:
+            lines = follower.poll()
+            now = time.monotonic()
+            if lines:
+                records = iter_new_messages(lines)
+                if hex_output is not None:
+                    records = _write_records(records, hex_output)
+                if analyzer.load_records(records):
+                    pending = True
+                last_data = now
+                interval = poll_interval
+            else:
+                interval = min(interval * 2, idle_interval)
+                if idle_timeout is not None and now - last_data >= idle_timeout:
+                    break
+            if pending and on_update is not None and now - last_refresh >= refresh_interval:
+                on_update(analyzer)
+                last_refresh = now
+                pending = False
+            sleep = interval
+            if pending and on_update is not None:
+                # wake up when the refresh gate opens, not a whole interval later
+                sleep = min(sleep, max(0.0, last_refresh + refresh_interval - now))
+            await asyncio.sleep(sleep)
+    finally:
+        follower.close()
+        if pending and on_update is not None:
+            on_update(analyzer)
+    return follower
+
+
+def _write_records(records, hex_output):
+    for record in records:
+        hex_output.write(f"{record[1]}, {record[2]}\n")
+        yield record
+    hex_output.flush()
+
+
+def run_follow(path, analyzer, **kwargs):
+    """Run follow_log until Ctrl+C, see follow_log for the arguments"""
+    try:
+        return asyncio.run(follow_log(path, analyzer, **kwargs))
+    except KeyboardInterrupt:
+        print("\nStopped following", path)
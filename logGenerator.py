@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Synthetic Ride Log Generator
+
+Writes nRF Connect logs or extracted _hex.txt files of any size for testing
+and benchmarking. A simple ride model (speed, cadence, rider and motor
+power, assist mode, battery, odometer) drives the known data IDs, so the
+decoded series look like a ride; unknown IDs carry random varints of
+configurable byte widths. The output only depends on the seed and the
+options, the same call always produces the same file.
+
+Options:
+    id_mix          {data_id: relative rate} of the varint frames, default RIDE_ID_MIX
+    varint_widths   byte widths of the unknown varints, e.g. (1, 2, 5)
+    array_rate      share of 0x0A array frames (A252 distance per mode, 108C custom)
+    multi_rate      share of notifications carrying several frames
+    split_rate      share of notifications whose last frame continues in the next one
+    noise_rate      share of log lines that are not notifications (nRF log only)
+
+Usage:
+    python logGenerator.py out.txt --frames 1000000 [--hex] [--seed N] [--split-rate 0.01]
+
+    for tt, data in generate_notifications(10000, seed=1):
+        ...
+    write_nrf_log("ride.txt", 1000000)
+"""
+
+import argparse
+import random
+
+from timeIndex import format_time_of_day
+
+# relative rates of the varint data IDs, about what a Smart System bike sends while riding
+RIDE_ID_MIX = {
+    0x982D: 20,     # Speed
+    0x985A: 15,     # Cadence
+    0x985B: 15,     # HumanPower
+    0x985D: 15,     # MotorPower
+    0x9815: 10,     # Torque?
+    0x9809: 5,      # AssistMode
+    0x9818: 3,      # TotalDist
+    0x80BC: 1,      # Battery
+    0x809C: 1,      # BatteryDelivered
+    0x9808: 2,
+    0x8091: 2,
+    0xA243: 3,
+    0xA248: 3,
+    0xA251: 2,
+}
+UNKNOWN_IDS = (0x981A, 0x9865, 0x808B, 0x8B2C, 0x80C4, 0xA254)
+VARINT_WIDTHS = (1, 2, 3)
+START_TIME = 7 * 3600 * 1000        # 07:00:00.000
+
+
+def encode_varint(value):
+    """Protobuf varint bytes of a non negative int"""
+    out = bytearray()
+    while value > 0x7F:
+        out.append(value & 0x7F | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def varint_frame(data_id, value):
+    """30 | len | id | 08 varint; a value of 0 is sent as the bare header, as the bike does"""
+    if value == 0:
+        return bytes((0x30, 2, data_id >> 8, data_id & 0xFF))
+    payload = bytes((data_id >> 8, data_id & 0xFF, 0x08)) + encode_varint(value)
+    return bytes((0x30, len(payload))) + payload
+
+
+def array_frame(data_id, values):
+    """30 | len | id | 0A len packed varints"""
+    packed = b''.join(encode_varint(value) for value in values)
+    payload = bytes((data_id >> 8, data_id & 0xFF, 0x0A, len(packed))) + packed
+    return bytes((0x30, len(payload))) + payload
+
+
+def dist_per_mode_frame(seq, distance, arg):
+    """108C custom frame: C0 80 seq, then a message of two varint fields"""
+    message = b'\x08' + encode_varint(distance) + b'\x10' + encode_varint(arg)
+    payload = bytes((0x10, 0x8C, 0xC0, 0x80, seq & 0xFF, 0x0A, len(message))) + message
+    return bytes((0x30, len(payload))) + payload
+
+
+class RideModel:
+    """Slowly varying ride signals in the units and scales of decoderRegistry"""
+
+    def __init__(self, rng):
+        self.rng = rng
+        self.speed = 0.0            # km/h
+        self.cadence = 0.0          # rpm
+        self.human = 0.0            # W
+        self.mode = 2
+        self.battery = 100.0        # %
+        self.delivered = 0.0        # Wh
+        self.odometer = 1234567.0   # m
+        self.mode_dist = [946000, 3214000, 5073000, 3986000, 60000]
+
+    def step(self, dt_ms):
+        rng = self.rng
+        if rng.random() < 0.0005:
+            self.mode = rng.randrange(5)
+        target = 8 + 5 * self.mode
+        self.speed = max(0.0, self.speed + (target - self.speed) * 0.01 + rng.gauss(0, 0.3))
+        self.cadence = max(0.0, self.speed * 3.2 + rng.gauss(0, 2))
+        self.human = max(0.0, self.speed * 6 + rng.gauss(0, 15))
+        km = self.speed * dt_ms / 3600000
+        self.odometer += km * 1000
+        self.mode_dist[self.mode] += km * 1000
+        wh = self.motor() * dt_ms / 3600000
+        self.delivered += wh
+        self.battery = max(0.0, self.battery - wh / 5)
+
+    def motor(self):
+        return self.human * 0.6 * self.mode
+
+    def value(self, data_id):
+        """Raw (unscaled) value of a known data ID, None for unknown IDs"""
+        if data_id == 0x982D:
+            return int(self.speed * 100)
+        if data_id == 0x985A:
+            return int(self.cadence * 2)
+        if data_id == 0x985B:
+            return int(self.human)
+        if data_id == 0x985D:
+            return int(self.motor())
+        if data_id == 0x9815:
+            return int(self.human * 40)
+        if data_id == 0x9809:
+            return self.mode
+        if data_id == 0x9818:
+            return int(self.odometer)
+        if data_id == 0x80BC:
+            return int(self.battery)
+        if data_id == 0x809C:
+            return int(self.delivered)
+        return None
+
+
+def generate_notifications(frames, seed=0, id_mix=None, varint_widths=VARINT_WIDTHS, array_rate=0.02,
+                           multi_rate=0.3, split_rate=0.0, start_time=START_TIME):
+    """
+    Yield (time of day in ms, notification bytes) until frames frames were generated.
+
+    Split notifications end inside a frame that the next notification completes,
+    see frameReassembler.
+    """
+    rng = random.Random(seed)
+    id_mix = RIDE_ID_MIX if id_mix is None else id_mix
+    ids = list(id_mix) + list(UNKNOWN_IDS)
+    weights = list(id_mix.values()) + [1] * len(UNKNOWN_IDS)
+    ride = RideModel(rng)
+    tt = start_time
+    seq = 0
+    carry = b''
+    made = 0
+    while made < frames:
+        dt = rng.randint(20, 400)
+        tt += dt
+        ride.step(dt)
+        count = min(rng.randint(2, 6) if rng.random() < multi_rate else 1, frames - made)
+        data = bytearray(carry)
+        last = len(data)        # start of the last frame, a split cuts into it
+        for data_id in rng.choices(ids, weights, k=count):
+            last = len(data)
+            if rng.random() < array_rate:
+                if rng.random() < 0.5:
+                    data += array_frame(0xA252, [rng.randrange(64) for _ in range(5)])
+                else:
+                    mode = rng.randrange(5)
+                    data += dist_per_mode_frame(seq, int(ride.mode_dist[mode]), rng.randrange(30000))
+                    seq += 1
+                continue
+            value = ride.value(data_id)
+            if value is None:
+                value = rng.getrandbits(7 * rng.choice(varint_widths))
+            data += varint_frame(data_id, value)
+        made += count
+        carry = b''
+        if made < frames and rng.random() < split_rate and len(data) - last > 1:
+            cut = rng.randrange(last + 1, len(data))
+            data, carry = data[:cut], bytes(data[cut:])
+        yield tt, bytes(data)
+    if carry:
+        yield tt + 1, carry
+
+
+def hex_text(data):
+    """Notification bytes as nRF Connect prints them, e.g. 30-02-98-09"""
+    return data.hex('-').upper()
+
+
+def write_hex_log(filename, frames, seed=0, **options):
+    """Write a _hex.txt file ("time, hex" per line) of frames frames; returns the line count"""
+    lines = 0
+    with open(filename, 'w', buffering=1 << 20) as f:
+        for tt, data in generate_notifications(frames, seed, **options):
+            f.write(f"{tt}, {hex_text(data)}\n")
+            lines += 1
+    return lines
+
+
+def write_nrf_log(filename, frames, seed=0, noise_rate=0.05, **options):
+    """Write an nRF Connect log of frames frames with some other log lines in between; returns the line count"""
+    noise_rng = random.Random(seed + 1)
+    lines = 0
+    with open(filename, 'w', buffering=1 << 20) as f:
+        for tt, data in generate_notifications(frames, seed, **options):
+            time_of_day = format_time_of_day(tt)
+            if noise_rng.random() < noise_rate:
+                f.write(f"D\t{time_of_day}\tgatt.setCharacteristicNotification"
+                        f"(00000011-eaa2-11e9-81b4-2a2ae2dbcce4, true)\n")
+                lines += 1
+            f.write(f"A\t{time_of_day}\t\"(0x) {hex_text(data)}\" received\n")
+            lines += 1
+    return lines
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Write a synthetic ride log")
+    parser.add_argument('output_file', help="log file to write")
+    parser.add_argument('--frames', type=int, default=10000, help="number of 0x30 frames (default 10000)")
+    parser.add_argument('--hex', action='store_true', help="write an extracted _hex.txt file, not an nRF Connect log")
+    parser.add_argument('--seed', type=int, default=0, help="random seed (default 0)")
+    parser.add_argument('--varint-widths', default='1,2,3', help="byte widths of unknown varints (default 1,2,3)")
+    parser.add_argument('--array-rate', type=float, default=0.02, help="share of array frames (default 0.02)")
+    parser.add_argument('--multi-rate', type=float, default=0.3, help="share of multi frame notifications (default 0.3)")
+    parser.add_argument('--split-rate', type=float, default=0.0, help="share of notifications with a split frame")
+    args = parser.parse_args()
+
+    options = dict(varint_widths=tuple(int(width) for width in args.varint_widths.split(',')),
+                   array_rate=args.array_rate, multi_rate=args.multi_rate, split_rate=args.split_rate)
+    if args.hex:
+        lines = write_hex_log(args.output_file, args.frames, args.seed, **options)
+    else:
+        lines = write_nrf_log(args.output_file, args.frames, args.seed, **options)
+    print(f"{args.frames} frames in {lines} lines written to {args.output_file}")
+
+
+if __name__ == "__main__":
+    main()
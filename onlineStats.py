@@ -0,0 +1,338 @@
+"""
+Streaming Statistics for BLE Data Series
+
+Constant memory statistics that are updated one value at a time and can be
+merged, so partial results of different log chunks combine into the same
+summary a single pass would give.
+
+Trackers (all with update(value, time), merge(later) and summary(), and
+optionally new_segment() to forget the previous sample before merging a
+separate ride):
+    RunningStats     count, min, max, mean, variance (Welford / Chan et al.)
+    RecentValues     bounded ring buffer of the latest values
+    QuantileDigest   approximate quantiles (merging t-digest)
+    RateOfChange     change per second between consecutive samples
+
+SeriesStats bundles one instance of each default tracker per data key,
+RunningStats and RecentValues, which cost a few operations per value. The
+t-digest and rate trackers are opt-in (trackers('quantiles', 'rate') or
+STAT_TRACKERS for all), further trackers can be plugged in with
+register_tracker.
+
+Usage:
+    stats = SeriesStats(trackers('stats', 'recent', 'quantiles'))
+    for t, v in samples:
+        stats.update(v, t)
+    stats.merge(stats_of_next_chunk)
+    print(stats.count, stats.mean, stats['quantiles'].quantile(0.95))
+"""
+
+import math
+from collections import deque
+
+
+class RunningStats:
+    """Count, min, max, mean and variance with Welford's online algorithm"""
+
+    def __init__(self):
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self._m2 = 0.0
+
+    def update(self, value, time=None):
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        delta = value - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (value - self.mean)
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        if self.count == 0:
+            self.count, self.min, self.max = other.count, other.min, other.max
+            self.mean, self._m2 = other.mean, other._m2
+            return self
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance, 0 for fewer than two values"""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def summary(self):
+        return {'count': self.count, 'min': self.min, 'max': self.max,
+                'mean': self.mean, 'std': self.std}
+
+
+class RecentValues:
+    """The latest `size` values"""
+
+    def __init__(self, size=5):
+        self.values = deque(maxlen=size)
+
+    def update(self, value, time=None):
+        self.values.append(value)
+
+    def merge(self, other):
+        # other holds the later chunk, its values are the more recent ones
+        self.values.extend(other.values)
+        return self
+
+    def summary(self):
+        return {'recent': list(self.values)}
+
+
+class QuantileDigest:
+    """
+    Approximate quantiles with a merging t-digest.
+
+    Values are collected in a small buffer and folded into at most about
+    `compression` centroids, so memory stays bounded however long the log is.
+    Accuracy is best towards the tails (p1, p99) where it matters most.
+    """
+
+    def __init__(self, compression=100):
+        self.compression = compression
+        self.centroids = []         # sorted [mean, weight] pairs
+        self._buffer = []
+        self.count = 0
+        self.min = None
+        self.max = None
+
+    def update(self, value, time=None):
+        self._buffer.append(value)
+        self.count += 1
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+        if len(self._buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other):
+        if other.count == 0:
+            return self
+        self._buffer.extend(other._buffer)
+        self.centroids.extend(other.centroids)
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _compress(self):
+        points = sorted([[float(v), 1.0] for v in self._buffer] + self.centroids)
+        self._buffer = []
+        if not points:
+            return
+        total = sum(w for _, w in points)
+        merged = [list(points[0])]
+        cumulative = 0.0
+        for mean, weight in points[1:]:
+            current = merged[-1]
+            q = (cumulative + current[1] + weight / 2) / total
+            limit = 4 * total * q * (1 - q) / self.compression
+            if current[1] + weight <= max(limit, 1.0):
+                current[0] += (mean - current[0]) * weight / (current[1] + weight)
+                current[1] += weight
+            else:
+                cumulative += current[1]
+                merged.append([mean, weight])
+        self.centroids = merged
+
+    def quantile(self, q):
+        """Value below which a fraction q of the samples lie, None if empty"""
+        if self.count == 0:
+            return None
+        if self._buffer:
+            self._compress()
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        target = q * self.count
+        cumulative = 0.0
+        prev_mean, prev_center = self.min, 0.0
+        for mean, weight in self.centroids:
+            center = cumulative + weight / 2
+            if target < center:
+                span = center - prev_center
+                frac = (target - prev_center) / span if span > 0 else 0.0
+                return prev_mean + (mean - prev_mean) * frac
+            cumulative += weight
+            prev_mean, prev_center = mean, center
+        span = self.count - prev_center
+        frac = (target - prev_center) / span if span > 0 else 0.0
+        return prev_mean + (self.max - prev_mean) * frac
+
+    def summary(self):
+        return {'p05': self.quantile(0.05), 'p50': self.quantile(0.5), 'p95': self.quantile(0.95)}
+
+
+class RateOfChange:
+    """Change per second between consecutive timed samples"""
+
+    def __init__(self):
+        self.first = None           # (time, value)
+        self.last = None
+        self.rate = None            # latest rate
+        self.min_rate = None
+        self.max_rate = None
+
+    def _add_rate(self, rate):
+        self.rate = rate
+        if self.min_rate is None or rate < self.min_rate:
+            self.min_rate = rate
+        if self.max_rate is None or rate > self.max_rate:
+            self.max_rate = rate
+
+    def update(self, value, time=None):
+        if time is None:
+            return
+        if self.last is not None and time > self.last[0]:
+            self._add_rate((value - self.last[1]) * 1000 / (time - self.last[0]))
+        if self.first is None:
+            self.first = (time, value)
+        self.last = (time, value)
+
+    def new_segment(self):
+        """Forget the previous sample, the next merge is a separate ride and gets no rate to it"""
+        self.last = None
+
+    def merge(self, other):
+        if other.first is None:
+            return self
+        if self.last is not None and other.first[0] > self.last[0]:
+            self._add_rate((other.first[1] - self.last[1]) * 1000 / (other.first[0] - self.last[0]))
+        for rate in (other.min_rate, other.max_rate):
+            if rate is not None:
+                self._add_rate(rate)
+        if other.rate is not None:
+            self.rate = other.rate
+        if self.first is None:
+            self.first = other.first
+        self.last = other.last
+        return self
+
+    def summary(self):
+        return {'rate': self.rate, 'min_rate': self.min_rate, 'max_rate': self.max_rate}
+
+
+# every tracker by name
+STAT_TRACKERS = {
+    'stats': RunningStats,
+    'recent': RecentValues,
+    'quantiles': QuantileDigest,
+    'rate': RateOfChange,
+}
+# trackers of a SeriesStats created without a choice, cheap enough for every value
+DEFAULT_TRACKERS = {name: STAT_TRACKERS[name] for name in ('stats', 'recent')}
+
+
+def trackers(*names):
+    """{name: factory} of registered trackers, e.g. BLEMessageAnalyzer(stat_trackers=trackers('stats', 'rate'))"""
+    return {name: STAT_TRACKERS[name] for name in names}
+
+
+def register_tracker(name, factory, default=True):
+    """
+    Register a tracker, with default also in every SeriesStats created afterwards without a choice.
+
+    factory() must return an object with update(value, time), merge(later) and summary().
+    """
+    STAT_TRACKERS[name] = factory
+    if default:
+        DEFAULT_TRACKERS[name] = factory
+
+
+class SeriesStats:
+    """
+    One instance of every default tracker, or of the given ones, for a single data key.
+
+    The 'stats' tracker (RunningStats) backs count/min/max/mean/std and is
+    always installed, also when custom trackers leave it out.
+    """
+
+    def __init__(self, trackers=None):
+        trackers = DEFAULT_TRACKERS if trackers is None else trackers
+        self.trackers = {name: factory() for name, factory in trackers.items()}
+        if 'stats' not in self.trackers:
+            self.trackers['stats'] = RunningStats()
+        self._running = self.trackers['stats']
+
+    def __getitem__(self, name):
+        return self.trackers[name]
+
+    def update(self, value, time=None):
+        for tracker in self.trackers.values():
+            tracker.update(value, time)
+
+    def merge(self, other, new_ride=False):
+        """Merge the stats of a later chunk of the same series, or of another ride if new_ride"""
+        if new_ride:
+            for tracker in self.trackers.values():
+                if hasattr(tracker, 'new_segment'):
+                    tracker.new_segment()
+        for name, tracker in other.trackers.items():
+            if name in self.trackers:
+                self.trackers[name].merge(tracker)
+            else:
+                self.trackers[name] = tracker
+        return self
+
+    def summary(self):
+        result = {}
+        for tracker in self.trackers.values():
+            result.update(tracker.summary())
+        return result
+
+    @property
+    def count(self):
+        return self._running.count
+
+    @property
+    def min(self):
+        return self._running.min
+
+    @property
+    def max(self):
+        return self._running.max
+
+    @property
+    def mean(self):
+        return self._running.mean
+
+    @property
+    def std(self):
+        return self._running.std
+
+    @property
+    def recent(self):
+        return list(self.trackers['recent'].values) if 'recent' in self.trackers else []
+
+
+def merge_id_stats(target, other, new_ride=False):
+    """Merge a {data key: SeriesStats} dict of a later chunk (or ride, see SeriesStats.merge) into target"""
+    for key, stats in other.items():
+        if key in target:
+            target[key].merge(stats, new_ride)
+        else:
+            target[key] = stats
+    return target
@@ -0,0 +1,288 @@
+"""
+Counters and Timers of the Decode Pipeline
+
+With BLEMessageAnalyzer(metrics=PipelineMetrics()) every line goes through an
+instrumented add_data that times each stage with monotonic nanosecond
+clocks:
+
+    extract     reading/matching the log lines (regex for nRF Connect logs)
+    decode      BLEMessageAnalyzer.decode_line: hex text -> bytes, carrying
+                split frames into the next line (--reassemble), frame
+                splitting and value decoding, memo lookups included
+    store       columns, statistics, and the prints of add_data
+    print       time spent writing to stdout, part of store, see capture
+
+and counts lines, bytes scanned (after reassembly), frames, bytes outside
+any frame, frame cache hits/misses and reassembly resyncs; per data ID it
+counts frames and bytes, and per decoder and data ID the calls and time
+spent decoding (frame cache misses only, hits are not decoded). Without
+metrics the analyzer pays one attribute check per line.
+
+capture() additionally times stdout and optionally runs cProfile and
+tracemalloc for the duration of a run. Metrics are emitted as JSON or in
+the Prometheus text format.
+
+Usage:
+    metrics = PipelineMetrics()
+    analyzer = BLEMessageAnalyzer(metrics=metrics)
+    with capture(metrics, cprofile="run.prof", tracemalloc_top=10):
+        analyzer.load_from_file("Log_hex.txt")
+    metrics.collect(analyzer)
+    print(metrics.to_prometheus())
+"""
+
+import contextlib
+import json
+import sys
+from collections import Counter
+from time import perf_counter_ns
+
+NS = 1e-9
+# gauges that merge as the larger value instead of the sum
+MAX_GAUGES = ('traced_memory_peak_bytes',)
+
+
+class PipelineMetrics:
+    """Counters and stage timers, plain data so it pickles and merges"""
+
+    def __init__(self):
+        self.counters = Counter()       # name -> count
+        self.stage_ns = Counter()       # stage -> ns
+        self.stage_calls = Counter()    # stage -> calls
+        self.id_frames = Counter()      # 'XXXX' -> frames
+        self.id_bytes = Counter()       # 'XXXX' -> frame bytes
+        self.decoder_ns = Counter()     # (decoder name, 'XXXX') -> ns
+        self.decoder_calls = Counter()  # (decoder name, 'XXXX') -> calls
+        self.gauges = {}                # name -> value at collect()
+        self.allocations = []           # tracemalloc top lines, see capture
+        self._timed_specs = {}          # DecoderSpec -> spec with timed decoder
+
+    def __getstate__(self):
+        state = dict(self.__dict__)
+        state['_timed_specs'] = {}      # specs hold closures
+        return state
+
+    def add_time(self, stage, ns, calls=1):
+        self.stage_ns[stage] += ns
+        self.stage_calls[stage] += calls
+
+    def timed_iter(self, stage, iterable):
+        """Yield from iterable, timing the time spent producing each item as stage"""
+        iterator = iter(iterable)
+        while True:
+            start = perf_counter_ns()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                self.add_time(stage, perf_counter_ns() - start, 0)
+                return
+            self.add_time(stage, perf_counter_ns() - start)
+            yield item
+
+    @contextlib.contextmanager
+    def timed(self, stage):
+        start = perf_counter_ns()
+        try:
+            yield
+        finally:
+            self.add_time(stage, perf_counter_ns() - start)
+
+    def timed_spec(self, spec, data_id):
+        """spec with its decoder wrapped to record time per (decoder, data ID)"""
+        key = (spec, data_id)
+        timed = self._timed_specs.get(key)
+        if timed is None:
+            decoder = spec.decoder
+            name = (getattr(decoder, '__name__', 'decoder'), f"{data_id:04X}")
+            decoder_ns = self.decoder_ns
+            decoder_calls = self.decoder_calls
+
+            def timed_decoder(view, pos, end):
+                start = perf_counter_ns()
+                try:
+                    return decoder(view, pos, end)
+                finally:
+                    decoder_ns[name] += perf_counter_ns() - start
+                    decoder_calls[name] += 1
+
+            timed = self._timed_specs[key] = spec._replace(decoder=timed_decoder)
+        return timed
+
+    def collect(self, analyzer):
+        """Take the frame cache and reassembly counters of an analyzer as gauges"""
+        if analyzer.frame_memo is not None:
+            for name, value in analyzer.frame_memo.stats().items():
+                self.gauges[f"frame_cache_{name}"] = value
+        if analyzer.reassembler is not None:
+            for name, value in analyzer.reassembler.stats().items():
+                self.gauges[f"reassembly_{name}"] = value
+        self.gauges['series'] = len(analyzer.store.series_keys())
+        self.gauges['values'] = len(analyzer.store)
+
+    def merge(self, other):
+        """Add the metrics of another run; gauges add up, except MAX_GAUGES and the hit rate"""
+        for name in ('counters', 'stage_ns', 'stage_calls', 'id_frames', 'id_bytes', 'decoder_ns', 'decoder_calls'):
+            getattr(self, name).update(getattr(other, name))
+        for name, value in other.gauges.items():
+            if name in MAX_GAUGES:
+                self.gauges[name] = max(self.gauges.get(name, value), value)
+            else:
+                self.gauges[name] = self.gauges.get(name, 0) + value
+        if 'frame_cache_hit_rate' in self.gauges:
+            # a rate does not add up, take it from the merged counts
+            lookups = self.gauges.get('frame_cache_hits', 0) + self.gauges.get('frame_cache_misses', 0)
+            self.gauges['frame_cache_hit_rate'] = self.gauges.get('frame_cache_hits', 0) / lookups if lookups else 0.0
+        return self
+
+    def to_dict(self, names=None):
+        """Metrics as nested dict with times in seconds; names maps 'XXXX' to ID names"""
+        names = names or {}
+        return {
+            'counters': dict(self.counters),
+            'gauges': dict(self.gauges),
+            'stages': {stage: {'seconds': ns * NS, 'calls': self.stage_calls[stage]}
+                       for stage, ns in self.stage_ns.most_common()},
+            'ids': {data_id: {'name': names.get(data_id), 'frames': frames, 'bytes': self.id_bytes[data_id]}
+                    for data_id, frames in self.id_frames.most_common()},
+            'decoders': [{'decoder': decoder, 'data_id': data_id, 'calls': self.decoder_calls[(decoder, data_id)],
+                          'seconds': ns * NS}
+                         for (decoder, data_id), ns in self.decoder_ns.most_common()],
+            'allocations': self.allocations,
+        }
+
+    def to_json(self, names=None):
+        return json.dumps(self.to_dict(names), indent=2)
+
+    def to_prometheus(self, names=None, prefix='ble_'):
+        """Metrics in the Prometheus text exposition format"""
+        names = names or {}
+        lines = []
+
+        def family(metric, kind, help_text, samples):
+            lines.append(f"# HELP {prefix}{metric} {help_text}")
+            lines.append(f"# TYPE {prefix}{metric} {kind}")
+            for labels, value in samples:
+                label_text = ','.join(f'{key}="{value}"' for key, value in labels.items())
+                lines.append(f"{prefix}{metric}{{{label_text}}} {value}" if label_text
+                             else f"{prefix}{metric} {value}")
+
+        for name, value in sorted(self.counters.items()):
+            family(f"{name}_total", 'counter', f"Pipeline counter {name}", [({}, value)])
+        for name, value in sorted(self.gauges.items()):
+            family(name, 'gauge', f"Pipeline gauge {name}", [({}, value)])
+        family('stage_seconds_total', 'counter', "Time spent per pipeline stage",
+               [({'stage': stage}, f"{ns * NS:.9f}") for stage, ns in sorted(self.stage_ns.items())])
+        family('stage_calls_total', 'counter', "Timed calls per pipeline stage",
+               [({'stage': stage}, calls) for stage, calls in sorted(self.stage_calls.items())])
+
+        def id_labels(data_id):
+            labels = {'data_id': data_id}
+            if data_id in names:
+                labels['name'] = names[data_id]
+            return labels
+
+        family('id_frames_total', 'counter', "Frames per data ID",
+               [(id_labels(data_id), count) for data_id, count in sorted(self.id_frames.items())])
+        family('id_bytes_total', 'counter', "Frame bytes per data ID",
+               [(id_labels(data_id), count) for data_id, count in sorted(self.id_bytes.items())])
+        family('decoder_seconds_total', 'counter', "Time spent per decoder and data ID",
+               [({'decoder': decoder, **id_labels(data_id)}, f"{ns * NS:.9f}")
+                for (decoder, data_id), ns in sorted(self.decoder_ns.items())])
+        family('decoder_calls_total', 'counter', "Decoder calls per decoder and data ID",
+               [({'decoder': decoder, **id_labels(data_id)}, calls)
+                for (decoder, data_id), calls in sorted(self.decoder_calls.items())])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, filename, names=None):
+        """Write as Prometheus text if filename ends in .prom, else as JSON"""
+        with open(filename, 'w') as f:
+            f.write(self.to_prometheus(names) if filename.endswith('.prom') else self.to_json(names))
+
+
+def emit(metrics, target='json', names=None):
+    """
+    Print metrics as 'json' or 'prom' (Prometheus text), or write them to a file, see write.
+
+    Returns:
+        str: the file written, None if printed
+    """
+    if target == 'json':
+        print(metrics.to_json(names))
+    elif target == 'prom':
+        print(metrics.to_prometheus(names), end='')
+    else:
+        metrics.write(target, names)
+        return target
+    return None
+
+
+class TimedRegistry:
+    """DecoderRegistry view whose decoders record their time in metrics"""
+
+    def __init__(self, registry, metrics):
+        self.registry = registry
+        self.metrics = metrics
+
+    def lookup(self, data_id, wire_type):
+        spec = self.registry.lookup(data_id, wire_type)
+        if spec.decoder is None:
+            return spec
+        return self.metrics.timed_spec(spec, data_id)
+
+    def __getattr__(self, name):
+        return getattr(self.registry, name)
+
+
+class TimedWriter:
+    """File wrapper counting the writes, characters and time spent writing as stage 'print'"""
+
+    def __init__(self, stream, metrics):
+        self.stream = stream
+        self.metrics = metrics
+
+    def write(self, text):
+        start = perf_counter_ns()
+        result = self.stream.write(text)
+        self.metrics.add_time('print', perf_counter_ns() - start)
+        self.metrics.counters['printed_chars'] += len(text)
+        return result
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+@contextlib.contextmanager
+def capture(metrics, cprofile=None, tracemalloc_top=0):
+    """
+    Time stdout writes into metrics while the block runs.
+
+    Args:
+        cprofile: File to dump cProfile statistics to (view with pstats or snakeviz)
+        tracemalloc_top: Keep this many top allocation sites in metrics.allocations
+    """
+    profiler = None
+    if cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+    if tracemalloc_top:
+        import tracemalloc
+        tracemalloc.start()
+    stdout = sys.stdout
+    sys.stdout = TimedWriter(stdout, metrics)
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield metrics
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        sys.stdout = stdout
+        if profiler is not None:
+            profiler.dump_stats(cprofile)
+        if tracemalloc_top:
+            snapshot = tracemalloc.take_snapshot()
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            metrics.gauges['traced_memory_peak_bytes'] = peak
+            metrics.allocations = [{'site': str(stat.traceback[0]), 'bytes': stat.size, 'count': stat.count}
+                                   for stat in snapshot.statistics('lineno')[:tracemalloc_top]]
@@ -0,0 +1,188 @@
+"""
+Downsampled Plotting of Large Series
+
+A subplot is a few hundred pixels wide, so drawing every one of millions of
+samples only costs time and memory. Series are reduced to about two points
+per pixel before they reach matplotlib:
+
+    lttb            Largest Triangle Three Buckets, keeps the visual shape
+    minmax_bins     minimum and maximum of every bin, keeps every spike
+
+The y axis shows the values scaled to their unit by the decoder registry
+(SeriesColumns.scaled), the x axis the notification time (shown as
+HH:MM:SS) where it was logged. render_plots() draws every series of a ride into its own PNG/SVG
+file in a pool of worker processes; it uses matplotlib's object oriented
+API with the Agg backend, so it needs no display.
+
+Usage:
+    x, y = lttb(times, values, 1000)
+    render_plots(analyzer, "plots/ride1", fmt='svg')
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from columnStore import HAS_NUMPY
+from timeIndex import format_time_of_day
+
+if HAS_NUMPY:
+    import numpy as np
+
+PLOT_POINTS = 1000          # points per subplot, about two per pixel of a 500 px wide axis
+MARKER_POINTS = 200         # series with fewer points are drawn with markers
+
+
+def lttb(x, y, n_out):
+    """
+    Largest Triangle Three Buckets downsampling to n_out points.
+
+    The first and last point are kept; of every bucket in between the point
+    forming the largest triangle with the previously kept point and the mean
+    of the next bucket is kept.
+
+    Returns:
+        tuple: (x, y) as NumPy arrays
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    edges = (np.arange(n_out - 1) * ((n - 2) / (n_out - 2))).astype(np.int64) + 1
+    edges[-1] = n - 1
+    # mean of every bucket, the last "bucket" is the last point
+    counts = np.diff(np.append(edges, n))
+    mean_x = np.add.reduceat(x, edges) / counts
+    mean_y = np.add.reduceat(y, edges) / counts
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0] = 0
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        area = np.abs((x[a] - mean_x[i + 1]) * (y[start:end] - y[a])
+                      - (x[a] - x[start:end]) * (mean_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        keep[i + 1] = a
+    keep[-1] = n - 1
+    return x[keep], y[keep]
+
+
+def minmax_bins(x, y, n_bins):
+    """
+    Keep the minimum and maximum of each of n_bins equal count bins, in time order.
+
+    Returns:
+        tuple: (x, y) as NumPy arrays with at most 2 * n_bins points
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if 2 * n_bins >= n:
+        return x, y
+    edges = (np.arange(n_bins) * (n / n_bins)).astype(np.int64)
+    size = np.diff(np.append(edges, n))
+    bin_of = np.repeat(np.arange(n_bins), size)
+    # index of the min and max within each bin via a stable sort by (bin, value)
+    order = np.lexsort((y, bin_of))
+    first = np.concatenate(([0], np.cumsum(size)[:-1]))
+    lo = order[first]
+    hi = order[first + size - 1]
+    keep = np.unique(np.concatenate((lo, hi)))
+    return x[keep], y[keep]
+
+
+def downsample(x, y, n_out=PLOT_POINTS, method='lttb'):
+    """Reduce a series to about n_out points with 'lttb' or 'minmax'"""
+    if method == 'lttb':
+        return lttb(x, y, n_out)
+    if method == 'minmax':
+        return minmax_bins(x, y, n_out // 2)
+    raise ValueError(f"method must be 'lttb' or 'minmax', not {method!r}")
+
+
+def series_xy(series, n_out=PLOT_POINTS, method='lttb'):
+    """
+    Downsampled (x, y, has_time) of a SeriesColumns; y are the scaled values, x is
+    the unwrapped time in ms or the message index if no times were logged.
+    Without NumPy nothing is dropped.
+    """
+    if not HAS_NUMPY:
+        x = list(series.times) if series.has_time else list(range(len(series.values)))
+        return x, list(series.scaled), series.has_time
+    values = np.frombuffer(series.scaled, dtype=np.float64)
+    if series.has_time:
+        x = np.frombuffer(series.times, dtype=np.int64)
+    else:
+        x = np.arange(len(values))
+    x, y = downsample(x, values, n_out, method)
+    return x, y, series.has_time
+
+
+def time_axis(ax):
+    """Label an x axis of unwrapped ms as time of day"""
+    from matplotlib.ticker import FuncFormatter
+    ax.xaxis.set_major_formatter(FuncFormatter(lambda tt, pos: format_time_of_day(int(tt))[:8]))
+    ax.set_xlabel('Time of day')
+
+
+def draw_series(ax, x, y, has_time, title, note, unit=''):
+    """Draw one downsampled series into ax, unit labels the y axis"""
+    style = 'o-' if len(x) <= MARKER_POINTS else '-'
+    ax.plot(x, y, style, markersize=3, linewidth=0.8)
+    if has_time:
+        time_axis(ax)
+    else:
+        ax.set_xlabel('Message Index')
+    ax.set_title(f'Data ID: {title}')
+    ax.set_ylabel(f'Value [{unit}]' if unit else 'Value')
+    ax.grid(True, alpha=0.3)
+    ax.text(0.02, 0.98, note, transform=ax.transAxes, verticalalignment='top',
+            bbox=dict(boxstyle='round', facecolor='wheat', alpha=0.5))
+
+
+def _render_file(args):
+    """Worker: draw one series into its own image file"""
+    path, x, y, has_time, title, note, unit = args
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(figsize=(8, 3.5))
+    FigureCanvasAgg(fig)
+    draw_series(fig.add_subplot(), x, y, has_time, title, note, unit)
+    fig.tight_layout()
+    fig.savefig(path)
+    return path
+
+
+def file_name(key):
+    """Data key as a file name, e.g. 'A252_10_0'"""
+    return ''.join(c if c.isalnum() or c in '_-.' else '_' for c in key)
+
+
+def render_plots(analyzer, output_dir, fmt='png', jobs=None, n_out=PLOT_POINTS, method='lttb', keys=None):
+    """
+    Render every plotted series of an analyzer into output_dir/<key>.<fmt> without a display.
+
+    Args:
+        analyzer: BLEMessageAnalyzer
+        output_dir: Directory for the images, created if missing
+        fmt: 'png' or 'svg'
+        jobs: Worker processes, None for one per CPU, 1 to render in this process
+        n_out, method: Downsampling, see downsample
+        keys: Data keys to render, default analyzer.plot_keys()
+
+    Returns:
+        list: Paths of the written files
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    if keys is None:
+        keys = analyzer.plot_keys()
+    tasks = []
+    for key in keys:
+        series = analyzer.store.series(key)
+        x, y, has_time = series_xy(series, n_out, method)
+        tasks.append((os.path.join(output_dir, f"{file_name(key)}.{fmt}"), x, y, has_time,
+                      analyzer.plot_title(key), analyzer.plot_note(key), series.unit))
+    if jobs == 1 or len(tasks) <= 1:
+        return list(map(_render_file, tasks))
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        return list(executor.map(_render_file, tasks))
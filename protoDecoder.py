@@ -0,0 +1,293 @@
+"""
+Lazy Protobuf Wire Format Decoder for Bosch Frames
+
+Many Bosch payloads are protobuf messages: the "data type" byte of a frame
+is really the first field tag (08 = field 1 varint, 0A = field 1 length
+delimited, 12 = field 2 length delimited, ...). Frames of type C0/C1 carry
+a 3 byte header (C0 80 nn) in front of the message.
+
+    30-2C-A2-1D-12-28-0A-13-0A-08-0A-06-CD-C4-D2-39-36-63-10-00 ... 4D-69-6E-69-20-52-65-6D-6F-74-65
+                      field 2 -> field 1 -> field 1 -> bytes ...     "Mini Remote"
+
+ProtoMessage indexes the fields of one level only when first accessed, and a
+nested message is only parsed when asked for, so big array payloads cost
+nothing until they are looked at. Storage is not lazy: BLEMessageAnalyzer
+keeps every numeric leaf as a series, so add_proto walks each payload it
+stores in full (SchemaCache.numeric). Parsed nested messages are kept in their
+parent, and SchemaCache.numeric keeps the numeric leaves on the message, so a
+payload shared by repeated frames (frameDecoder.FrameMemo) is walked once.
+Length delimited fields can be a nested message, a string, packed varints or
+plain bytes; SchemaCache remembers the kind found for every field path of a
+data ID, so only the first frame of an ID pays for the guessing.
+
+Usage:
+    msg = ProtoMessage(frame_bytes, 4)          # the A2-1D frame above, message starts at the type byte
+    remote = msg.message(msg.get(2))            # only the top level is indexed so far
+    name = remote.message(remote.get(2))
+    print(name.string(name.get(1)))             # Mini Remote
+    for path, value in SchemaCache().iter_numeric(0xA21D, msg):
+        print(path, value)                      # e.g. '2.1.2' 0, repeated fields as '1[2].4'
+"""
+
+from frameDecoder import decode_varint
+
+WT_VARINT = 0
+WT_I64 = 1
+WT_LEN = 2
+WT_I32 = 5
+
+C0_HEADER = 2       # bytes behind the C0/C1 type byte before the message: 80 nn
+
+KIND_MESSAGE = 'message'
+KIND_STRING = 'string'
+KIND_PACKED = 'packed'
+KIND_BYTES = 'bytes'
+
+
+def to_int64(value):
+    """Varints carry int64 as 64 bit two's complement, e.g. -1 = FF-FF-...-01"""
+    value &= 0xFFFFFFFFFFFFFFFF
+    return value - (1 << 64) if value >> 63 else value
+
+
+class ProtoError(ValueError):
+    """Payload does not follow the protobuf wire format"""
+
+
+def read_varint(view, pos, end):
+    """Strict varint read: raise ProtoError if the varint runs past end"""
+    value, next_pos = decode_varint(view, pos, end)
+    if next_pos == pos or view[next_pos - 1] & 0x80:
+        raise ProtoError(f"truncated varint at {pos}")
+    return value, next_pos
+
+
+class ProtoField:
+    """One field; value is the integer of varint/fixed fields, None for length delimited"""
+    __slots__ = ('number', 'wire_type', 'start', 'end', 'value')
+
+    def __init__(self, number, wire_type, start, end, value=None):
+        self.number = number
+        self.wire_type = wire_type
+        self.start = start      # payload range in the message buffer
+        self.end = end
+        self.value = value
+
+    def __repr__(self):
+        return f"ProtoField({self.number}, wt={self.wire_type}, value={self.value}, len={self.end - self.start})"
+
+
+class ProtoMessage:
+    """Protobuf message over buf[start:end], fields are indexed on first access"""
+    __slots__ = ('view', 'start', 'end', '_fields', '_children', '_numeric')
+
+    def __init__(self, buf, start=0, end=None):
+        self.view = buf if isinstance(buf, memoryview) else memoryview(buf)
+        self.start = start
+        self.end = len(self.view) if end is None else end
+        self._fields = None
+        self._children = None       # field.start -> nested ProtoMessage
+        self._numeric = None        # see SchemaCache.numeric
+
+    def __len__(self):
+        return len(self.fields)
+
+    def __iter__(self):
+        return iter(self.fields)
+
+    def __repr__(self):
+        return f"ProtoMessage({bytes(self.view[self.start:self.end]).hex('-').upper()})"
+
+    @property
+    def fields(self):
+        """Fields of this level in wire order, raises ProtoError if malformed"""
+        if self._fields is None:
+            self._fields = self._index()
+        return self._fields
+
+    def _index(self):
+        view = self.view
+        end = self.end
+        fields = []
+        pos = self.start
+        while pos < end:
+            tag, pos = read_varint(view, pos, end)
+            number, wire_type = tag >> 3, tag & 7
+            if number == 0:
+                raise ProtoError(f"field number 0 at {pos}")
+            if wire_type == WT_VARINT:
+                start = pos
+                value, pos = read_varint(view, pos, end)
+                fields.append(ProtoField(number, wire_type, start, pos, value))
+            elif wire_type == WT_LEN:
+                length, pos = read_varint(view, pos, end)
+                if pos + length > end:
+                    raise ProtoError(f"field {number} length {length} runs past the message")
+                fields.append(ProtoField(number, wire_type, pos, pos + length))
+                pos += length
+            elif wire_type in (WT_I64, WT_I32):
+                size = 8 if wire_type == WT_I64 else 4
+                if pos + size > end:
+                    raise ProtoError(f"fixed field {number} runs past the message")
+                value = int.from_bytes(view[pos:pos + size], 'little')
+                fields.append(ProtoField(number, wire_type, pos, pos + size, value))
+                pos += size
+            else:
+                raise ProtoError(f"wire type {wire_type} of field {number} not supported")
+        return fields
+
+    def is_valid(self):
+        """True if this level parses as a message"""
+        try:
+            self.fields
+        except ProtoError:
+            return False
+        return True
+
+    def get(self, number, default=None):
+        """First field with this number"""
+        for field in self.fields:
+            if field.number == number:
+                return field
+        return default
+
+    def get_all(self, number):
+        """All fields with this number, e.g. repeated array entries"""
+        return [field for field in self.fields if field.number == number]
+
+    def message(self, field):
+        """Nested message of a length delimited field, parsed lazily and kept"""
+        if self._children is None:
+            self._children = {}
+        nested = self._children.get(field.start)
+        if nested is None:
+            nested = self._children[field.start] = ProtoMessage(self.view, field.start, field.end)
+        return nested
+
+    def raw(self, field):
+        return bytes(self.view[field.start:field.end])
+
+    def string(self, field):
+        return self.raw(field).decode('utf-8', errors='replace')
+
+    def packed(self, field):
+        """Packed varints of a length delimited field"""
+        values = []
+        pos = field.start
+        while pos < field.end:
+            value, pos = read_varint(self.view, pos, field.end)
+            values.append(value)
+        return values
+
+
+def decode_proto(view, pos, end):
+    """Registry decoder: message starting at the type byte (the first tag), pos is behind it"""
+    return ProtoMessage(view, pos - 1, end)
+
+
+def decode_proto_header(view, pos, end):
+    """Registry decoder for C0/C1 frames: message behind the C0 80 nn header"""
+    return ProtoMessage(view, min(pos + C0_HEADER, end), end)
+
+
+def guess_kind(message, field):
+    """Classify a length delimited field as message, string, packed varints or bytes"""
+    if field.end > field.start:
+        if message.message(field).is_valid():
+            return KIND_MESSAGE
+        raw = message.raw(field)
+        try:
+            text = raw.decode('utf-8')
+            if text.isprintable():
+                return KIND_STRING
+        except UnicodeDecodeError:
+            pass
+        if not raw[-1] & 0x80:
+            return KIND_PACKED
+    return KIND_BYTES
+
+
+class SchemaCache:
+    """Kinds of length delimited fields discovered per data ID and field path"""
+
+    def __init__(self):
+        self.kinds = {}         # (data_id, 'a.b.c') -> kind
+
+    def kind(self, data_id, path, message, field):
+        """Cached kind of field at path, guessed from this frame on first sight"""
+        key = (data_id, path)
+        kind = self.kinds.get(key)
+        if kind is None:
+            kind = self.kinds[key] = guess_kind(message, field)
+        return kind
+
+    def schema(self, data_id):
+        """Discovered {path: kind} of one data ID"""
+        return {path: kind for (did, path), kind in self.kinds.items() if did == data_id}
+
+    def _walk(self, data_id, message, path, schema_path):
+        """Yield (path, field, kind, message) of all leaves; repeated fields get an [i] index"""
+        # repeated entries need not be adjacent, e.g. 1 2 1
+        groups = {}
+        for field in message.fields:
+            groups.setdefault(field.number, []).append(field)
+        for number, group in groups.items():
+            field_schema = f"{schema_path}{number}"
+            for i, field in enumerate(group):
+                field_path = f"{path}{number}" if len(group) == 1 else f"{path}{number}[{i}]"
+                if field.wire_type != WT_LEN:
+                    yield field_path, field, None, message
+                    continue
+                kind = self.kind(data_id, field_schema, message, field)
+                if kind == KIND_MESSAGE:
+                    nested = message.message(field)
+                    if nested.is_valid():
+                        yield from self._walk(data_id, nested, field_path + '.', field_schema + '.')
+                        continue
+                    kind = KIND_BYTES
+                yield field_path, field, kind, message
+
+    def iter_numeric(self, data_id, message):
+        """
+        Yield (path, int) for every numeric leaf, e.g. ('1[2].4', 167).
+
+        Values are int64 (see to_int64) so they fit the column store. Packed
+        varint fields yield one value per element with an [i] suffix.
+        Strings and bytes are skipped, see to_dict for those.
+        """
+        try:
+            for path, field, kind, parent in self._walk(data_id, message, '', ''):
+                if kind is None:
+                    yield path, to_int64(field.value)
+                elif kind == KIND_PACKED:
+                    try:
+                        values = parent.packed(field)
+                    except ProtoError:
+                        continue
+                    for i, value in enumerate(values):
+                        yield f"{path}[{i}]", to_int64(value)
+        except ProtoError:
+            return
+
+    def numeric(self, data_id, message):
+        """iter_numeric as a list, kept on the message so shared payloads are walked once"""
+        if message._numeric is None:
+            message._numeric = list(self.iter_numeric(data_id, message))
+        return message._numeric
+
+    def to_dict(self, data_id, message):
+        """{path: value} of all leaves including strings and bytes, for display"""
+        result = {}
+        try:
+            for path, field, kind, parent in self._walk(data_id, message, '', ''):
+                if kind is None:
+                    result[path] = field.value
+                elif kind == KIND_STRING:
+                    result[path] = parent.string(field)
+                elif kind == KIND_PACKED:
+                    result[path] = parent.packed(field)
+                else:
+                    result[path] = parent.raw(field).hex('-').upper()
+        except ProtoError as e:
+            result['error'] = str(e)
+        return result
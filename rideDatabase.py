@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Multi Ride Session Database
+
+Decoded rides are written into one local SQLite file, so questions across
+months of rides (odometer 9818 trend, energy delivered 809C per km,
+TripDistPerMode A252 split) are answered without decoding any log again.
+
+Storage is columnar: a series of one ride is cut into chunks of up to
+CHUNK_SIZE samples and every chunk is one row holding its times, values and
+scaled values as binary arrays, together with its time range and
+count/min/max/first/last/sum (sum as REAL, the sum of int64 values may not
+fit an INTEGER). A run length ride (see columnStore) stores one sample per
+run plus its repeat counts and last times; count and sum include the
+repeats and t_end is the last time of the last run. Rows are indexed on
+(ride, series, start time), so a query reads a handful of blobs per ride and turns them into
+NumPy arrays without a Python object per sample, and per ride aggregates
+come straight from the chunk columns.
+
+    rides   (ride_id, path, name, day_ms, size, mtime_ns, ...)
+    series  (series_id, key, data_id, unit)    e.g. '9818_8', '9818', 'm'
+    chunks  (ride_id, series_id, chunk, t_start, t_end, count, min, max,
+             first, last, sum, times, vals, scaled, counts, end_times)
+
+Times are the unwrapped notification times in ms (see timeIndex) plus the
+epoch ms of the ride's date taken from the log name ("Log 2025-06-26 ...").
+
+Usage:
+    python rideDatabase.py ingest logs_dir_or_glob [--db rides.db] [--jobs N] [--force]
+    python rideDatabase.py query 9818 [--db rides.db] [--per-ride last]
+
+    db = RideDatabase("rides.db")
+    rides, times, values = db.query('9818', scaled=True)
+    rides, last_odometer = db.per_ride('9818', 'last')
+"""
+
+import argparse
+import calendar
+import os
+import re
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from batchAnalysis import find_logs, analyse_ride
+from columnStore import HAS_NUMPY, NO_TIME
+
+if HAS_NUMPY:
+    import numpy as np
+
+DEFAULT_DB = 'rides.db'
+CHUNK_SIZE = 65536          # samples per chunk row
+BATCH_ROWS = 512            # chunk rows per executemany
+DATE_PATTERN = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS rides (
+    ride_id   INTEGER PRIMARY KEY,
+    path      TEXT UNIQUE NOT NULL,
+    name      TEXT NOT NULL,
+    day_ms    INTEGER,              -- epoch ms of the ride's midnight (UTC), NULL if unknown
+    size      INTEGER,
+    mtime_ns  INTEGER,
+    samples   INTEGER,
+    ingested  REAL
+);
+CREATE TABLE IF NOT EXISTS series (
+    series_id INTEGER PRIMARY KEY,
+    key       TEXT UNIQUE NOT NULL,
+    data_id   TEXT NOT NULL,
+    unit      TEXT NOT NULL DEFAULT ''
+);
+CREATE INDEX IF NOT EXISTS series_data_id ON series (data_id);
+CREATE TABLE IF NOT EXISTS chunks (
+    ride_id   INTEGER NOT NULL REFERENCES rides (ride_id) ON DELETE CASCADE,
+    series_id INTEGER NOT NULL REFERENCES series (series_id),
+    chunk     INTEGER NOT NULL,
+    t_start   INTEGER NOT NULL,
+    t_end     INTEGER NOT NULL,
+    count     INTEGER NOT NULL,
+    min       INTEGER, max INTEGER, first INTEGER, last INTEGER, sum REAL,
+    times     BLOB NOT NULL,        -- int64 ms
+    vals      BLOB NOT NULL,        -- int64 raw values
+    scaled    BLOB NOT NULL,        -- float64 engineering values
+    counts    BLOB,                 -- int64 repeats per run, NULL unless run length
+    end_times BLOB,                 -- int64 ms of the last repeat, NULL unless run length
+    PRIMARY KEY (ride_id, series_id, t_start, chunk)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS chunks_series ON chunks (series_id, ride_id, t_start);
+"""
+
+PER_RIDE_FIELDS = ('count', 'min', 'max', 'first', 'last', 'sum')
+
+
+def ride_day_ms(path):
+    """Epoch ms of the midnight of the date in the log name, None if it has none"""
+    match = DATE_PATTERN.search(os.path.basename(path))
+    if not match:
+        return None
+    year, month, day = map(int, match.groups())
+    return calendar.timegm((year, month, day, 0, 0, 0)) * 1000
+
+
+def data_id_of(key, names=None):
+    """'9818_8' -> '9818'; 'TripDistPerMode_10_0' -> 'A252' with names {data_id: name}"""
+    data_id = key.split('_', 1)[0]
+    for known_id, name in (names or {}).items():
+        if name == data_id:
+            return known_id
+    return data_id
+
+
+class RideDatabase:
+    """Columnar SQLite store of decoded rides"""
+
+    def __init__(self, path=DEFAULT_DB):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute('PRAGMA foreign_keys = ON')
+        self.conn.execute('PRAGMA journal_mode = WAL')
+        self.conn.executescript(SCHEMA)
+        self._series_ids = dict(self.conn.execute('SELECT key, series_id FROM series'))
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ingest
+
+    def is_current(self, path):
+        """True if path was ingested and has not changed since"""
+        st = os.stat(path)
+        row = self.conn.execute('SELECT size, mtime_ns FROM rides WHERE path = ?',
+                                (os.path.abspath(path),)).fetchone()
+        return row == (st.st_size, st.st_mtime_ns)
+
+    def _series_id(self, key, unit, names=None):
+        series_id = self._series_ids.get(key)
+        if series_id is None:
+            cursor = self.conn.execute('INSERT INTO series (key, data_id, unit) VALUES (?, ?, ?)',
+                                       (key, data_id_of(key, names), unit))
+            series_id = self._series_ids[key] = cursor.lastrowid
+        return series_id
+
+    def add_ride(self, path, analyzer):
+        """
+        Write the decoded columns of one ride, replacing an earlier ingest of path.
+
+        Returns:
+            int: ride_id
+        """
+        st = os.stat(path)
+        abs_path = os.path.abspath(path)
+        with self.conn:
+            self.conn.execute('DELETE FROM rides WHERE path = ?', (abs_path,))
+            cursor = self.conn.execute(
+                'INSERT INTO rides (path, name, day_ms, size, mtime_ns, samples, ingested) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (abs_path, os.path.basename(path), ride_day_ms(path), st.st_size, st.st_mtime_ns,
+                 sum(series.sample_count for _, series in analyzer.store.items()), time.time()))
+            ride_id = cursor.lastrowid
+            batch = []
+            for key, series in analyzer.store.items():
+                series_id = self._series_id(key, series.unit, analyzer.data_ids)
+                batch.extend(self._chunk_rows(ride_id, series_id, series))
+                if len(batch) >= BATCH_ROWS:
+                    self._insert_chunks(batch)
+                    batch = []
+            self._insert_chunks(batch)
+        return ride_id
+
+    def _chunk_rows(self, ride_id, series_id, series):
+        for chunk, start in enumerate(range(0, len(series), CHUNK_SIZE)):
+            times = series.times[start:start + CHUNK_SIZE]
+            values = series.values[start:start + CHUNK_SIZE]
+            scaled = series.scaled[start:start + CHUNK_SIZE]
+            if series.run_length:
+                counts = series.counts[start:start + CHUNK_SIZE]
+                end_times = series.end_times[start:start + CHUNK_SIZE]
+                yield (ride_id, series_id, chunk, times[0], max(end_times), sum(counts),
+                       min(values), max(values), values[0], values[-1],
+                       float(sum(value * count for value, count in zip(values, counts))),
+                       times.tobytes(), values.tobytes(), scaled.tobytes(), counts.tobytes(), end_times.tobytes())
+            else:
+                yield (ride_id, series_id, chunk, times[0], max(times), len(values),
+                       min(values), max(values), values[0], values[-1], float(sum(values)),
+                       times.tobytes(), values.tobytes(), scaled.tobytes(), None, None)
+
+    def _insert_chunks(self, rows):
+        if rows:
+            self.conn.executemany('INSERT INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def ingest(self, paths, jobs=None, force=False):
+        """
+        Decode and store rides; rides already ingested and unchanged are skipped.
+
+        Logs are decoded in a process pool (see batchAnalysis) into series only,
+        without message log or raw frames; writes happen here.
+
+        Returns:
+            tuple: ({path: ride_id} of stored rides, {path: error message})
+        """
+        todo = [path for path in paths if force or not self.is_current(path)]
+        stored, errors = {}, {}
+        analyse = partial(analyse_ride, keep_columns=True, keep_raw=False)
+        if jobs == 1 or len(todo) <= 1:
+            self._store_results(map(analyse, todo), stored, errors)
+        else:
+            with ProcessPoolExecutor(max_workers=jobs) as executor:
+                self._store_results(executor.map(analyse, todo), stored, errors)
+        return stored, errors
+
+    def _store_results(self, results, stored, errors):
+        for path, analyzer, error in results:
+            if error is not None:
+                errors[path] = error
+                print(f"Error processing {path}: {error}")
+                continue
+            stored[path] = self.add_ride(path, analyzer)
+            print(f"Stored {path}: {len(analyzer.store)} values")
+
+    # queries
+
+    def rides(self):
+        """List of ride dicts in ride order"""
+        cursor = self.conn.execute('SELECT ride_id, path, name, day_ms, samples FROM rides ORDER BY ride_id')
+        return [dict(zip(('ride_id', 'path', 'name', 'day_ms', 'samples'), row)) for row in cursor]
+
+    def series_keys(self, data_id=None):
+        """Stored series keys, of one data ID or name if given"""
+        if data_id is None:
+            return [row[0] for row in self.conn.execute('SELECT key FROM series ORDER BY key')]
+        return [row[0] for row in self.conn.execute('SELECT key FROM series WHERE data_id = ? ORDER BY key',
+                                                    (data_id,))]
+
+    def resolve(self, key):
+        """series_id of a series key ('9818_8') or of a data ID with a single series ('9818')"""
+        if key in self._series_ids:
+            return self._series_ids[key]
+        keys = self.series_keys(key)
+        if len(keys) == 1:
+            return self._series_ids[keys[0]]
+        if not keys:
+            raise KeyError(f"no series {key} stored")
+        raise KeyError(f"{key} has several series, use one of {', '.join(keys)}")
+
+    def _ride_filter(self, rides):
+        if rides is None:
+            return '', ()
+        rides = tuple(int(ride_id) for ride_id in rides)
+        return f" AND c.ride_id IN ({','.join('?' * len(rides))})", rides
+
+    def query(self, key, rides=None, start=None, end=None, scaled=False):
+        """
+        Samples of one series across rides.
+
+        Args:
+            key: Series key or data ID, see resolve
+            rides: ride_ids to read, None for all
+            start, end: Epoch ms bounds (inclusive), either may be None
+            scaled: Return engineering values (float64) instead of raw values
+
+        Returns:
+            tuple: NumPy arrays (ride_ids, times, values); times are epoch ms,
+            or ride relative ms for rides without a date. A run length ride
+            gives one sample per run at its first time, a run that started
+            before start but lasts into the window is included
+        """
+        if not HAS_NUMPY:
+            raise ImportError("numpy is required for queries, install with: pip install numpy")
+        series_id = self.resolve(key)
+        where, params = self._ride_filter(rides)
+        sql = (f"SELECT c.ride_id, COALESCE(r.day_ms, 0), c.times, c.end_times, {'c.scaled' if scaled else 'c.vals'} "
+               "FROM chunks c JOIN rides r ON r.ride_id = c.ride_id "
+               f"WHERE c.series_id = ?{where}")
+        params = (series_id,) + params
+        if start is not None:
+            start = int(start)
+            sql += ' AND c.t_end + COALESCE(r.day_ms, 0) >= ?'
+            params += (start,)
+        if end is not None:
+            end = int(end)
+            sql += ' AND c.t_start + COALESCE(r.day_ms, 0) <= ?'
+            params += (end,)
+        sql += ' ORDER BY c.ride_id, c.t_start, c.chunk'
+        ride_parts, time_parts, end_parts, value_parts = [], [], [], []
+        for ride_id, day_ms, times, end_times, values in self.conn.execute(sql, params):
+            times = np.frombuffer(times, dtype=np.int64)
+            end_times = times if end_times is None else np.frombuffer(end_times, dtype=np.int64)
+            ride_parts.append(np.full(len(times), ride_id, dtype=np.int64))
+            time_parts.append(np.where(times == NO_TIME, NO_TIME, times + day_ms))
+            end_parts.append(np.where(end_times == NO_TIME, NO_TIME, end_times + day_ms))
+            value_parts.append(np.frombuffer(values, dtype=np.float64 if scaled else np.int64))
+        if not ride_parts:
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0, dtype=np.float64 if scaled else np.int64)
+        ride_ids = np.concatenate(ride_parts)
+        times = np.concatenate(time_parts)
+        values = np.concatenate(value_parts)
+        if start is not None or end is not None:
+            keep = np.ones(len(times), dtype=bool)
+            if start is not None:
+                keep &= np.concatenate(end_parts) >= start
+            if end is not None:
+                keep &= times <= end
+            ride_ids, times, values = ride_ids[keep], times[keep], values[keep]
+        return ride_ids, times, values
+
+    def per_ride(self, key, field='last', rides=None):
+        """
+        One aggregate per ride from the chunk columns, no sample is read.
+
+        Args:
+            key: Series key or data ID, see resolve
+            field: One of count, min, max, first, last, sum
+
+        Returns:
+            tuple: NumPy arrays (ride_ids, values), values float64 for sum, else int64
+        """
+        if field not in PER_RIDE_FIELDS:
+            raise ValueError(f"field must be one of {PER_RIDE_FIELDS}")
+        if not HAS_NUMPY:
+            raise ImportError("numpy is required for queries, install with: pip install numpy")
+        aggregate = {'count': 'SUM(c.count)', 'sum': 'TOTAL(c.sum)', 'min': 'MIN(c.min)', 'max': 'MAX(c.max)',
+                     'first': 'c.first', 'last': 'c.last'}[field]
+        series_id = self.resolve(key)
+        where, params = self._ride_filter(rides)
+        if field in ('first', 'last'):
+            # value of the first/last chunk of each ride
+            order = 'MIN' if field == 'first' else 'MAX'
+            sql = (f"SELECT c.ride_id, {aggregate} FROM chunks c WHERE c.series_id = ?{where} "
+                   f"AND c.chunk = (SELECT {order}(chunk) FROM chunks d "
+                   "WHERE d.ride_id = c.ride_id AND d.series_id = c.series_id) ORDER BY c.ride_id")
+        else:
+            sql = (f"SELECT c.ride_id, {aggregate} FROM chunks c WHERE c.series_id = ?{where} "
+                   "GROUP BY c.ride_id ORDER BY c.ride_id")
+        rows = self.conn.execute(sql, (series_id,) + params).fetchall()
+        ride_ids = np.array([row[0] for row in rows], dtype=np.int64)
+        values = np.array([row[1] for row in rows], dtype=np.float64 if field == 'sum' else np.int64)
+        return ride_ids, values
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Store decoded rides in a SQLite database and query them")
+    parser.add_argument('--db', default=DEFAULT_DB, help=f"database file (default: {DEFAULT_DB})")
+    commands = parser.add_subparsers(dest='command', required=True)
+    ingest = commands.add_parser('ingest', help="decode and store ride logs")
+    ingest.add_argument('logs', help="directory of logs or glob pattern, e.g. 'logs/*_hex.txt'")
+    ingest.add_argument('--jobs', type=int, default=None, help="worker processes (default: CPU count)")
+    ingest.add_argument('--force', action='store_true', help="also decode rides that are already stored")
+    query = commands.add_parser('query', help="print a series across rides")
+    query.add_argument('key', help="series key or data ID, e.g. 9818_8 or 9818")
+    query.add_argument('--per-ride', choices=PER_RIDE_FIELDS, default=None,
+                       help="one aggregate per ride instead of all samples")
+    query.add_argument('--scaled', action='store_true', help="engineering units instead of raw values")
+    args = parser.parse_args()
+
+    with RideDatabase(args.db) as db:
+        if args.command == 'ingest':
+            paths = find_logs(args.logs)
+            if not paths:
+                print(f"Error: No log files found for '{args.logs}'")
+                raise SystemExit(1)
+            stored, errors = db.ingest(paths, args.jobs, args.force)
+            print(f"\n✓ {len(stored)} rides stored, {len(paths) - len(stored) - len(errors)} unchanged, "
+                  f"{len(errors)} failed")
+            return
+
+        names = {ride['ride_id']: ride['name'] for ride in db.rides()}
+        started = time.perf_counter()
+        try:
+            if args.per_ride:
+                ride_ids, values = db.per_ride(args.key, args.per_ride)
+            else:
+                ride_ids, times, values = db.query(args.key, scaled=args.scaled)
+        except KeyError as e:
+            print(f"Error: {e.args[0]}")
+            raise SystemExit(1)
+        elapsed = time.perf_counter() - started
+        if args.per_ride:
+            for ride_id, value in zip(ride_ids, values):
+                print(f"{names[ride_id]:<40} {value}")
+        else:
+            for ride_id in np.unique(ride_ids):
+                ride_values = values[ride_ids == ride_id]
+                print(f"{names[ride_id]:<40} {len(ride_values):>8} samples  "
+                      f"min {ride_values.min()}  max {ride_values.max()}  last {ride_values[-1]}")
+        print(f"\nQuery took {elapsed * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
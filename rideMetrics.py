@@ -0,0 +1,271 @@
+#!/usr/bin/env python3
+"""
+Time Aligned Resampling and Derived Ride Metrics
+
+Every Bosch signal arrives with its own irregular timing, most IDs are only
+sent when their value changes. resample() puts chosen series onto one
+regular time grid with NumPy, either holding the last value (zero order
+hold, right for "sent on change" signals) or interpolating linearly, and
+ride_metrics() derives from the grid:
+
+    rider / motor energy      Wh, integrated HumanPower 985B / MotorPower 985D
+    assist ratio              motor power / rider power, per grid step and overall
+    distance                  km from the odometer 9818, else integrated speed 982D
+    Wh/km per assist mode     motor energy and battery energy (809C) per km, by 9809 mode
+    battery drain rate        %/h and %/km from the battery level 80BC
+
+Only grid sized array operations are used: 7.5 h of ride take about 10 ms
+on a 1 s grid and 0.1 s on a 100 ms grid.
+
+Usage:
+    python rideMetrics.py Log_hex.txt [--step MS] [--max-gap MS] [--csv out.csv]
+
+    grid, columns = resample(analyzer.store, ['982D_8', '985B_8'], step_ms=1000)
+    metrics = ride_metrics(analyzer.store)
+    print(metrics.wh_per_km)
+"""
+
+import argparse
+
+from columnStore import HAS_NUMPY
+
+if HAS_NUMPY:
+    import numpy as np
+
+MS_PER_H = 3600 * 1000
+
+# data keys of the signals the metrics are derived from, see decoderRegistry
+SPEED = '982D_8'
+CADENCE = '985A_8'
+HUMAN_POWER = '985B_8'
+MOTOR_POWER = '985D_8'
+BATTERY = '80BC_8'
+ASSIST_MODE = '9809_8'
+ODOMETER = '9818_8'
+BATTERY_DELIVERED = '809C_8'
+METRIC_KEYS = (SPEED, CADENCE, HUMAN_POWER, MOTOR_POWER, BATTERY, ASSIST_MODE, ODOMETER, BATTERY_DELIVERED)
+
+
+def _series_arrays(store, key):
+    """(times, scaled values) of a timed series as float64 arrays"""
+    series = store.series(key)
+    if series is None:
+        raise KeyError(key)
+    if not series.has_time:
+        raise ValueError(f"No timestamps logged for {key}")
+    values, times = series.as_numpy(scaled=True)
+    return times, values
+
+
+def time_grid(store, keys, step_ms=1000, start=None, end=None):
+    """Regular int64 grid in ms over the time covered by the present keys"""
+    spans = [_series_arrays(store, key)[0] for key in keys if key in store]
+    if not spans:
+        raise ValueError("none of the series are in the store")
+    if start is None:
+        start = min(times[0] for times in spans)
+    if end is None:
+        end = max(times[-1] for times in spans)
+    return np.arange(start, end + 1, step_ms, dtype=np.int64)
+
+
+def resample_series(times, values, grid, method='hold', max_gap_ms=None):
+    """
+    One series on grid, NaN before its first value.
+
+    Args:
+        method: 'hold' keeps the last value, 'linear' interpolates between samples
+        max_gap_ms: Also NaN where the last sample is older than this, e.g. a lost connection
+    """
+    idx = np.searchsorted(times, grid, side='right') - 1
+    valid = idx >= 0
+    if method == 'hold':
+        result = values[np.clip(idx, 0, None)].astype(np.float64)
+    elif method == 'linear':
+        result = np.interp(grid, times, values)
+    else:
+        raise ValueError(f"method must be 'hold' or 'linear', not {method!r}")
+    if max_gap_ms is not None:
+        valid &= grid - times[np.clip(idx, 0, None)] <= max_gap_ms
+    result[~valid] = np.nan
+    return result
+
+
+def resample(store, keys, step_ms=1000, method='hold', max_gap_ms=None, start=None, end=None):
+    """
+    Put series of a ColumnStore onto one time grid.
+
+    Args:
+        store: ColumnStore, e.g. BLEMessageAnalyzer.store
+        keys: Data keys such as '982D_8'; keys not in the store are left out
+        step_ms: Grid step in ms
+        method, max_gap_ms: See resample_series
+        start, end: Grid bounds in unwrapped ms, default the time span of the keys
+
+    Returns:
+        tuple: (grid int64 ms, {key: float64 array of engineering values})
+    """
+    if not HAS_NUMPY:
+        raise ImportError("numpy is required for resampling, install with: pip install numpy")
+    grid = time_grid(store, keys, step_ms, start, end)
+    columns = {}
+    for key in keys:
+        if key in store:
+            times, values = _series_arrays(store, key)
+            columns[key] = resample_series(times, values, grid, method, max_gap_ms)
+    return grid, columns
+
+
+def integrate_wh(power_w, step_ms):
+    """Cumulative energy in Wh of a power column in W, NaN counts as 0"""
+    return np.cumsum(np.nan_to_num(power_w)) * (step_ms / MS_PER_H)
+
+
+def _delta(column):
+    """Per step increase of a counter column, 0 where unknown or where the counter went back"""
+    delta = np.diff(column, prepend=column[:1])
+    return np.clip(np.nan_to_num(delta), 0, None)
+
+
+class RideMetrics:
+    """Derived series and totals of one ride on a common grid"""
+
+    def __init__(self, grid, columns, step_ms):
+        self.grid = grid
+        self.columns = columns              # resampled and derived series, name -> float64 array
+        self.step_ms = step_ms
+        self.rider_wh = 0.0
+        self.motor_wh = 0.0
+        self.assist_ratio = float('nan')    # motor energy / rider energy
+        self.distance_km = 0.0
+        self.battery_drain_pct_per_h = float('nan')
+        self.battery_drain_pct_per_km = float('nan')
+        self.wh_per_km = {}                 # assist mode -> dict(km, motor_wh, battery_wh, ...)
+
+    def print_report(self):
+        """Print the totals and the per mode table"""
+        hours = (self.grid[-1] - self.grid[0]) / MS_PER_H if len(self.grid) else 0.0
+        print("=== Ride Metrics ===\n")
+        print(f"Duration:        {hours:.2f} h on a {self.step_ms} ms grid")
+        print(f"Distance:        {self.distance_km:.2f} km")
+        print(f"Rider energy:    {self.rider_wh:.1f} Wh")
+        print(f"Motor energy:    {self.motor_wh:.1f} Wh")
+        print(f"Assist ratio:    {self.assist_ratio:.2f} (motor/rider)")
+        print(f"Battery drain:   {self.battery_drain_pct_per_h:.2f} %/h, {self.battery_drain_pct_per_km:.2f} %/km")
+        if self.wh_per_km:
+            print()
+            print(f"{'Assist mode':<12} {'km':<8} {'Motor Wh':<10} {'Motor Wh/km':<12} {'Battery Wh':<11} {'Battery Wh/km'}")
+            print("-" * 70)
+            for mode, row in sorted(self.wh_per_km.items()):
+                print(f"{mode:<12} {row['km']:<8.2f} {row['motor_wh']:<10.1f} {row['motor_wh_per_km']:<12.2f} "
+                      f"{row['battery_wh']:<11.1f} {row['battery_wh_per_km']:.2f}")
+
+
+def ride_metrics(store, step_ms=1000, max_gap_ms=None):
+    """
+    Resample the ride signals and derive energy, assist ratio, distance,
+    per assist mode efficiency and battery drain.
+
+    Signals missing from the store are skipped, the metrics depending on them
+    stay 0 or NaN.
+
+    Returns:
+        RideMetrics
+    """
+    grid, columns = resample(store, METRIC_KEYS, step_ms, 'hold', max_gap_ms)
+    metrics = RideMetrics(grid, columns, step_ms)
+    n = len(grid)
+    nan = np.full(n, np.nan)
+    dt_h = step_ms / MS_PER_H
+
+    human = columns.get(HUMAN_POWER, nan)
+    motor = columns.get(MOTOR_POWER, nan)
+    columns['rider_wh'] = integrate_wh(human, step_ms)
+    columns['motor_wh'] = integrate_wh(motor, step_ms)
+    metrics.rider_wh = float(columns['rider_wh'][-1])
+    metrics.motor_wh = float(columns['motor_wh'][-1])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        columns['assist_ratio'] = np.where(human > 0, motor / human, np.nan)
+    if metrics.rider_wh > 0:
+        metrics.assist_ratio = metrics.motor_wh / metrics.rider_wh
+
+    # distance per step, odometer in m is exact, speed in km/h is the fallback
+    if ODOMETER in columns and np.isfinite(columns[ODOMETER]).any():
+        step_km = _delta(columns[ODOMETER]) / 1000
+    else:
+        step_km = np.nan_to_num(columns.get(SPEED, nan)) * dt_h
+    columns['distance_km'] = np.cumsum(step_km)
+    metrics.distance_km = float(columns['distance_km'][-1])
+
+    step_motor_wh = np.nan_to_num(motor) * dt_h
+    step_battery_wh = _delta(columns[BATTERY_DELIVERED]) if BATTERY_DELIVERED in columns else np.zeros(n)
+    if ASSIST_MODE in columns:
+        modes = columns[ASSIST_MODE]
+        known = np.isfinite(modes)
+        mode_codes = modes[known].astype(np.int64)
+        if len(mode_codes):
+            km = np.bincount(mode_codes, weights=step_km[known])
+            motor_wh = np.bincount(mode_codes, weights=step_motor_wh[known])
+            battery_wh = np.bincount(mode_codes, weights=step_battery_wh[known])
+            steps = np.bincount(mode_codes)
+            for mode in np.flatnonzero(steps):
+                mode_km = km[mode]
+                metrics.wh_per_km[int(mode)] = {
+                    'hours': steps[mode] * dt_h,
+                    'km': mode_km,
+                    'motor_wh': motor_wh[mode],
+                    'battery_wh': battery_wh[mode],
+                    'motor_wh_per_km': motor_wh[mode] / mode_km if mode_km > 0 else float('nan'),
+                    'battery_wh_per_km': battery_wh[mode] / mode_km if mode_km > 0 else float('nan'),
+                }
+
+    if BATTERY in store:
+        times, level = _series_arrays(store, BATTERY)
+        if len(times) >= 2 and times[-1] > times[0]:
+            slope_per_ms = np.polyfit(times.astype(np.float64), level, 1)[0]
+            metrics.battery_drain_pct_per_h = -slope_per_ms * MS_PER_H
+            if metrics.distance_km > 0:
+                metrics.battery_drain_pct_per_km = (level[0] - level[-1]) / metrics.distance_km
+        if n >= 2:
+            columns['battery_drain_pct_per_h'] = -np.gradient(columns[BATTERY], step_ms) * MS_PER_H
+        else:
+            # a single grid point has no slope
+            columns['battery_drain_pct_per_h'] = nan
+    return metrics
+
+
+def export_grid(metrics, filename):
+    """Write the grid and all columns of RideMetrics as CSV, one row per grid step"""
+    names = list(metrics.columns)
+    data = np.column_stack([metrics.grid] + [metrics.columns[name] for name in names])
+    np.savetxt(filename, data, delimiter=',', header=','.join(['time'] + names), comments='',
+               fmt=['%d'] + ['%.6g'] * len(names))
+    print(f"Grid exported to {filename}")
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Resample a ride onto a time grid and derive energy metrics")
+    parser.add_argument('input_file', help="_hex.txt file with notification times")
+    parser.add_argument('--step', type=int, default=1000, help="grid step in ms (default 1000)")
+    parser.add_argument('--max-gap', type=int, default=None, help="do not hold values over gaps longer than this (ms)")
+    parser.add_argument('--csv', default=None, help="export the grid and derived series")
+    args = parser.parse_args()
+
+    from hexAnalyser import BLEMessageAnalyzer
+    analyzer = BLEMessageAnalyzer(keep_raw=False)
+    analyzer.load_from_file(args.input_file)
+    try:
+        metrics = ride_metrics(analyzer.store, args.step, args.max_gap)
+    except ValueError as e:
+        print(f"Error: {e}")
+        if not any(series.has_time for _, series in analyzer.store.items()):
+            print("The log has no notification times, extract it with hexExtractor.py")
+        raise SystemExit(1)
+    metrics.print_report()
+    if args.csv:
+        export_grid(metrics, args.csv)
+
+
+if __name__ == "__main__":
+    main()
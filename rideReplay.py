@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Replay of Decoded Rides as Cycling Power / Speed and Cadence Packets
+
+Re-encodes the speed, cadence and rider power of decoded rides into the
+packets the Android app serves to a Garmin, and publishes them to a local
+socket at the original timing or N times faster, for as many simulated
+bikes as needed:
+
+    0x2A63  Cycling Power Measurement, flags 0 + power (sint16), as
+            generateCyclingPowerMeasurement in MainActivity.kt
+    0x2AF1  eBike speed (km/h * 100) + cadence (rpm), uint16 each, as
+            generateEbikeSpeedCadenceBytes in MainActivity.kt
+    0x2A5B  CSC Measurement: cumulative wheel and crank revolutions with
+            the time of their last event in 1/1024 s
+
+Packets are encoded for a whole ride at once with NumPy: revolutions are the
+integrated (last value held) speed and cadence, the time of the last
+revolution is interpolated where the cumulative count crossed it.
+
+Every packet is sent as
+
+    bike (uint32) | characteristic (uint16) | ride time ms (uint32) | value
+
+little endian, as one UDP datagram, with a uint16 length prefix over TCP, or
+as an MQTT 3.1.1 QoS 0 message to <topic>/<bike>/<characteristic> (a local
+broker such as mosquitto stands in for the app's MQTT connection). Bike b
+replays ride b % len(rides) shifted by b * stagger.
+
+Usage:
+    python rideReplay.py Log_hex.txt [more_hex.txt ...] [--target udp://127.0.0.1:5005]
+                         [--speed 10] [--bikes 1000] [--stagger MS] [--wheel M]
+
+    stream = encode_ride(analyzer.store)
+    stats = replay([stream], UdpPublisher('127.0.0.1', 5005), speed=60, bikes=100)
+"""
+
+import argparse
+import socket
+import struct
+import time
+from urllib.parse import urlsplit
+
+from columnStore import HAS_NUMPY
+from rideMetrics import SPEED, CADENCE, HUMAN_POWER, resample_series
+
+if HAS_NUMPY:
+    import numpy as np
+
+UUID_POWER = 0x2A63
+UUID_SPEED_CADENCE = 0x2AF1
+UUID_CSC = 0x2A5B
+WHEEL_CIRCUMFERENCE = 2.2       # m, about a 29" / 700x50 tyre
+WINDOW_MS = 1000                # ride time scheduled per step, see replay
+BIKE_HEADER = struct.Struct('<I')
+PACKET_HEADER = [('uuid', '<u2'), ('time', '<u4')]
+
+
+def encode_power(power):
+    """Cycling Power Measurement values of raw HumanPower values, generateCyclingPowerMeasurement"""
+    packets = np.zeros(len(power), dtype=[('flags', '<u2'), ('power', '<i2')])
+    # maxOf(0, value).toShort(), wraps like Kotlin
+    packets['power'] = np.maximum(power, 0).astype(np.int64).astype(np.int16)
+    return packets
+
+
+def encode_speed_cadence(speed, cadence):
+    """
+    eBike speed and cadence values of raw Speed and Cadence values, generateEbikeSpeedCadenceBytes.
+
+    The app divides speed by 100.0 and multiplies it back before toInt(), the
+    float round trip truncates e.g. 29 to 28; this is kept.
+    """
+    packets = np.zeros(len(speed), dtype=[('speed', '<i2'), ('cadence', '<i2')])
+    kmh = np.maximum(speed, 0) / 100.0
+    packets['speed'] = np.trunc(kmh * 100).astype(np.int64).astype(np.int16)
+    packets['cadence'] = (np.maximum(cadence, 0) // 2).astype(np.int64).astype(np.int16)
+    return packets
+
+
+def revolutions(times, rate_per_ms):
+    """
+    Cumulative revolutions at times, holding each rate until the next time.
+
+    Rounded to 1e-9 revolutions, so float error (0.999... for exactly one
+    revolution) does not lose a whole revolution when floored.
+    """
+    dt = np.diff(times).astype(np.float64)
+    return np.round(np.concatenate(([0.0], np.cumsum(rate_per_ms[:-1] * dt))), 9)
+
+
+def last_event_times(times, revs):
+    """Time in ms at which the last whole revolution of each cumulative count was completed"""
+    whole = np.floor(revs)
+    # first time the count reached that revolution, interpolated within its step
+    j = np.clip(np.searchsorted(revs, whole, side='left'), 1, len(revs) - 1)
+    r0, r1 = revs[j - 1], revs[j]
+    t0, t1 = times[j - 1], times[j]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        frac = np.where(r1 > r0, (whole - r0) / (r1 - r0), 1.0)
+    event = t0 + np.clip(frac, 0.0, 1.0) * (t1 - t0)
+    return np.where(whole > 0, event, times[0])
+
+
+def encode_csc(times, speed, cadence, wheel=WHEEL_CIRCUMFERENCE):
+    """CSC Measurement values (wheel and crank data present) of raw Speed and Cadence values"""
+    packets = np.zeros(len(times), dtype=[('flags', 'u1'), ('wheel_revs', '<u4'), ('wheel_time', '<u2'),
+                                          ('crank_revs', '<u2'), ('crank_time', '<u2')])
+    times = times.astype(np.float64)
+    wheel_revs = revolutions(times, np.maximum(speed, 0) / 100 / 3.6 / 1000 / wheel)
+    crank_revs = revolutions(times, np.maximum(cadence, 0) / 2 / 60000)
+    start = times[0]
+    packets['flags'] = 0x03
+    packets['wheel_revs'] = np.floor(wheel_revs).astype(np.uint64).astype(np.uint32)
+    packets['wheel_time'] = ((last_event_times(times, wheel_revs) - start) * 1024 / 1000).astype(np.int64) % 65536
+    packets['crank_revs'] = np.floor(crank_revs).astype(np.int64) % 65536
+    packets['crank_time'] = ((last_event_times(times, crank_revs) - start) * 1024 / 1000).astype(np.int64) % 65536
+    return packets
+
+
+class ReplayStream:
+    """Encoded packets of one ride, sorted by time"""
+
+    def __init__(self, times, bodies):
+        self.times = times              # int64 ms since the start of the ride
+        self.bodies = bodies            # packet header + value, see PACKET_HEADER
+
+    def __len__(self):
+        return len(self.times)
+
+    @property
+    def duration_ms(self):
+        return int(self.times[-1]) if len(self.times) else 0
+
+
+def _times(store, key):
+    """Notification times of key, empty if missing or not logged"""
+    series = store.series(key)
+    if series is None or not series.has_time:
+        return np.empty(0, dtype=np.int64)
+    return series.as_numpy()[1]
+
+
+def _held(store, key, times):
+    """Raw values of key held at times, 0 before its first value or if missing"""
+    if not len(_times(store, key)):
+        return np.zeros(len(times))
+    values, series_times = store.series(key).as_numpy()
+    return np.nan_to_num(resample_series(series_times, values, times))
+
+
+def _bodies(uuid, times, values):
+    packets = np.zeros(len(times), dtype=PACKET_HEADER + [('value', values.dtype)])
+    packets['uuid'] = uuid
+    packets['time'] = times
+    packets['value'] = values
+    blob = packets.tobytes()
+    size = packets.itemsize
+    return [blob[i:i + size] for i in range(0, len(blob), size)]
+
+
+def encode_ride(store, wheel=WHEEL_CIRCUMFERENCE):
+    """
+    Encode the speed, cadence and power of a decoded ride into packets.
+
+    Power packets are sent at every HumanPower notification, speed/cadence and
+    CSC packets at every Speed or Cadence notification, as the app updates its
+    characteristics per message.
+
+    Returns:
+        ReplayStream
+    """
+    if not HAS_NUMPY:
+        raise ImportError("numpy is required for the replay, install with: pip install numpy")
+    motion_times = np.unique(np.concatenate((_times(store, SPEED), _times(store, CADENCE))))
+    power_times = _times(store, HUMAN_POWER)
+    if not len(motion_times) and not len(power_times):
+        raise ValueError("no timed speed, cadence or power in the ride")
+    start = min(times[0] for times in (motion_times, power_times) if len(times))
+
+    times, bodies = [], []
+    if len(motion_times):
+        speed = _held(store, SPEED, motion_times)
+        cadence = _held(store, CADENCE, motion_times)
+        ride_times = motion_times - start
+        times += [ride_times, ride_times]
+        bodies += _bodies(UUID_SPEED_CADENCE, ride_times, encode_speed_cadence(speed, cadence))
+        bodies += _bodies(UUID_CSC, ride_times, encode_csc(motion_times, speed, cadence, wheel))
+    if len(power_times):
+        power = _held(store, HUMAN_POWER, power_times)
+        times.append(power_times - start)
+        bodies += _bodies(UUID_POWER, power_times - start, encode_power(power))
+    times = np.concatenate(times)
+    order = np.argsort(times, kind='stable')
+    return ReplayStream(times[order], [bodies[i] for i in order])
+
+
+class NullPublisher:
+    """Counts packets without sending them, to measure the engine itself"""
+
+    def send(self, packets):
+        pass
+
+    def close(self):
+        pass
+
+
+class UdpPublisher:
+    """One datagram per packet"""
+
+    def __init__(self, host, port):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, packets):
+        sendto = self.sock.sendto
+        for packet in packets:
+            sendto(packet, self.address)
+
+    def close(self):
+        self.sock.close()
+
+
+class TcpPublisher:
+    """One stream, every packet with a uint16 length prefix"""
+
+    def __init__(self, host, port):
+        self.sock = socket.create_connection((host, port))
+
+    def send(self, packets):
+        self.sock.sendall(b''.join(struct.pack('<H', len(packet)) + packet for packet in packets))
+
+    def close(self):
+        self.sock.close()
+
+
+def _mqtt_length(length):
+    """MQTT remaining length, 7 bits per byte, least significant first"""
+    out = bytearray()
+    while True:
+        byte, length = length & 0x7F, length >> 7
+        out.append(byte | (0x80 if length else 0))
+        if not length:
+            return bytes(out)
+
+
+def _mqtt_string(text):
+    data = text.encode('utf-8')
+    return struct.pack('>H', len(data)) + data
+
+
+class MqttPublisher:
+    """Minimal MQTT 3.1.1 client publishing QoS 0 messages to <topic>/<bike>/<characteristic>"""
+
+    def __init__(self, host, port=1883, topic='bosch/replay', client_id='bosch-replay'):
+        self.topic = topic
+        self.topics = {}
+        self.sock = socket.create_connection((host, port))
+        variable = _mqtt_string('MQTT') + bytes((4, 0x02)) + struct.pack('>H', 60)
+        payload = _mqtt_string(client_id)
+        self.sock.sendall(b'\x10' + _mqtt_length(len(variable) + len(payload)) + variable + payload)
+        connack = self.sock.recv(4)
+        if len(connack) != 4 or connack[0] != 0x20 or connack[3] != 0:
+            raise ConnectionError(f"MQTT broker refused the connection: {connack.hex()}")
+
+    def _topic(self, bike, uuid):
+        key = (bike, uuid)
+        topic = self.topics.get(key)
+        if topic is None:
+            topic = self.topics[key] = _mqtt_string(f"{self.topic}/{bike}/{uuid:04X}")
+        return topic
+
+    def send(self, packets):
+        messages = []
+        for packet in packets:
+            bike, = BIKE_HEADER.unpack_from(packet)
+            uuid, = struct.unpack_from('<H', packet, 4)
+            body = self._topic(bike, uuid) + packet[10:]
+            messages.append(b'\x30' + _mqtt_length(len(body)) + body)
+        self.sock.sendall(b''.join(messages))
+
+    def close(self):
+        self.sock.sendall(b'\xe0\x00')
+        self.sock.close()
+
+
+def open_publisher(target):
+    """Publisher of a target such as udp://127.0.0.1:5005, tcp://host:port, mqtt://host:1883/topic or null"""
+    if target == 'null':
+        return NullPublisher()
+    url = urlsplit(target)
+    if url.scheme == 'udp':
+        return UdpPublisher(url.hostname, url.port)
+    if url.scheme == 'tcp':
+        return TcpPublisher(url.hostname, url.port)
+    if url.scheme == 'mqtt':
+        return MqttPublisher(url.hostname, url.port or 1883, url.path.strip('/') or 'bosch/replay')
+    raise ValueError(f"unknown target '{target}', use udp://, tcp://, mqtt:// or null")
+
+
+def _window(streams, stream_bikes, stream_offsets, lo_ms, hi_ms):
+    """(time, bike, stream, index) of all packets due in [lo_ms, hi_ms), sorted by time"""
+    parts = []
+    for s, stream in enumerate(streams):
+        offsets = stream_offsets[s]
+        if not len(offsets):
+            continue
+        lo = np.searchsorted(stream.times, lo_ms - offsets, side='left')
+        hi = np.searchsorted(stream.times, hi_ms - offsets, side='left')
+        counts = hi - lo
+        total = int(counts.sum())
+        if not total:
+            continue
+        which = np.repeat(np.arange(len(offsets)), counts)
+        index = lo[which] + np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+        parts.append((stream.times[index] + offsets[which], stream_bikes[s][which], np.full(total, s), index))
+    if not parts:
+        return None
+    times, bikes, stream_ids, index = (np.concatenate(column) for column in zip(*parts))
+    order = np.argsort(times, kind='stable')
+    return times[order], bikes[order], stream_ids[order], index[order]
+
+
+def replay(streams, publisher, speed=1.0, bikes=1, stagger_ms=0, window_ms=WINDOW_MS, clock=time.monotonic,
+           sleep=time.sleep):
+    """
+    Publish the packets of bikes simulated bikes in time order.
+
+    Args:
+        streams: ReplayStream per ride, bike b replays streams[b % len(streams)]
+        publisher: Object with send(list of packet bytes), e.g. UdpPublisher
+        speed: Time acceleration, 1 is the original timing, 0 sends as fast as possible
+        bikes: Number of simulated bikes
+        stagger_ms: Start of bike b is delayed by b * stagger_ms of ride time
+
+    Returns:
+        dict: packets, bytes, seconds (wall), max_late_ms (behind schedule)
+
+    Raises:
+        ValueError: bikes is less than 1 or there are no streams
+    """
+    if bikes < 1:
+        raise ValueError(f"bikes must be at least 1, not {bikes}")
+    if not streams:
+        raise ValueError("no streams to replay")
+    bike_ids = np.arange(bikes)
+    stream_bikes = [bike_ids[bike_ids % len(streams) == s] for s in range(len(streams))]
+    stream_offsets = [b * np.int64(stagger_ms) for b in stream_bikes]
+    end_ms = max((stream.duration_ms + int(offsets.max()) for stream, offsets in zip(streams, stream_offsets)
+                  if len(offsets) and len(stream)), default=0)
+    prefixes = [BIKE_HEADER.pack(b) for b in range(bikes)]
+    packets = sent_bytes = 0
+    max_late = 0.0
+    started = clock()
+    for lo_ms in range(0, end_ms + 1, window_ms):
+        due = _window(streams, stream_bikes, stream_offsets, lo_ms, lo_ms + window_ms)
+        if due is None:
+            continue
+        times, bike_of, stream_of, index = due
+        wall = started + times / 1000 / speed if speed > 0 else np.full(len(times), -np.inf)
+        bike_of, stream_of, index = bike_of.tolist(), stream_of.tolist(), index.tolist()
+        i = 0
+        while i < len(times):
+            now = clock()
+            ready = int(np.searchsorted(wall, now, side='right'))
+            if ready <= i:
+                sleep(wall[i] - now)
+                continue
+            batch = [prefixes[bike_of[k]] + streams[stream_of[k]].bodies[index[k]] for k in range(i, ready)]
+            publisher.send(batch)
+            if speed > 0:
+                max_late = max(max_late, (now - wall[i]) * 1000)
+            packets += len(batch)
+            sent_bytes += sum(map(len, batch))
+            i = ready
+    return {'packets': packets, 'bytes': sent_bytes, 'seconds': clock() - started, 'max_late_ms': max_late}
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Replay decoded rides as cycling power / CSC packets")
+    parser.add_argument('input_files', nargs='+', help="_hex.txt files with notification times")
+    parser.add_argument('--target', default='udp://127.0.0.1:5005',
+                        help="udp://host:port, tcp://host:port, mqtt://host:port/topic or null")
+    parser.add_argument('--speed', type=float, default=1.0, help="time acceleration, 0 = as fast as possible")
+    parser.add_argument('--bikes', type=int, default=1, help="simulated bikes (default 1)")
+    parser.add_argument('--stagger', type=int, default=0, help="start delay between bikes in ms of ride time")
+    parser.add_argument('--wheel', type=float, default=WHEEL_CIRCUMFERENCE,
+                        help=f"wheel circumference in m (default {WHEEL_CIRCUMFERENCE})")
+    args = parser.parse_args()
+    if args.bikes < 1:
+        print(f"Error: --bikes must be at least 1, not {args.bikes}")
+        raise SystemExit(1)
+
+    from hexAnalyser import BLEMessageAnalyzer
+    streams = []
+    for input_file in args.input_files:
+        analyzer = BLEMessageAnalyzer(keep_raw=False)
+        analyzer.load_from_file(input_file)
+        try:
+            streams.append(encode_ride(analyzer.store, args.wheel))
+        except ValueError as e:
+            print(f"Error: {input_file}: {e}, extract the log with notification times (hexExtractor.py)")
+            raise SystemExit(1)
+        print(f"{input_file}: {len(streams[-1])} packets over {streams[-1].duration_ms / 1000:.0f} s")
+
+    try:
+        publisher = open_publisher(args.target)
+    except (ValueError, OSError) as e:
+        print(f"Error: {e}")
+        raise SystemExit(1)
+    print(f"Replaying {args.bikes} bikes to {args.target} at {f'{args.speed:g}x' if args.speed else 'maximum speed'}, Ctrl+C to stop")
+    try:
+        stats = replay(streams, publisher, args.speed, args.bikes, args.stagger)
+    except KeyboardInterrupt:
+        print("\nStopped")
+        return
+    finally:
+        publisher.close()
+    print(f"{stats['packets']} packets, {stats['bytes'] / 1e6:.1f} MB in {stats['seconds']:.1f} s "
+          f"({stats['packets'] / max(stats['seconds'], 1e-9):.0f} packets/s), "
+          f"at most {stats['max_late_ms']:.0f} ms behind schedule")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""
+Persistent Cache of Decoded Sessions
+
+Decoding a _hex.txt file is by far the slowest step of a run, yet most runs
+see a file that has not changed (another plot, another export) or has only
+grown (a log still being written). The decoded state of every input file is
+therefore kept on disk:
+
+    <cache dir>/<sha1 of the absolute path>.npz
+
+Each entry holds the ColumnStore columns as flat NumPy arrays plus the
+remaining analyzer state (statistics, counters, time unwrapping) and is
+valid for the byte prefix of the file it was decoded from. A prefix is
+recognised by a sha1 of all its bytes, an edit anywhere in it invalidates
+the entry. Hashing reads the prefix once, still far cheaper than decoding it:
+
+    unchanged (size, mtime and hash)  -> entry is loaded, nothing is decoded
+    grown (prefix hash still matches) -> entry is loaded, only the tail is decoded
+    anything else                     -> the whole file is decoded again
+
+The analyzer state is pickled. Loading it only accepts the classes such a
+state is made of (statistics trackers, time unwrapping, schema cache), an
+entry naming any other class is treated as a miss. Still, keep the cache
+dir (BLE_CACHE_DIR) private to the user running the analysis.
+
+After every save the least recently used entries are removed until the
+cache is below max_bytes.
+
+Usage:
+    cache = SessionCache()                      # ~/.cache/bosch-ble, 512 MB
+    analyzer = BLEMessageAnalyzer()
+    status = cache.analyse("Log 2025-06-26 20_32_08_hex.txt", analyzer)   # 'hit', 'grown' or 'miss'
+"""
+
+import hashlib
+import json
+import io
+import os
+import pickle
+
+from columnStore import ColumnStore, HAS_NUMPY
+from hexAnalyser import iter_hex_file
+from onlineStats import SeriesStats
+
+if HAS_NUMPY:
+    import numpy as np
+
+CACHE_VERSION = 8           # bump when decoding changes, older entries are ignored
+CACHE_DIR = os.environ.get('BLE_CACHE_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'bosch-ble'))
+MAX_CACHE_BYTES = 512 * 1024 * 1024
+HASH_BLOCK = 1024 * 1024
+
+# analyzer attributes not stored, they come from the analyzer the entry is loaded into;
+# frame_memo only speeds up decoding, its hit counts start over
+_NOT_CACHED = ('store', 'registry', 'data_ids', '_ignore_ids', 'metrics', '_timed_registry', '_frame_slots',
+               'verbose', 'frame_memo', 'stat_trackers')
+
+# classes a pickled analyzer state is made of, the stat trackers of the analyzer are added to them
+_STATE_CLASSES = frozenset([
+    ('collections', 'Counter'), ('collections', 'defaultdict'), ('collections', 'deque'), ('functools', 'partial'),
+    ('frameReassembler', 'FrameReassembler'), ('onlineStats', 'SeriesStats'), ('protoDecoder', 'SchemaCache'),
+    ('timeIndex', 'TimeUnwrapper'),
+])
+
+
+def prefix_hash(file, length):
+    """sha1 of file[0:length], read in blocks of HASH_BLOCK bytes"""
+    digest = hashlib.sha1(str(length).encode('ascii'))
+    file.seek(0)
+    remaining = length
+    while remaining > 0:
+        block = file.read(min(remaining, HASH_BLOCK))
+        if not block:
+            break
+        digest.update(block)
+        remaining -= len(block)
+    return digest.hexdigest()
+
+
+class _StateUnpickler(pickle.Unpickler):
+    """Unpickler restricted to the given (module, name) classes"""
+
+    def __init__(self, data, allowed):
+        super().__init__(io.BytesIO(data))
+        self.allowed = allowed
+
+    def find_class(self, module, name):
+        if (module, name) not in self.allowed:
+            raise pickle.UnpicklingError(f"{module}.{name} is not part of an analyzer state")
+        return super().find_class(module, name)
+
+
+def read_tail(file, offset):
+    """
+    Read the lines behind offset.
+
+    Returns:
+        tuple: (complete lines, offset behind the last complete line,
+                text of a last line without newline)
+    """
+    file.seek(offset)
+    data = file.read()
+    end = data.rfind(b'\n') + 1
+    lines = data[:end].decode('utf-8', errors='replace').splitlines()
+    return lines, offset + end, data[end:].decode('utf-8', errors='replace')
+
+
+class SessionCache:
+    """Decoded analyzer state per input file, stored as .npz"""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        if not HAS_NUMPY:
+            raise ImportError("numpy is required for the session cache, install with: pip install numpy")
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+
+    def entry_path(self, input_file):
+        name = hashlib.sha1(os.path.abspath(input_file).encode('utf-8')).hexdigest()
+        return os.path.join(self.cache_dir, name + '.npz')
+
+    def _settings(self, analyzer):
+        """Analyzer options an entry must have been decoded with"""
+        return {'keep_raw': analyzer.store.keep_raw, 'run_length': analyzer.store.run_length,
+                'keep_rows': analyzer.store.keep_rows,
+                'reassemble': analyzer.reassembler is not None,
+                'ignore_ids': sorted(analyzer._ignore_ids),
+                'registry': analyzer.registry.fingerprint(),
+                'stat_trackers': {name: f"{type(tracker).__module__}.{type(tracker).__qualname__}"
+                                  for name, tracker in SeriesStats(analyzer.stat_trackers).trackers.items()}}
+
+    def _state_classes(self, analyzer):
+        """Classes lookup accepts in the pickled state of an entry for analyzer"""
+        tracker_classes = {(type(tracker).__module__, type(tracker).__qualname__)
+                           for tracker in SeriesStats(analyzer.stat_trackers).trackers.values()}
+        return _STATE_CLASSES | tracker_classes
+
+    def lookup(self, input_file, analyzer):
+        """
+        Restore the cached state of input_file into a fresh analyzer.
+
+        Returns:
+            tuple: (status, meta) with status 'hit', 'grown' or 'miss'; meta holds
+            the decoded byte 'offset' and 'line_num', None on a miss
+        """
+        path = self.entry_path(input_file)
+        try:
+            with np.load(path) as entry:
+                meta = json.loads(entry['meta'].tobytes())
+                if (meta['version'] != CACHE_VERSION or meta['path'] != os.path.abspath(input_file)
+                        or meta['settings'] != self._settings(analyzer)):
+                    return 'miss', None
+                st = os.stat(input_file)
+                if st.st_size < meta['offset']:
+                    return 'miss', None
+                with open(input_file, 'rb') as file:
+                    if prefix_hash(file, meta['offset']) != meta['hash']:
+                        return 'miss', None
+                columns = {name[4:]: entry[name] for name in entry.files if name.startswith('col_')}
+                state = _StateUnpickler(entry['state'].tobytes(), self._state_classes(analyzer)).load()
+        except (OSError, KeyError, ValueError, pickle.UnpicklingError):
+            return 'miss', None
+        columns.update(meta['names'])
+        analyzer.store = ColumnStore.from_columns(columns)
+        analyzer.__dict__.update(state)
+        os.utime(path)          # recently used, see evict
+        if st.st_size == meta['size'] and st.st_mtime_ns == meta['mtime_ns']:
+            return 'hit', meta
+        return 'grown', meta
+
+    def save(self, input_file, analyzer, offset, line_num):
+        """Store the state of analyzer, decoded from input_file[0:offset]"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        st = os.stat(input_file)
+        with open(input_file, 'rb') as file:
+            digest = prefix_hash(file, offset)
+        exported = analyzer.store.export_columns()
+        names = {name: exported.pop(name) for name in ('keys', 'labels', 'types', 'units', 'keep_raw', 'run_length',
+                                                   'keep_rows')}
+        meta = {
+            'version': CACHE_VERSION,
+            'path': os.path.abspath(input_file),
+            'size': st.st_size,
+            'mtime_ns': st.st_mtime_ns,
+            'offset': offset,
+            'line_num': line_num,
+            'hash': digest,
+            'settings': self._settings(analyzer),
+            'names': names,
+        }
+        state = {name: value for name, value in vars(analyzer).items() if name not in _NOT_CACHED}
+        arrays = {'col_' + name: np.frombuffer(column, dtype=np.uint8 if isinstance(column, bytearray) else column.typecode)
+                  for name, column in exported.items()}
+        arrays['meta'] = np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)
+        arrays['state'] = np.frombuffer(pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL), dtype=np.uint8)
+        # write to a temporary name first, a reader never sees half an entry
+        path = self.entry_path(input_file)
+        with open(path + '.tmp', 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(path + '.tmp', path)
+        self.evict()
+
+    def entries(self):
+        """(path, size, last use) of all entries, least recently used first"""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        result = []
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.npz'):
+                path = os.path.join(self.cache_dir, name)
+                st = os.stat(path)
+                result.append((path, st.st_size, st.st_mtime))
+        return sorted(result, key=lambda entry: entry[2])
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits max_bytes"""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+    def clear(self):
+        for path, _, _ in self.entries():
+            os.remove(path)
+
+    def analyse(self, input_file, analyzer):
+        """
+        Fill a fresh analyzer with the decoded input_file, decoding only what the cache lacks.
+
+        A last line without newline is decoded but not cached, it may still grow.
+
+        Returns:
+            str: 'hit', 'grown' or 'miss'
+        """
+        status, meta = self.lookup(input_file, analyzer)
+        offset, line_num = (meta['offset'], meta['line_num']) if meta else (0, 0)
+        with open(input_file, 'rb') as file:
+            lines, end, partial = read_tail(file, offset)
+        if lines or meta is None:
+            analyzer.load_records((num + line_num, tt, hex_data) for num, tt, hex_data in iter_hex_file(lines))
+            self.save(input_file, analyzer, end, line_num + len(lines))
+        if partial:
+            analyzer.load_records((num + line_num + len(lines), tt, hex_data)
+                                  for num, tt, hex_data in iter_hex_file([partial]))
+        return status
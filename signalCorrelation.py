@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Correlation Search to Identify Unknown Data IDs
+
+Ranks every unnamed or uncertain data key (no name in decoderRegistry, or a
+name ending in '?') by how well it follows one of the known signals: speed,
+cadence, rider and motor power, assist mode, battery and odometer.
+
+All series are put on one time grid (rideMetrics.resample, zero order
+hold), standardised, and cross-correlated with FFTs, so every lag within
++-max_lag is tried in O(n log n). At the best lag the Pearson correlation
+and the least squares fit
+
+    known ~= scale * unknown + offset
+
+are computed on the overlapping samples; scale is the candidate for the
+registry scale of the ID. Candidates are spread over worker processes, each
+correlating one candidate with all references.
+
+Usage:
+    python signalCorrelation.py Log_hex.txt [--step MS] [--max-lag MS] [--jobs N] [--top N]
+
+Example output:
+    9815_8        Torque?     HumanPower   r=0.97  lag=+0 ms   scale=2.6  offset=-1.3
+"""
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+from columnStore import HAS_NUMPY
+from rideMetrics import resample, SPEED, CADENCE, HUMAN_POWER, MOTOR_POWER, BATTERY, ASSIST_MODE, ODOMETER
+
+if HAS_NUMPY:
+    import numpy as np
+
+REFERENCE_KEYS = {
+    SPEED: 'Speed',
+    CADENCE: 'Cadence',
+    HUMAN_POWER: 'HumanPower',
+    MOTOR_POWER: 'MotorPower',
+    ASSIST_MODE: 'AssistMode',
+    BATTERY: 'Battery',
+    ODOMETER: 'TotalDist',
+}
+MIN_SAMPLES = 10            # candidates with fewer samples are not ranked
+MIN_OVERLAP = 30            # grid steps two series must share at the best lag
+HEX_DIGITS = frozenset('0123456789abcdefABCDEF')
+
+
+def is_hex_id(key):
+    """True if a data key starts with a hex data ID, '9815_8' but not 'unknown_unknown' or 'TripDistPerMode_10_0'"""
+    data_id = key.split('_', 1)[0]
+    return len(data_id) == 4 and HEX_DIGITS.issuperset(data_id)
+
+
+def candidate_keys(store, registry, min_samples=MIN_SAMPLES):
+    """Keys of unnamed or uncertain ('?') IDs with enough varying, timed samples"""
+    keys = []
+    for key, series in store.items():
+        if key in REFERENCE_KEYS or len(series) < min_samples or not series.has_time or not is_hex_id(key):
+            continue
+        name = registry.name(int(key.split('_', 1)[0], 16))
+        if name is not None and not name.endswith('?'):
+            continue
+        if min(series.values) == max(series.values):
+            continue
+        keys.append(key)
+    return keys
+
+
+def _standardise(column):
+    """Zero mean, unit variance; unknown (NaN) steps become 0 and are masked"""
+    valid = np.isfinite(column)
+    values = np.where(valid, column, 0.0)
+    if valid.sum() < 2:
+        return values, valid
+    mean = values[valid].mean()
+    std = values[valid].std()
+    values = np.where(valid, (values - mean) / (std if std > 0 else 1.0), 0.0)
+    return values, valid
+
+
+def xcorr_lags(a, b, max_lag):
+    """
+    FFT cross-correlation c[k] = sum_t a[t + k] * b[t] for k in -max_lag..max_lag.
+
+    Returns:
+        tuple: (lags, correlation) as arrays
+    """
+    n = len(a)
+    nfft = 1 << (2 * n - 1).bit_length()
+    spectrum = np.fft.rfft(a, nfft) * np.conj(np.fft.rfft(b, nfft))
+    circular = np.fft.irfft(spectrum, nfft)
+    max_lag = min(max_lag, n - 1)
+    lags = np.arange(-max_lag, max_lag + 1)
+    return lags, circular[lags % nfft]
+
+
+def _shifted(x, y, lag):
+    """Pairs (x[t + lag], y[t]) of the overlap"""
+    if lag >= 0:
+        return x[lag:], y[:len(y) - lag]
+    return x[:lag], y[-lag:]
+
+
+def best_match(candidate, reference, max_lag_steps):
+    """
+    Best lag of candidate against reference and the fit at that lag.
+
+    Returns:
+        dict: r, lag (grid steps, > 0: candidate follows the reference), scale,
+        offset, overlap; None if the series do not overlap enough
+    """
+    a, a_valid = _standardise(candidate)
+    b, b_valid = _standardise(reference)
+    lags, corr = xcorr_lags(a, b, max_lag_steps)
+    # normalise by the number of steps both series are known at each lag
+    _, counts = xcorr_lags(a_valid.astype(np.float64), b_valid.astype(np.float64), max_lag_steps)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        corr = np.where(counts >= MIN_OVERLAP, corr / counts, 0.0)
+    best = int(np.argmax(np.abs(corr)))
+    lag = int(lags[best])
+    x, y = _shifted(candidate, reference, lag)
+    both = np.isfinite(x) & np.isfinite(y)
+    if both.sum() < MIN_OVERLAP:
+        return None
+    x, y = x[both], y[both]
+    if x.std() == 0 or y.std() == 0:
+        return None
+    r = float(np.corrcoef(x, y)[0, 1])
+    scale, offset = np.polyfit(x, y, 1)
+    return {'r': r, 'lag': lag, 'scale': float(scale), 'offset': float(offset), 'overlap': int(both.sum())}
+
+
+def rank_candidate(args):
+    """Worker: match one candidate column against all reference columns, best first"""
+    key, column, references, max_lag_steps = args
+    matches = []
+    for ref_key, ref_column in references.items():
+        match = best_match(column, ref_column, max_lag_steps)
+        if match is not None:
+            match['reference'] = ref_key
+            matches.append(match)
+    matches.sort(key=lambda match: -abs(match['r']))
+    return key, matches
+
+
+def correlate_unknown_ids(store, registry=None, step_ms=1000, max_lag_ms=10000, jobs=None,
+                          keys=None, min_samples=MIN_SAMPLES):
+    """
+    Rank unknown/uncertain data keys by correlation with the known signals.
+
+    Args:
+        store: ColumnStore with notification times, e.g. BLEMessageAnalyzer.store
+        registry: DecoderRegistry for the names, default decoderRegistry.DEFAULT_REGISTRY
+        step_ms: Grid step in ms
+        max_lag_ms: Largest time shift searched in either direction
+        jobs: Worker processes, None for one per CPU, 1 to run in this process
+        keys: Candidate keys, default candidate_keys()
+
+    Returns:
+        dict: {key: [match, ...]} best match first, see best_match; lag is in ms
+    """
+    if not HAS_NUMPY:
+        raise ImportError("numpy is required for the correlation search, install with: pip install numpy")
+    if registry is None:
+        from decoderRegistry import DEFAULT_REGISTRY as registry
+    if keys is None:
+        keys = candidate_keys(store, registry, min_samples)
+    references = [key for key in REFERENCE_KEYS if key in store and store.series(key).has_time]
+    if not keys or not references:
+        return {}
+    grid, columns = resample(store, list(keys) + references, step_ms)
+    reference_columns = {key: columns[key] for key in references}
+    max_lag_steps = max(0, max_lag_ms // step_ms)
+    tasks = [(key, columns[key], reference_columns, max_lag_steps) for key in keys]
+    if jobs == 1 or len(tasks) <= 1:
+        results = map(rank_candidate, tasks)
+        ranked = dict(results)
+    else:
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            ranked = dict(executor.map(rank_candidate, tasks))
+    for matches in ranked.values():
+        for match in matches:
+            match['lag'] *= step_ms
+    return ranked
+
+
+def print_ranking(ranked, registry=None, top=3):
+    """Print the best matches per candidate, strongest candidates first"""
+    if registry is None:
+        from decoderRegistry import DEFAULT_REGISTRY as registry
+    print(f"{'Data key':<22} {'Name':<10} {'Reference':<12} {'r':>6} {'lag ms':>8} {'scale':>10} {'offset':>10}")
+    print("-" * 84)
+    order = sorted(ranked, key=lambda key: -abs(ranked[key][0]['r']) if ranked[key] else 0)
+    for key in order:
+        name = (registry.name(int(key.split('_', 1)[0], 16)) or '') if is_hex_id(key) else ''
+        for i, match in enumerate(ranked[key][:top]):
+            print(f"{key if i == 0 else '':<22} {name if i == 0 else '':<10} "
+                  f"{REFERENCE_KEYS[match['reference']]:<12} {match['r']:>6.2f} {match['lag']:>+8d} "
+                  f"{match['scale']:>10.4g} {match['offset']:>10.4g}")
+
+
+def main():
+    """Main function to handle command line arguments."""
+    parser = argparse.ArgumentParser(description="Rank unknown data IDs by correlation with known signals")
+    parser.add_argument('input_file', help="_hex.txt file with notification times")
+    parser.add_argument('--step', type=int, default=1000, help="grid step in ms (default 1000)")
+    parser.add_argument('--max-lag', type=int, default=10000, help="largest time shift searched in ms (default 10000)")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--top', type=int, default=3, help="matches shown per data key (default 3)")
+    parser.add_argument('--min-samples', type=int, default=MIN_SAMPLES, help="skip keys with fewer samples")
+    args = parser.parse_args()
+
+    from hexAnalyser import BLEMessageAnalyzer
+    analyzer = BLEMessageAnalyzer(keep_raw=False)
+    analyzer.load_from_file(args.input_file)
+    try:
+        ranked = correlate_unknown_ids(analyzer.store, analyzer.registry, args.step, args.max_lag,
+                                       args.jobs, min_samples=args.min_samples)
+    except ValueError as e:
+        print(f"Error: {e}, extract the log with notification times (hexExtractor.py)")
+        raise SystemExit(1)
+    if not ranked:
+        print("No unknown data IDs with enough timed samples, or no known signals to compare with")
+        return
+    print()
+    print_ranking(ranked, analyzer.registry, args.top)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LOG_DIR = os.path.join(ROOT, 'logs')
+
+# the tools are top level scripts, not a package
+sys.path.insert(0, ROOT)
@@ -0,0 +1,105 @@
+"""
+The string parser of the original BLEMessageAnalyzer (parse_hex_data,
+parse_message, parse_for_varint, parse_for_vararrint), kept as test oracle
+for frameDecoder. The 108C printout is left out and an empty 0A payload gives
+[0] instead of failing, everything else is as it was.
+"""
+
+IGNORE_DATA_IDS = ['988B', '984E', 'A186', 'A041']
+
+
+def parse_hex_data(hex_string):
+    """Parse hex string and extract individual messages"""
+    hex_clean = hex_string.replace(' ', '').replace('-', '').upper()
+    messages = []
+    i = 0
+    while i < len(hex_clean):
+        if i + 1 < len(hex_clean) and hex_clean[i:i + 2] == '30':
+            if i + 3 < len(hex_clean):
+                length_hex = hex_clean[i + 2:i + 4]
+                try:
+                    length = int(length_hex, 16)
+                    msg_end = i + 4 + (length * 2)
+                    if msg_end <= len(hex_clean):
+                        messages.append(hex_clean[i:msg_end])
+                        i = msg_end
+                    else:
+                        i += 2
+                except ValueError:
+                    i += 2
+            else:
+                i += 2
+        else:
+            i += 2
+    return messages
+
+
+def parse_message(message):
+    """Parse individual 30-XX message"""
+    if len(message) < 6:
+        return None
+    bytes_data = [message[i:i + 2] for i in range(0, len(message), 2)]
+    if bytes_data[0] != '30' and bytes_data[0] != '10':
+        return None
+    start_byte = bytes_data[0]
+    length = int(bytes_data[1], 16)
+    if len(bytes_data) >= 4:
+        data_id = bytes_data[2] + bytes_data[3]
+        if data_id in IGNORE_DATA_IDS:
+            return None
+        if len(bytes_data) == 4:
+            return {'type': start_byte, 'data_id': data_id, 'data_type': 8, 'value': 0, 'raw': message}
+        data_type = int(bytes_data[4], 16)
+        values = 0
+        value_bytes = bytes_data[5:len(bytes_data)]
+        if data_id == '9808' and data_type == 8:
+            values = parse_for_varint(bytes_data[5:8])
+        else:
+            if data_type == 8:
+                values = parse_for_varint(value_bytes)
+            if data_type == 10:
+                values = parse_for_vararrint([], value_bytes)
+            if data_type == 192 and data_id == '108C':
+                values = parse_for_vararrint([], value_bytes[5:])[0]
+        return {'type': start_byte, 'data_id': data_id, 'data_type': data_type, 'value': values, 'raw': message}
+    return {'type': f'{start_byte}-{length:02d}', 'data_id': 'unknown', 'data_type': 'unknown', 'value': 0,
+            'raw': message}
+
+
+def parse_for_varint(bytes_data):
+    if not bytes_data:
+        return 0
+    single_value = int(bytes_data[0], 16) & 127
+    i = 1
+    while i < len(bytes_data) and (int(bytes_data[i - 1], 16) & 128) == 128:
+        single_value = single_value + ((int(bytes_data[i], 16) & 127) << (7 * i))
+        i = i + 1
+    return single_value
+
+
+def parse_for_vararrint(val_array, bytes_data):
+    i = 0
+    single_value = 0
+    if bytes_data:
+        single_value = int(bytes_data[0], 16) & 127
+        i = 1
+        while i < len(bytes_data) and (int(bytes_data[i - 1], 16) & 128) == 128:
+            single_value = single_value + ((int(bytes_data[i], 16) & 127) << (7 * i))
+            i = i + 1
+    val_array.append(single_value)
+    if len(bytes_data) - i > 0:
+        parse_for_vararrint(val_array, bytes_data[i:len(bytes_data)])
+    return val_array
+
+
+def parse_line(hex_string):
+    """Messages of one line as the original add_data saw them; a frame that fails to parse ends the line"""
+    parsed = []
+    for message in parse_hex_data(hex_string):
+        try:
+            result = parse_message(message)
+        except ValueError:
+            break
+        if result:
+            parsed.append(result)
+    return parsed
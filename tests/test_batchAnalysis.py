@@ -0,0 +1,47 @@
+import contextlib
+import io
+
+import pytest
+
+from batchAnalysis import analyse_rides
+from hexAnalyser import BLEMessageAnalyzer, iter_hex_file
+from logGenerator import write_hex_log
+
+
+@pytest.fixture
+def rides(tmp_path):
+    paths = []
+    for seed in (1, 2):
+        path = tmp_path / f"ride{seed}_hex.txt"
+        write_hex_log(str(path), 2000, seed=seed)
+        paths.append(str(path))
+    return paths
+
+
+def sequential(paths):
+    """Every ride loaded one after the other into one analyzer"""
+    analyzer = BLEMessageAnalyzer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for path in paths:
+            with open(path, 'r') as f:
+                analyzer.load_records(iter_hex_file(f))
+    return analyzer
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_fleet_matches_sequential_load(rides, tmp_path, jobs):
+    missing = str(tmp_path / 'missing_hex.txt')
+    with contextlib.redirect_stdout(io.StringIO()):
+        fleet, errors = analyse_rides([rides[0], missing, rides[1]], jobs=jobs, keep_columns=True)
+    assert list(errors) == [missing] and 'No such file' in errors[missing]
+    expected = sequential(rides)
+    assert fleet.data_types == expected.data_types
+    assert fleet.store.series_keys() == expected.store.series_keys()
+    for key, series in expected.store.items():
+        # values only: the sequential load unwraps the restarting times of ride 2 behind ride 1
+        assert list(fleet.store.series(key).values) == list(series.values), key
+        stats, fleet_stats = expected.id_stats[key], fleet.id_stats[key]
+        assert (fleet_stats.count, fleet_stats.min, fleet_stats.max) == (stats.count, stats.min, stats.max), key
+        assert fleet_stats.mean == pytest.approx(stats.mean), key
+        assert fleet_stats.std == pytest.approx(stats.std), key
+        assert fleet_stats.recent == stats.recent, key
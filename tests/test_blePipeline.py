@@ -0,0 +1,65 @@
+import asyncio
+import contextlib
+import glob
+import io
+import os
+
+import pytest
+
+from blePipeline import run_pipeline
+from conftest import LOG_DIR
+from hexAnalyser import BLEMessageAnalyzer
+from hexExtractor import extract_hex_messages
+from logFollower import follow_log
+from timeIndex import format_time_of_day
+
+SAMPLE_LOG = sorted(glob.glob(os.path.join(LOG_DIR, '*_hex.txt')))[-1]
+START = 86390000        # 23:59:50, the ride runs past midnight
+
+
+@pytest.fixture
+def nrf_log(tmp_path):
+    """nRF Connect log of the first notifications of a sample ride, with other log lines in between"""
+    with open(SAMPLE_LOG, 'r') as f:
+        hex_lines = [line.strip() for _, line in zip(range(400), f) if line.strip()]
+    path = tmp_path / 'Log 2025-06-26 20_32_08.txt'
+    with open(path, 'w') as f:
+        f.write("I\t23:59:49.000\tConnected to D4:3C:9A:1E:22:7B\n")
+        for i, hex_data in enumerate(hex_lines):
+            time_of_day = format_time_of_day(START + 97 * i)
+            if i % 7 == 0:
+                f.write(f"D\t{time_of_day}\tgatt.setCharacteristicNotification(00000011-eaa2-11e9, true)\n")
+            f.write(f"A\t{time_of_day}\t\"(0x) {hex_data}\" received\n")
+    return path
+
+
+def state(analyzer):
+    series = {key: (list(s.values), list(s.times), list(s.scaled)) for key, s in analyzer.store.items()}
+    stats = {key: s.summary() for key, s in analyzer.id_stats.items()}
+    return series, stats, dict(analyzer.data_types)
+
+
+def extract_then_analyse(nrf_log, tmp_path):
+    hex_file = tmp_path / 'extracted_hex.txt'
+    analyzer = BLEMessageAnalyzer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        extract_hex_messages(str(nrf_log), str(hex_file), quiet=True, jobs=1)
+        analyzer.load_from_file(str(hex_file))
+    return analyzer, hex_file
+
+
+def test_pipeline_matches_extract_then_analyse(nrf_log, tmp_path):
+    expected, hex_file = extract_then_analyse(nrf_log, tmp_path)
+    assert len(expected.store) > 0 and max(expected.store.series('9809_8').times) > 86400000
+    side_output = tmp_path / 'side_hex.txt'
+    with contextlib.redirect_stdout(io.StringIO()):
+        streamed = run_pipeline(str(nrf_log), hex_output=str(side_output), jobs=1)
+    assert state(streamed) == state(expected)
+    assert side_output.read_text() == hex_file.read_text()
+
+
+def test_follow_matches_extract_then_analyse(nrf_log, tmp_path):
+    expected, _ = extract_then_analyse(nrf_log, tmp_path)
+    followed = BLEMessageAnalyzer()
+    asyncio.run(follow_log(str(nrf_log), followed, on_update=None, idle_timeout=0.05))
+    assert state(followed) == state(expected)
@@ -0,0 +1,96 @@
+import warnings
+
+import pytest
+
+from columnStore import ColumnStore, Interner, NO_RAW, NO_TIME
+from hexAnalyser import BLEMessageAnalyzer
+
+SPEED = bytes.fromhex('3004982D0805')
+ARRAY = bytes.fromhex('3006A2520A020507')
+
+
+def filled(keep_rows=True, keep_raw=True):
+    store = ColumnStore(keep_raw=keep_raw, keep_rows=keep_rows)
+    store.add('982D_8', '982D', '30', 8, 5, 1000, SPEED, scaled=0.5, unit='km/h')
+    raw = store.add('A252_10_0', 'A252_0', '30', 10, 5, 1100, ARRAY)
+    store.add('A252_10_1', 'A252_1', '30', 10, 7, 1100, raw)
+    store.add('985A_8', '985A', '30', 8, 0)
+    return store
+
+
+def test_interner_codes():
+    names = Interner()
+    assert [names.code(name) for name in ('30', '30-01', '30')] == [0, 1, 0]
+    assert names.names == ['30', '30-01'] and len(names) == 2
+
+
+def test_series_columns():
+    store = filled()
+    assert store.series_keys() == ['982D_8', 'A252_10_0', 'A252_10_1', '985A_8']
+    assert len(store) == 4 and '982D_8' in store and 'FFFF_8' not in store
+    speed = store.series('982D_8')
+    assert (list(speed.values), list(speed.scaled), list(speed.times), speed.unit) == ([5], [0.5], [1000], 'km/h')
+    # no scale: the scaled column repeats the value; no time: NO_TIME
+    cadence = store.series('985A_8')
+    assert (list(cadence.scaled), list(cadence.times), cadence.has_time) == ([0.0], [NO_TIME], False)
+    assert store.series('FFFF_8') is None
+
+
+def test_rows_share_raw_frames():
+    store = filled()
+    rows = list(store.iter_rows())
+    assert rows[0] == ('30', '982D', 8, 5, '3004982D0805', 1000, 0.5, 'km/h')
+    assert rows[1][4] == rows[2][4] == '3006A2520A020507'
+    assert rows[3][4] == '' and rows[3][5] is None
+    assert len(store.raw) == len(SPEED) + len(ARRAY)
+
+
+def test_without_rows():
+    store = filled(keep_rows=False)
+    assert not store.raw and not store.row_key and not store.keep_raw
+    assert list(store.series('A252_10_1').values) == [7]
+    with pytest.raises(ValueError):
+        list(store.iter_rows())
+    assert filled(keep_raw=False).row_raw.tolist() == [NO_RAW] * 4
+
+
+def test_export_columns_round_trip():
+    store = filled()
+    copy = ColumnStore.from_columns(store.export_columns())
+    assert list(copy.iter_rows()) == list(store.iter_rows())
+    copy.add('982D_8', '982D', '30', 8, 6, 2000, SPEED)
+    assert list(copy.series('982D_8').values) == [5, 6]
+
+
+def test_merge_remaps_codes_and_raw():
+    first = ColumnStore(keep_rows=True)
+    first.add('985A_8', '985A', '30', 8, 1, 500, bytes.fromhex('3004985A0801'))
+    merged = first.merge(filled())
+    assert merged.series_keys() == ['985A_8', '982D_8', 'A252_10_0', 'A252_10_1']
+    assert list(merged.series('985A_8').values) == [1, 0]
+    rows = list(merged.iter_rows())
+    assert [row[1] for row in rows] == ['985A', '982D', 'A252_0', 'A252_1', '985A']
+    assert rows[2][4] == rows[3][4] == '3006A2520A020507'
+    # a store without message log drops the merged log
+    assert not first.merge(filled(keep_rows=False)).keep_rows
+
+
+def test_window():
+    store = filled()
+    assert list(store.window('982D_8', 0, 2000)[1]) == [5]
+    with pytest.raises(ValueError):
+        store.window('985A_8')
+    with pytest.raises(KeyError):
+        store.window('FFFF_8')
+
+
+def test_messages_without_rows_warns():
+    analyzer = BLEMessageAnalyzer()
+    analyzer.add_data("30-04-98-2D-08-05")
+    with pytest.warns(UserWarning, match='keep_rows'):
+        assert analyzer.messages == []
+    analyzer = BLEMessageAnalyzer(keep_rows=True)
+    analyzer.add_data("30-04-98-2D-08-05")
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        assert [message['value'] for message in analyzer.messages] == [5]
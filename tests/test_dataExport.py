@@ -0,0 +1,37 @@
+import contextlib
+import glob
+import io
+import os
+
+import pytest
+
+import dataExport
+from conftest import LOG_DIR
+from dataExport import export_data
+from hexAnalyser import BLEMessageAnalyzer
+
+SAMPLE_LOGS = sorted(glob.glob(os.path.join(LOG_DIR, '*_hex.txt')))
+
+
+def analyze(filename, **options):
+    analyzer = BLEMessageAnalyzer(keep_rows=True, **options)
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer.load_from_file(filename)
+    return analyzer
+
+
+def export_bytes(analyzer, path, monkeypatch, has_numpy):
+    monkeypatch.setattr(dataExport, 'HAS_NUMPY', has_numpy)
+    # small chunks, so rows cross chunk borders
+    export_data(analyzer.store, str(path), names=analyzer.data_ids, chunk_rows=97)
+    return path.read_bytes()
+
+
+@pytest.mark.parametrize('run_length', [False, True], ids=['plain', 'run_length'])
+@pytest.mark.parametrize('filename', SAMPLE_LOGS, ids=os.path.basename)
+def test_long_csv_numpy_and_python_identical(filename, run_length, tmp_path, monkeypatch):
+    analyzer = analyze(filename, run_length=run_length)
+    with_numpy = export_bytes(analyzer, tmp_path / 'numpy.csv', monkeypatch, True)
+    without_numpy = export_bytes(analyzer, tmp_path / 'python.csv', monkeypatch, False)
+    assert with_numpy.count(b'\n') == len(analyzer.store.row_key) + 1
+    assert with_numpy == without_numpy
@@ -0,0 +1,74 @@
+import glob
+import os
+
+import pytest
+
+from conftest import LOG_DIR
+from decoderRegistry import DEFAULT_REGISTRY
+from frameDecoder import hex_to_bytes, decode_frames, UNKNOWN, WIRE_VARINT, WIRE_VARINT_ARRAY
+from legacyDecoder import parse_line, IGNORE_DATA_IDS
+
+SAMPLE_LOGS = sorted(glob.glob(os.path.join(LOG_DIR, '*_hex.txt')))
+IGNORE_IDS = frozenset(int(data_id, 16) for data_id in IGNORE_DATA_IDS)
+
+LINES = [
+    "30-04-98-2D-08-05",                        # varint
+    "30-05-98-2D-08-D4-02-30-04-98-5A-08-50",   # two byte varint, two frames
+    "30-06-98-08-08-FF-FF-7F",                  # 9808 clipped to 3 bytes
+    "30-06-A2-52-0A-02-05-87-01",               # packed array
+    "30-02-98-5A",                              # no payload, value 0
+    "30-02-98-5A-30-02-98-5B",
+    "30-01-98",                                 # too short for an ID
+    "30-10-10-8C-C0-80-55-0A-09-08-9A-D4-B5-02-10-C1-89-02",
+    "30-04-98-4E-0A-00",                        # ignored ID
+    "12-34-30-04-98-2D-08-05-30-FF-00",         # garbage before, a frame running past the end
+    "30-04-98-2D-08-05-ZZ-30-04-98-5A-08-50",   # garbled pair between frames
+    "30-04-98-2D-08-05-30-04-98-5A-08-Z0",      # garbled pair inside the last frame
+    "30-04-98-2d-08-05-3",                      # lower case, dangling half byte
+]
+
+
+def frames_of(line):
+    """Decoded frames in the form of the legacy parser"""
+    result = []
+    for frame in decode_frames(hex_to_bytes(line), IGNORE_IDS, DEFAULT_REGISTRY):
+        if frame.data_id == UNKNOWN:
+            result.append(('unknown', 'unknown', 0))
+            continue
+        value = frame.value
+        if frame.data_type == WIRE_VARINT_ARRAY:
+            value = list(value)
+        elif frame.data_type != WIRE_VARINT and frame.id_hex != '108C':
+            value = None            # protobuf, the legacy parser had no value for these
+        result.append((frame.id_hex, frame.data_type, value))
+    return result
+
+
+def legacy_frames_of(line):
+    result = []
+    for message in parse_line(line):
+        value = message['value']
+        if message['data_type'] not in ('unknown', 8, 10) and message['data_id'] != '108C':
+            value = None
+        result.append((message['data_id'], message['data_type'], value))
+    return result
+
+
+@pytest.mark.parametrize('line', LINES)
+def test_lines_match_legacy_parser(line):
+    assert frames_of(line) == legacy_frames_of(line)
+
+
+def test_garbled_pair_keeps_other_frames():
+    assert frames_of("30-04-98-2D-08-05-ZZ-30-04-98-5A-08-50") == [('982D', 8, 5), ('985A', 8, 80)]
+    # the frame the garbled pair falls into is lost, the scan resyncs behind it
+    assert frames_of("30-04-98-Z1-08-50-30-04-98-5A-08-51") == [('985A', 8, 81)]
+
+
+@pytest.mark.parametrize('filename', SAMPLE_LOGS, ids=os.path.basename)
+def test_sample_logs_match_legacy_parser(filename):
+    with open(filename, 'r') as f:
+        lines = [line.split(',', 1)[-1].strip() for line in f if line.strip() and not line.startswith('#')]
+    assert lines
+    for line in lines:
+        assert frames_of(line) == legacy_frames_of(line), line
@@ -0,0 +1,61 @@
+from itertools import accumulate
+
+from frameDecoder import hex_to_bytes, iter_frame_spans
+from frameReassembler import FrameReassembler
+from logGenerator import generate_notifications
+
+# 30-14-A2-41 frame of 22 bytes and a 9809 frame behind it
+A241 = "30-14-A2-41-0A-10-B2-B0-6B-00-51-FC-11-F0-AB-7B-00-04-63-82-25-AC"
+ASSIST = "30-04-98-09-08-01"
+
+
+def feed(reassembler, lines, step=100):
+    frames = []
+    for i, line in enumerate(lines):
+        frames.extend(frame.hex('-').upper() for frame in reassembler.feed(hex_to_bytes(line), i * step))
+    return frames
+
+
+def test_frame_split_across_two_lines():
+    reassembler = FrameReassembler()
+    frames = feed(reassembler, [A241[:23], A241[24:] + '-' + ASSIST])
+    assert frames == [A241, ASSIST]
+    assert reassembler.stats()['carried'] == 1
+
+
+def test_frame_split_across_three_lines():
+    reassembler = FrameReassembler()
+    frames = feed(reassembler, [ASSIST + '-' + A241[:11], A241[12:35], A241[36:] + '-' + ASSIST])
+    assert frames == [ASSIST, A241, ASSIST]
+    stats = reassembler.stats()
+    assert (stats['frames'], stats['carried'], stats['buffered']) == (3, 1, 0)
+
+
+def test_resync_on_garbage():
+    reassembler = FrameReassembler()
+    frames = feed(reassembler, ["FF-00-12-" + ASSIST, "AB-CD-" + A241[:23], A241[24:]])
+    assert frames == [ASSIST, A241]
+    stats = reassembler.stats()
+    assert stats['resyncs'] == 2 and stats['dropped_bytes'] == 5
+
+
+def test_pause_discards_partial_frame():
+    reassembler = FrameReassembler(max_gap=1000)
+    frames = feed(reassembler, [A241[:23], A241[24:] + '-' + ASSIST], step=5000)
+    # the continuation is garbage on its own, the 9809 frame behind it is found again
+    assert frames == [ASSIST]
+    assert reassembler.stats()['carried'] == 0
+
+
+def test_generated_splits_reassemble():
+    notifications = list(generate_notifications(2000, seed=3, split_rate=0.3))
+    stream = b''.join(data for _, data in notifications)
+    spans = list(iter_frame_spans(stream))
+    reassembler = FrameReassembler()
+    frames = [bytes(frame) for tt, data in notifications for frame in reassembler.feed(data, tt)]
+    assert frames == [stream[start:end] for start, end in spans]
+    assert reassembler.stats()['carried'] > 100
+    # the generator cuts anywhere into a frame, not only before its last bytes
+    boundaries = set(accumulate(len(data) for _, data in notifications))
+    cuts = [(cut - start, end - cut) for start, end in spans for cut in range(start + 1, end) if cut in boundaries]
+    assert min(head for head, _ in cuts) == 1 and max(tail for _, tail in cuts) > 2
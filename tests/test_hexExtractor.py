@@ -0,0 +1,66 @@
+import contextlib
+import io
+
+import pytest
+
+from hexExtractor import chunk_bounds, extract_hex_messages, iter_hex_messages, iter_log_file, scan_chunk
+from logGenerator import write_nrf_log, write_hex_log
+
+
+@pytest.fixture(scope='module')
+def nrf_log(tmp_path_factory):
+    path = tmp_path_factory.mktemp('logs') / 'ride.txt'
+    write_nrf_log(str(path), 3000, seed=4, noise_rate=0.2)
+    return path
+
+
+def expected_records(path):
+    with open(path, 'r') as f:
+        return list(iter_hex_messages(f))
+
+
+def test_chunk_bounds_end_on_newlines(nrf_log):
+    data = nrf_log.read_bytes()
+    # a chunk size that is no multiple of the line length, so every cut falls mid line
+    bounds = chunk_bounds(data, len(data), chunk_size=997)
+    assert len(bounds) > 10
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(data)
+    for (_, end), (start, _) in zip(bounds, bounds[1:]):
+        assert end == start and data[end - 1:end] == b'\n'
+
+
+def test_chunk_bounds_without_final_newline():
+    data = b"first line\nsecond line\nno newline"
+    bounds = chunk_bounds(data, len(data), chunk_size=5)
+    assert bounds == [(0, 11), (11, 23), (23, len(data))]
+
+
+def test_scan_chunk_counts_lines_from_chunk_start():
+    data = (b'noise\n'
+            b'A\t07:29:12.441\t"(0x) 30-04-98-2D-08-05" received\n'
+            b'noise received, but no hex\n'
+            b'A\t07:29:12.500\t"(0x) 30-02-98-5A" RECEIVED\n')
+    start = len(b'noise\n')
+    records, newlines = scan_chunk(data, start, len(data))
+    assert records == [(1, 26952441, '30-04-98-2D-08-05'), (3, 26952500, '30-02-98-5A')]
+    assert newlines == 3
+
+
+@pytest.mark.parametrize('jobs', [1, 2])
+def test_chunked_scan_matches_line_scan(nrf_log, jobs):
+    expected = expected_records(nrf_log)
+    assert expected[-1][0] > len(expected)     # noise lines in between
+    assert list(iter_log_file(str(nrf_log), jobs=jobs, chunk_size=997)) == expected
+
+
+def test_extract_writes_time_and_hex(nrf_log, tmp_path):
+    output = tmp_path / 'ride_hex.txt'
+    with contextlib.redirect_stdout(io.StringIO()):
+        count = extract_hex_messages(str(nrf_log), str(output), quiet=True, jobs=1)
+    records = expected_records(nrf_log)
+    assert count == len(records)
+    assert output.read_text().splitlines() == [f"{tt}, {hex_data}" for _, tt, hex_data in records]
+    # logGenerator writes the same notifications as a _hex.txt file directly
+    reference = tmp_path / 'generated_hex.txt'
+    write_hex_log(str(reference), 3000, seed=4)
+    assert output.read_text() == reference.read_text()
@@ -0,0 +1,48 @@
+import asyncio
+import time
+
+from hexAnalyser import BLEMessageAnalyzer
+from logFollower import follow_log, REFRESH_INTERVAL, IDLE_INTERVAL
+
+
+def nrf_line(i):
+    return f"A\t07:29:{i // 1000:02d}.{i % 1000:03d}\t\"(0x) 30-04-98-2D-08-{i % 100:02X}\" received\n"
+
+
+def test_refresh_follows_writes(tmp_path):
+    log = tmp_path / 'ride.txt'
+    log.write_text('')
+    analyzer = BLEMessageAnalyzer()
+    writes = []         # (time, lines in the log)
+    updates = []        # (time, frames decoded)
+
+    def on_update(analyzer):
+        updates.append((time.monotonic(), len(analyzer.store.series('982D_8'))))
+
+    def append(i):
+        with open(log, 'a') as f:
+            f.write(nrf_line(i))
+        writes.append((time.monotonic(), i + 1))
+
+    async def write():
+        # after an idle gap a write refreshes at once, the next one lands right behind that refresh
+        for i in range(0, 8, 2):
+            await asyncio.sleep(0.15)
+            seen = len(updates)
+            append(i)
+            while len(updates) == seen:
+                await asyncio.sleep(0.001)
+            await asyncio.sleep(0.005)
+            append(i + 1)
+
+    async def run():
+        writer = asyncio.ensure_future(write())
+        await follow_log(str(log), analyzer, on_update=on_update, idle_timeout=0.5)
+        await writer
+
+    asyncio.run(run())
+    assert updates[-1][1] == len(writes)
+    bound = max(REFRESH_INTERVAL, IDLE_INTERVAL) + 0.05     # slack for the scheduler
+    for written, count in writes:
+        shown = next(t for t, n in updates if n >= count)
+        assert shown - written <= bound, (count, shown - written)
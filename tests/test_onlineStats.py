@@ -0,0 +1,75 @@
+import random
+import statistics
+
+import pytest
+
+from onlineStats import SeriesStats, STAT_TRACKERS, merge_id_stats
+
+QUANTILES = (0.01, 0.05, 0.25, 0.5, 0.75, 0.95, 0.99)
+
+
+def samples(n, seed=0):
+    rng = random.Random(seed)
+    # a skewed, speed like series: mostly cruising, some stops and sprints
+    return [(1000 * i, max(0, int(rng.gauss(220, 60)) if rng.random() < 0.9 else int(rng.expovariate(1 / 400))))
+            for i in range(n)]
+
+
+def single_pass(points):
+    stats = SeriesStats(STAT_TRACKERS)
+    for time, value in points:
+        stats.update(value, time)
+    return stats
+
+
+def merged(points, cuts):
+    chunks = [points[start:end] for start, end in zip((0,) + cuts, cuts + (len(points),))]
+    stats = single_pass(chunks[0])
+    for chunk in chunks[1:]:
+        stats.merge(single_pass(chunk))
+    return stats
+
+
+def rank(values, value):
+    """Fraction of values below value"""
+    return sum(v < value for v in values) / len(values)
+
+
+@pytest.mark.parametrize('cuts', [(5000,), (1, 2, 9998), (1234, 5000, 7777)], ids=['halves', 'tiny', 'uneven'])
+def test_merge_matches_single_pass(cuts):
+    points = samples(10000)
+    values = [value for _, value in points]
+    whole, parts = single_pass(points), merged(points, cuts)
+    assert parts.count == whole.count == len(values)
+    assert (parts.min, parts.max) == (whole.min, whole.max) == (min(values), max(values))
+    assert parts.mean == pytest.approx(statistics.fmean(values))
+    assert parts['stats'].variance == pytest.approx(statistics.variance(values))
+    assert parts.recent == whole.recent == values[-5:]
+    assert parts['rate'].summary() == whole['rate'].summary()
+    for q in QUANTILES:
+        # t-digest quantiles are approximate, compare their ranks in the data
+        assert rank(values, parts['quantiles'].quantile(q)) == pytest.approx(q, abs=0.01), q
+        assert rank(values, parts['quantiles'].quantile(q)) == pytest.approx(
+            rank(values, whole['quantiles'].quantile(q)), abs=0.01), q
+
+
+def test_merge_id_stats_keeps_keys_of_either_side():
+    points = samples(2000, seed=1)
+    first = {'982D_8': single_pass(points[:1000]), '985A_8': single_pass(points[:10])}
+    second = {'982D_8': single_pass(points[1000:]), '9809_8': single_pass(points[:3])}
+    result = merge_id_stats(first, second)
+    assert sorted(result) == ['9809_8', '982D_8', '985A_8']
+    whole = single_pass(points)
+    assert result['982D_8'].count == whole.count
+    assert result['982D_8'].mean == pytest.approx(whole.mean)
+    assert result['982D_8'].std == pytest.approx(whole.std)
+    assert result['9809_8'].count == 3 and result['985A_8'].count == 10
+
+
+def test_new_ride_merge_has_no_rate_across_rides():
+    points = samples(100, seed=2)
+    stats = single_pass(points[:50])
+    later = single_pass([(time + 10 ** 6, value) for time, value in points[50:]])
+    stats.merge(later, new_ride=True)
+    rates = [abs(b[1] - a[1]) * 1000 / (b[0] - a[0]) for a, b in zip(points, points[1:]) if a != points[49]]
+    assert max(abs(stats['rate'].min_rate), stats['rate'].max_rate) == pytest.approx(max(rates))
@@ -0,0 +1,78 @@
+import contextlib
+import io
+import json
+import pickle
+
+from decoderRegistry import DEFAULT_REGISTRY
+from frameDecoder import WIRE_VARINT
+from hexAnalyser import BLEMessageAnalyzer
+from pipelineMetrics import PipelineMetrics, TimedRegistry, capture
+
+LINES = ["30-04-98-2D-08-05", "30-04-98-2D-08-05-30-04-98-5A-08-50", "30-06-A2-52-0A-02-05-07"]
+
+
+def run(frame_memo=0):
+    metrics = PipelineMetrics()
+    analyzer = BLEMessageAnalyzer(metrics=metrics, frame_memo=frame_memo)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, line in enumerate(LINES):
+            analyzer.add_data(line, 1000 * i)
+    metrics.collect(analyzer)
+    return metrics
+
+
+def test_merge_recomputes_hit_rate_and_keeps_max_gauges():
+    first, second = run(frame_memo=16), run(frame_memo=16)
+    first.gauges.update(frame_cache_hits=3, frame_cache_misses=1, frame_cache_hit_rate=0.75,
+                        traced_memory_peak_bytes=500)
+    second.gauges.update(frame_cache_hits=0, frame_cache_misses=4, frame_cache_hit_rate=0.0,
+                         traced_memory_peak_bytes=800)
+    frames = first.counters['frames']
+    first.merge(pickle.loads(pickle.dumps(second)))
+    assert first.counters['frames'] == 2 * frames
+    assert first.gauges['frame_cache_hit_rate'] == 3 / 8
+    assert first.gauges['traced_memory_peak_bytes'] == 800
+    assert first.gauges['series'] == 2 * second.gauges['series']
+
+
+def test_prometheus_text():
+    metrics = run()
+    text = metrics.to_prometheus({'982D': 'Speed'})
+    lines = text.splitlines()
+    assert text.endswith('\n')
+    assert '# TYPE ble_frames_total counter' in lines
+    assert f"ble_frames_total {metrics.counters['frames']}" in lines
+    assert '# TYPE ble_series gauge' in lines
+    assert f'ble_id_frames_total{{data_id="982D",name="Speed"}} 2' in lines
+    assert 'ble_id_frames_total{data_id="985A"} 1' in lines
+    assert any(line.startswith('ble_decoder_calls_total{decoder="decode_varint_value",data_id="982D"') for line in lines)
+    assert any(line.startswith('ble_stage_seconds_total{stage="decode"} ') for line in lines)
+    # every sample belongs to a family declared right before it
+    declared = {line.split()[2] for line in lines if line.startswith('# TYPE')}
+    assert all(line.split('{')[0].split()[0] in declared for line in lines if not line.startswith('#'))
+
+
+def test_timed_registry_wraps_decoders():
+    metrics = PipelineMetrics()
+    registry = TimedRegistry(DEFAULT_REGISTRY, metrics)
+    spec = registry.lookup(0x982D, WIRE_VARINT)
+    plain = DEFAULT_REGISTRY.lookup(0x982D, WIRE_VARINT)
+    assert spec.decoder is not plain.decoder and spec._replace(decoder=None) == plain._replace(decoder=None)
+    assert registry.lookup(0x982D, WIRE_VARINT) is spec         # wrapped once per spec and ID
+    assert spec.decoder(b'\x08\xD4\x02', 1, 3) == plain.decoder(b'\x08\xD4\x02', 1, 3)
+    assert metrics.decoder_calls[('decode_varint_value', '982D')] == 1
+    assert metrics.decoder_ns[('decode_varint_value', '982D')] > 0
+    assert registry.fingerprint() == DEFAULT_REGISTRY.fingerprint()
+
+
+def test_capture_and_write_print_nothing(tmp_path):
+    metrics = PipelineMetrics()
+    out = io.StringIO()
+    with contextlib.redirect_stdout(out):
+        with capture(metrics, cprofile=str(tmp_path / 'run.prof')):
+            print('x' * 10)
+        metrics.write(str(tmp_path / 'metrics.json'))
+    assert out.getvalue() == 'x' * 10 + '\n'
+    assert metrics.counters['printed_chars'] == 11 and metrics.stage_calls['print'] == 2
+    assert (tmp_path / 'run.prof').exists()
+    assert json.loads((tmp_path / 'metrics.json').read_text())['counters']['printed_chars'] == 11
@@ -0,0 +1,54 @@
+import math
+
+import numpy as np
+import pytest
+
+from columnStore import ColumnStore
+from plotRender import lttb, minmax_bins, series_xy
+
+
+def wave(n):
+    x = np.arange(n, dtype=np.int64) * 250
+    y = np.array([round(100 * math.sin(i / 50)) + (400 if i % 997 == 0 else 0) for i in range(n)])
+    return x, y
+
+
+@pytest.mark.parametrize('n_out', [3, 10, 1000])
+def test_lttb_keeps_endpoints_and_length(n_out):
+    x, y = wave(20000)
+    out_x, out_y = lttb(x, y, n_out)
+    assert len(out_x) == len(out_y) == n_out
+    assert (out_x[0], out_y[0]) == (x[0], y[0])
+    assert (out_x[-1], out_y[-1]) == (x[-1], y[-1])
+    assert np.all(np.diff(out_x) > 0)
+    # every kept point is a point of the series
+    assert np.array_equal(out_y, y[np.searchsorted(x, out_x)])
+
+
+@pytest.mark.parametrize('n', [0, 1, 2, 5, 1000])
+def test_lttb_short_series_unchanged(n):
+    x, y = wave(n)
+    out_x, out_y = lttb(x, y, 1000)
+    assert out_x.tolist() == x.tolist() and out_y.tolist() == y.tolist()
+
+
+def test_lttb_keeps_spike():
+    x, y = wave(20000)
+    assert lttb(x, y, 1000)[1].max() == y.max()
+
+
+def test_minmax_keeps_extremes():
+    x, y = wave(20000)
+    out_x, out_y = minmax_bins(x, y, 100)
+    assert len(out_x) <= 200 and np.all(np.diff(out_x) > 0)
+    assert (out_y.min(), out_y.max()) == (y.min(), y.max())
+
+
+def test_series_xy_draws_scaled_values():
+    store = ColumnStore()
+    for i in range(5000):
+        store.add('982D_8', '982D', '30', 8, 250 + i % 7, 1000 * i, scaled=(250 + i % 7) / 10, unit='km/h')
+    x, y, has_time = series_xy(store.series('982D_8'), n_out=100)
+    assert has_time and len(x) == 100
+    assert y.min() >= 25.0 and y.max() <= 25.6
+    assert x[0] == 0 and x[-1] == 4999000
@@ -0,0 +1,65 @@
+import contextlib
+import io
+
+from decoderRegistry import DecoderRegistry, DEFAULT_REGISTRY, VARINT_WIRE_TYPES
+from hexAnalyser import BLEMessageAnalyzer
+from protoDecoder import decode_proto
+
+# field 2 varint 1, the type byte 10 is the first tag
+PROTO_LINE = "30-04-{:s}-10-01"
+
+
+def analyze(lines, registry=None):
+    analyzer = BLEMessageAnalyzer(registry=registry)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for line in lines:
+            analyzer.add_data(line)
+    return analyzer
+
+
+def copy_registry():
+    registry = DecoderRegistry()
+    registry.decoders.update(DEFAULT_REGISTRY.decoders)
+    registry.id_info.update(DEFAULT_REGISTRY.id_info)
+    registry.id_names.update(DEFAULT_REGISTRY.id_names)
+    return registry
+
+
+def test_named_id_keeps_other_frames_as_zero():
+    analyzer = analyze([PROTO_LINE.format('98-2D'), "30-04-98-2D-08-05"])
+    assert analyzer.store.series_keys() == ['982D_16', '982D_8']
+    assert list(analyzer.store.series('982D_16').values) == [0]
+
+
+def test_unnamed_id_is_decoded_as_protobuf():
+    analyzer = analyze([PROTO_LINE.format('A2-1D')])
+    assert analyzer.store.series_keys() == ['A21D_16_2']
+    assert list(analyzer.store.series('A21D_16_2').values) == [1]
+
+
+def test_registered_proto_decoder_for_named_id():
+    registry = copy_registry()
+    registry.register(0x982D, 0x10, decode_proto)
+    analyzer = analyze([PROTO_LINE.format('98-2D')], registry)
+    assert analyzer.store.series_keys() == ['982D_16_2']
+    # varint presentation is untouched
+    assert registry.lookup(0x982D, VARINT_WIRE_TYPES[0]).name == 'Speed'
+
+
+def test_large_array_ids_decoded_unless_ignored():
+    # 988B and 984E were skipped by the original parser, they are decoded as protobuf by default now
+    line = "30-06-98-4E-0A-02-05-07-30-0A-98-8B-0A-06-0A-04-08-01-10-02-30-04-98-2D-08-05"
+    analyzer = BLEMessageAnalyzer()
+    analyzer.add_data(line)
+    assert analyzer.store.series_keys() == ['984E_10_1[0]', '984E_10_1[1]', '988B_10_1.1.1', '988B_10_1.1.2', '982D_8']
+    ignoring = BLEMessageAnalyzer(ignore_ids=BLEMessageAnalyzer.ignore_data_ids)
+    ignoring.add_data(line)
+    assert ignoring.store.series_keys() == ['982D_8']
+    assert ignoring.data_types == {8: 1}
+
+
+def test_c0_and_c1_frames_skip_their_header():
+    # C0/C1 80 nn header, then field 1 varint 5
+    analyzer = analyze(["30-07-A2-1D-C0-80-70-08-05", "30-07-18-5A-C1-80-70-08-05", "30-05-18-5A-C1-80-70"])
+    assert analyzer.store.series_keys() == ['A21D_192_1', '185A_193_1', '185A_193']
+    assert list(analyzer.store.series('185A_193_1').values) == [5]
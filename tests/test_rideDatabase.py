@@ -0,0 +1,70 @@
+import contextlib
+import glob
+import io
+import os
+import sys
+
+import pytest
+
+import rideDatabase
+from batchAnalysis import analyse_ride
+from columnStore import NO_TIME
+from conftest import LOG_DIR
+from rideDatabase import RideDatabase, ride_day_ms
+
+SAMPLE_LOGS = sorted(glob.glob(os.path.join(LOG_DIR, '*_hex.txt')))
+
+
+def ingest(db_path):
+    with RideDatabase(db_path) as db, contextlib.redirect_stdout(io.StringIO()):
+        return db.ingest(SAMPLE_LOGS, jobs=1)
+
+
+def run_main(monkeypatch, *argv):
+    monkeypatch.setattr(sys, 'argv', ['rideDatabase.py'] + list(argv))
+    rideDatabase.main()
+
+
+def test_ingest_keeps_series_only():
+    path, analyzer, error = analyse_ride(SAMPLE_LOGS[-1], keep_columns=True, keep_raw=False)
+    assert error is None
+    assert not analyzer.store.keep_rows and not analyzer.store.raw
+    assert len(analyzer.store.series('982D_8')) > 0
+
+
+def test_ingest_and_query(tmp_path):
+    db_path = str(tmp_path / 'rides.db')
+    stored, errors = ingest(db_path)
+    assert sorted(stored) == SAMPLE_LOGS and not errors
+    assert ingest(db_path) == ({}, {})          # unchanged rides are skipped
+    with RideDatabase(db_path) as db:
+        for path, ride_id in stored.items():
+            _, analyzer, _ = analyse_ride(path, keep_columns=True, keep_raw=False)
+            for key, series in analyzer.store.items():
+                ride_ids, times, values = db.query(key, rides=[ride_id])
+                assert values.tolist() == list(series.values), key
+                day_ms = ride_day_ms(path)
+                assert times.tolist() == [t if t == NO_TIME else t + day_ms for t in series.times], key
+                assert db.per_ride(key, 'count', rides=[ride_id])[1].tolist() == [len(series)], key
+
+
+def test_ambiguous_key(tmp_path, monkeypatch, capsys):
+    db_path = str(tmp_path / 'rides.db')
+    ingest(db_path)
+    with RideDatabase(db_path) as db:
+        keys = db.series_keys('982D')
+        assert len(keys) > 1
+        with pytest.raises(KeyError):
+            db.resolve('982D')
+    capsys.readouterr()
+    with pytest.raises(SystemExit) as exit_info:
+        run_main(monkeypatch, '--db', db_path, 'query', '982D')
+    assert exit_info.value.code == 1
+    out = capsys.readouterr().out
+    assert out.startswith('Error: 982D has several series')
+    assert all(key in out for key in keys)
+    with pytest.raises(SystemExit) as exit_info:
+        run_main(monkeypatch, '--db', db_path, 'query', 'FFFF', '--per-ride', 'count')
+    assert exit_info.value.code == 1
+    run_main(monkeypatch, '--db', db_path, 'query', '982D_8')
+    assert 'samples' in capsys.readouterr().out
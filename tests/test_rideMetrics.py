@@ -0,0 +1,91 @@
+import math
+import sys
+
+import numpy as np
+import pytest
+
+import rideMetrics
+from columnStore import ColumnStore
+from rideMetrics import resample, ride_metrics
+
+T0 = 25200000       # 07:00
+
+
+def timed_store():
+    # 10 s of riding on a 1 s grid; rider 100 W, motor 200 W, 20 m, mode 1 then 3
+    store = ColumnStore()
+    samples = {
+        '985B_8': [(0, 100)],
+        '985D_8': [(0, 200)],
+        '9818_8': [(0, 1000), (5000, 1010), (9000, 1020)],
+        '9809_8': [(0, 1), (5000, 3)],
+        '80BC_8': [(0, 80), (9000, 79)],
+        '982D_8': [(0, 700), (2500, 900), (9000, 900)],
+    }
+    for key, values in samples.items():
+        for t, v in values:
+            store.add(key, key[:4], '30', 8, v, T0 + t)
+    return store
+
+
+def test_resample_hold_and_linear():
+    store = timed_store()
+    grid, columns = resample(store, ['982D_8', 'FFFF_8'], step_ms=1000)
+    assert grid.tolist() == [T0 + 1000 * i for i in range(10)]
+    assert list(columns) == ['982D_8']
+    assert columns['982D_8'].tolist() == [700, 700, 700, 900, 900, 900, 900, 900, 900, 900]
+    _, columns = resample(store, ['982D_8'], step_ms=1000, method='linear')
+    assert columns['982D_8'][:4].tolist() == [700, 780, 860, 900]
+
+
+def test_resample_gap_and_start():
+    store = timed_store()
+    _, columns = resample(store, ['9809_8'], step_ms=1000, max_gap_ms=2000,
+                          start=T0 - 1000, end=T0 + 7000)
+    modes = columns['9809_8']
+    assert math.isnan(modes[0])             # before the first value
+    assert modes[1:4].tolist() == [1, 1, 1]
+    assert np.isnan(modes[4:6]).all()       # last value older than 2 s
+    assert modes[6:9].tolist() == [3, 3, 3]
+
+
+def test_ride_metrics():
+    metrics = ride_metrics(timed_store(), step_ms=1000)
+    assert metrics.rider_wh == pytest.approx(1000 / 3600)
+    assert metrics.motor_wh == pytest.approx(2000 / 3600)
+    assert metrics.assist_ratio == pytest.approx(2.0)
+    assert metrics.distance_km == pytest.approx(0.02)
+    assert metrics.battery_drain_pct_per_h == pytest.approx(400.0)
+    assert metrics.battery_drain_pct_per_km == pytest.approx(50.0)
+    assert sorted(metrics.wh_per_km) == [1, 3]
+    assert metrics.wh_per_km[1]['km'] == 0
+    assert math.isnan(metrics.wh_per_km[1]['motor_wh_per_km'])
+    assert metrics.wh_per_km[3]['km'] == pytest.approx(0.02)
+    assert metrics.wh_per_km[3]['motor_wh_per_km'] == pytest.approx(1000 / 3600 / 0.02)
+
+
+def test_single_point_grid():
+    store = ColumnStore()
+    for key, v in (('985B_8', 100), ('985D_8', 200), ('80BC_8', 80)):
+        store.add(key, key[:4], '30', 8, v, T0)
+    metrics = ride_metrics(store, step_ms=1000)
+    assert metrics.grid.tolist() == [T0]
+    assert np.isnan(metrics.columns['battery_drain_pct_per_h']).all()
+    assert math.isnan(metrics.battery_drain_pct_per_h)
+    assert metrics.motor_wh == pytest.approx(200 / 3600)
+
+
+@pytest.mark.parametrize('lines, hint', [
+    (["30-04-98-2D-08-05"], True),                  # no notification times
+    (["26940000, 30-04-A2-52-08-05"], False),       # timed, but none of the ride signals
+], ids=['untimed', 'no_signals'])
+def test_main_reports_the_actual_error(lines, hint, tmp_path, monkeypatch, capsys):
+    log = tmp_path / 'ride_hex.txt'
+    log.write_text(''.join(line + '\n' for line in lines))
+    monkeypatch.setattr(sys, 'argv', ['rideMetrics.py', str(log)])
+    with pytest.raises(SystemExit) as exit_info:
+        rideMetrics.main()
+    assert exit_info.value.code == 1
+    out = capsys.readouterr().out
+    assert 'Error: ' in out
+    assert ('hexExtractor.py' in out) == hint
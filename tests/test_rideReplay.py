@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from rideReplay import encode_csc, replay, ReplayStream
+
+# raw Speed 792 = 7.92 km/h = 2.2 m/s, one revolution per second of a 2.2 m wheel
+SPEED_1_REV_PER_S = 792.0
+# raw Cadence 120 = 60 rpm, one crank revolution per second
+CADENCE_1_REV_PER_S = 120.0
+
+
+def test_csc_constant_speed():
+    times = np.arange(0, 10001, 1000, dtype=np.int64)
+    packets = encode_csc(times, np.full(len(times), SPEED_1_REV_PER_S), np.full(len(times), CADENCE_1_REV_PER_S),
+                         wheel=2.2)
+    seconds = np.arange(len(times))
+    assert (packets['flags'] == 0x03).all()
+    assert packets['wheel_revs'].tolist() == seconds.tolist()
+    assert packets['crank_revs'].tolist() == seconds.tolist()
+    # last event times in 1/1024 s
+    assert packets['wheel_time'].tolist() == (seconds * 1024).tolist()
+    assert packets['crank_time'].tolist() == (seconds * 1024).tolist()
+
+
+def test_csc_counts_are_monotonic():
+    times = np.cumsum(np.random.default_rng(1).integers(20, 400, 5000))
+    speed = np.random.default_rng(2).uniform(0, 4500, len(times))
+    packets = encode_csc(times, speed, speed / 10)
+    assert (np.diff(packets['wheel_revs'].astype(np.int64)) >= 0).all()
+
+
+class Recorder:
+    def __init__(self):
+        self.packets = []
+
+    def send(self, batch):
+        self.packets.extend(batch)
+
+
+def test_replay_needs_a_bike():
+    stream = ReplayStream(np.array([0, 1000], dtype=np.int64), [b'\x01', b'\x02'])
+    with pytest.raises(ValueError):
+        replay([stream], Recorder(), speed=0, bikes=0)
+    publisher = Recorder()
+    stats = replay([stream], publisher, speed=0, bikes=2)
+    assert stats['packets'] == len(publisher.packets) == 4
+
+
+def test_replay_empty_stream():
+    stream = ReplayStream(np.empty(0, dtype=np.int64), [])
+    assert replay([stream], Recorder(), speed=0)['packets'] == 0
@@ -0,0 +1,73 @@
+import contextlib
+import csv
+import io
+import types
+
+from columnStore import ColumnStore
+from dataExport import message_chunks, write_csv
+from hexAnalyser import BLEMessageAnalyzer
+from rideDatabase import RideDatabase
+
+
+def run_store(keep_rows=True):
+    # speed 10 for 5 s, then 12 for 2 s, one value per second
+    store = ColumnStore(run_length=True, keep_rows=keep_rows)
+    for i, v in enumerate([10, 10, 10, 10, 10, 12, 12]):
+        store.add('982D_8', '982D', '30', 8, v, 1000 * i, scaled=v / 10, unit='km/h')
+    return store
+
+
+def test_window_returns_run_started_before_window():
+    store = run_store()
+    times, values = store.window('982D_8', 2000, 3000)
+    assert list(times) == [0] and list(values) == [10]
+    times, values = store.window('982D_8', 4500, None)
+    assert list(times) == [5000] and list(values) == [12]
+    times, values = store.window('982D_8', 3000, 5000)
+    assert list(values) == [10, 12]
+
+
+def test_long_export_keeps_run_counts(tmp_path):
+    store = run_store()
+    chunk = next(message_chunks(store))
+    assert chunk['count'] == [5, 2]
+    assert chunk['end_time'] == [4000, 6000]
+    path = tmp_path / 'long.csv'
+    assert write_csv(message_chunks(store), path) == 2
+    with open(path, newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [(row['value'], row['time'], row['count'], row['end_time']) for row in rows] == \
+        [('10', '0', '5', '4000'), ('12', '5000', '2', '6000')]
+
+
+def test_database_counts_repeats(tmp_path):
+    log = tmp_path / 'ride.txt'
+    log.write_text('')
+    analyzer = types.SimpleNamespace(store=run_store(keep_rows=False), data_ids={})
+    with RideDatabase(str(tmp_path / 'rides.db')) as db:
+        ride_id = db.add_ride(str(log), analyzer)
+        assert db.rides()[0]['samples'] == 7
+        assert db.per_ride('982D', 'count')[1].tolist() == [7]
+        assert db.per_ride('982D', 'sum')[1].tolist() == [74.0]
+        rides, times, values = db.query('982D', start=2000, end=3000)
+        assert rides.tolist() == [ride_id] and times.tolist() == [0] and values.tolist() == [10]
+
+
+def test_repeated_frames_keep_raw_once():
+    analyzer = BLEMessageAnalyzer(run_length=True, keep_rows=True)
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i in range(1000):
+            analyzer.add_data("30-04-98-2D-08-05", 1000 * i)
+        analyzer.add_data("30-04-98-2D-08-06", 1000000)
+    store = analyzer.store
+    assert len(store.row_key) == 2
+    assert len(store.raw) == 12
+    assert [row[4] for row in store.iter_rows()] == ['3004982D0805', '3004982D0806']
+
+
+def test_array_frame_shares_raw():
+    analyzer = BLEMessageAnalyzer(keep_rows=True)
+    analyzer.add_data("30-06-A2-52-0A-02-05-07")
+    store = analyzer.store
+    assert len(store.row_key) == 2 and len(store.raw) == 8
+    assert store.row_raw[0] == store.row_raw[1] == 0
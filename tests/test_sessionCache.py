@@ -0,0 +1,88 @@
+import contextlib
+import io
+
+from hexAnalyser import BLEMessageAnalyzer
+from onlineStats import trackers
+from sessionCache import SessionCache
+
+LINES = ["26940000, 30-04-98-2D-08-05", "26941000, 30-04-98-2D-08-07-30-04-98-5A-08-50",
+         "26942000, 30-02-98-5A"]
+
+
+def write_log(path, lines):
+    path.write_text(''.join(line + '\n' for line in lines))
+
+
+def cached(cache, path, **options):
+    analyzer = BLEMessageAnalyzer(**options)
+    with contextlib.redirect_stdout(io.StringIO()):
+        status = cache.analyse(str(path), analyzer)
+    return status, analyzer
+
+
+def test_settings_select_entry(tmp_path):
+    log = tmp_path / 'ride_hex.txt'
+    write_log(log, LINES)
+    cache = SessionCache(str(tmp_path / 'cache'))
+    assert cached(cache, log)[0] == 'miss'
+    status, analyzer = cached(cache, log, stat_trackers=trackers('stats', 'quantiles'))
+    assert status == 'miss'
+    assert 'quantiles' in analyzer.id_stats['982D_8'].trackers
+    # the frame memo is not part of the entry, an analyzer keeps its own
+    status, analyzer = cached(cache, log, stat_trackers=trackers('stats', 'quantiles'), frame_memo=16)
+    assert status == 'hit'
+    assert analyzer.frame_memo is not None and analyzer.frame_memo.maxsize == 16
+    status, analyzer = cached(cache, log, stat_trackers=trackers('stats', 'quantiles'))
+    assert status == 'hit' and analyzer.frame_memo is None
+
+
+def state(analyzer):
+    series = {key: (list(s.values), list(s.times), list(s.scaled)) for key, s in analyzer.store.items()}
+    stats = {key: s.summary() for key, s in analyzer.id_stats.items()}
+    return series, stats, dict(analyzer.data_types)
+
+
+def test_miss_hit_grown_match_uncached(tmp_path):
+    log = tmp_path / 'ride_hex.txt'
+    write_log(log, LINES)
+    cache = SessionCache(str(tmp_path / 'cache'))
+    status, first = cached(cache, log)
+    assert status == 'miss'
+    status, again = cached(cache, log)
+    assert status == 'hit'
+    assert state(again) == state(first)
+
+    grown = LINES + ["26943000, 30-04-98-2D-08-09", "26944000, 30-04-98-5A-08-52"]
+    write_log(log, grown)
+    status, analyzer = cached(cache, log)
+    assert status == 'grown'
+    uncached = BLEMessageAnalyzer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        uncached.load_from_file(str(log))
+    assert state(analyzer) == state(uncached)
+    assert cached(cache, log)[0] == 'hit'
+
+
+def test_edit_in_prefix_misses(tmp_path):
+    # a log larger than a hash block, so the edit is neither at its start nor at its end
+    lines = [f"{26940000 + 1000 * i}, 30-04-98-2D-08-{i % 100:02d}" for i in range(60000)]
+    log = tmp_path / 'ride_hex.txt'
+    write_log(log, lines)
+    cache = SessionCache(str(tmp_path / 'cache'))
+    assert cached(cache, log)[0] == 'miss'
+    lines[30000] = lines[30000][:-2] + '7F'
+    write_log(log, lines + ["86940000, 30-04-98-2D-08-01"])
+    status, analyzer = cached(cache, log)
+    assert status == 'miss'
+    assert 127 in analyzer.store.series('982D_8').values
+
+
+def test_foreign_class_in_state_misses(tmp_path):
+    log = tmp_path / 'ride_hex.txt'
+    write_log(log, LINES)
+    cache = SessionCache(str(tmp_path / 'cache'))
+    status, analyzer = cached(cache, log)
+    analyzer.proto_samples['x'] = io.StringIO()         # not part of an analyzer state
+    cache.save(str(log), analyzer, log.stat().st_size, len(LINES))
+    assert cached(cache, log)[0] == 'miss'
+    assert cached(cache, log)[0] == 'hit'
@@ -0,0 +1,45 @@
+import contextlib
+import io
+
+import numpy as np
+
+from columnStore import ColumnStore
+from decoderRegistry import DEFAULT_REGISTRY
+from signalCorrelation import correlate_unknown_ids, candidate_keys, print_ranking, is_hex_id
+
+
+def timed_store(n=200):
+    rng = np.random.default_rng(3)
+    speed = np.cumsum(rng.integers(-50, 51, n)) + 2000
+    store = ColumnStore()
+    for i, v in enumerate(speed.tolist()):
+        t = 25200000 + 1000 * i
+        store.add('982D_8', '982D', '30', 8, v, t)
+        store.add('9865_8', '9865', '30', 8, 2 * v + 7, t)
+        store.add('unknown_unknown', 'unknown', '30-02', -1, i % 7, t)
+    return store
+
+
+def test_is_hex_id():
+    assert is_hex_id('9815_8')
+    assert is_hex_id('a252_10_0')
+    assert not is_hex_id('unknown_unknown')
+    assert not is_hex_id('TripDistPerMode_10_0')
+
+
+def test_unknown_frames_are_not_candidates():
+    store = timed_store()
+    assert candidate_keys(store, DEFAULT_REGISTRY) == ['9865_8']
+    ranked = correlate_unknown_ids(store, jobs=1)
+    assert list(ranked) == ['9865_8']
+    best = ranked['9865_8'][0]
+    assert best['reference'] == '982D_8'
+    assert best['r'] > 0.99 and best['lag'] == 0
+    assert abs(best['scale'] - 0.5) < 1e-6
+
+
+def test_print_ranking_skips_non_hex_names():
+    ranked = {'unknown_unknown': [{'reference': '982D_8', 'r': 0.5, 'lag': 0, 'scale': 1.0, 'offset': 0.0}]}
+    with contextlib.redirect_stdout(io.StringIO()) as out:
+        print_ranking(ranked)
+    assert 'unknown_unknown' in out.getvalue()
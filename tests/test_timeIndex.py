@@ -0,0 +1,32 @@
+import contextlib
+import io
+
+from hexAnalyser import BLEMessageAnalyzer
+from timeIndex import TimeUnwrapper, TimeIndex, DAY_MS, parse_time_of_day
+
+
+def test_jitter_is_held_monotonic():
+    unwrap = TimeUnwrapper()
+    times = [unwrap(tt) for tt in (1000, 1050, 1040, 1045, 1100)]
+    assert times == [1000, 1050, 1050, 1050, 1100]
+    assert times == sorted(times)
+
+
+def test_midnight_wrap():
+    unwrap = TimeUnwrapper()
+    start = DAY_MS - 500
+    times = [unwrap(tt) for tt in (start, start + 400, start + 300, 100, 50, 200)]
+    assert times == [start, start + 400, start + 400, DAY_MS + 100, DAY_MS + 100, DAY_MS + 200]
+
+
+def test_window_after_jitter():
+    analyzer = BLEMessageAnalyzer()
+    base = parse_time_of_day("07:29")
+    # speed 1..6, the third notification is logged 30 ms before the second
+    with contextlib.redirect_stdout(io.StringIO()):
+        for i, dt in enumerate((0, 1000, 970, 2000, 3000, 4000)):
+            analyzer.add_data(f"30-04-98-2D-08-{i + 1:02X}", base + dt)
+    times, values = analyzer.time_window('982D_8', base + 1000, base + 2000)
+    assert list(values) == [2, 3, 4]
+    assert list(times) == sorted(times)
+    assert TimeIndex(times).window(base + 1500, None) == (2, 3)
@@ -0,0 +1,86 @@
+import contextlib
+import glob
+import io
+import os
+
+import numpy as np
+import pytest
+
+from conftest import LOG_DIR
+from frameDecoder import WIRE_VARINT, decode_varint, decode_varints
+from hexAnalyser import BLEMessageAnalyzer, iter_hex_file
+from vectorDecoder import (pack_lines, decode_batches, batch_decode_varints, batch_decode_varint_arrays, load_batched,
+                           can_load, MAX_VARINT_BYTES)
+
+SAMPLE_LOGS = sorted(glob.glob(os.path.join(LOG_DIR, '*_hex.txt')))
+
+
+def analyze(filename):
+    analyzer = BLEMessageAnalyzer()
+    with contextlib.redirect_stdout(io.StringIO()):
+        analyzer.load_from_file(filename)
+    return analyzer
+
+
+def test_zero_value_frames():
+    columns = decode_batches(pack_lines(["30-02-98-5A", "30-04-98-5A-08-50", "30-02-98-5A-30-02-98-5B"]))
+    assert columns[(0x985A, WIRE_VARINT)].tolist() == [0, 80, 0]
+    assert columns[(0x985B, WIRE_VARINT)].tolist() == [0]
+
+
+@pytest.mark.parametrize('filename', SAMPLE_LOGS, ids=os.path.basename)
+def test_varints_match_analyzer(filename):
+    store = analyze(filename).store
+    with open(filename, 'r') as f:
+        columns = decode_batches(pack_lines(f))
+    varint_ids = [data_id for data_id, wire_type in columns if wire_type == WIRE_VARINT]
+    assert varint_ids
+    for data_id in varint_ids:
+        key = f"{data_id:04X}_8"
+        assert columns[(data_id, WIRE_VARINT)].tolist() == list(store.series(key).values), key
+
+
+def test_varint_byte_limit():
+    # 9 bytes decode like the scalar decoder, a 10th byte is beyond int64 and dropped
+    nine = bytes([0xFF] * (MAX_VARINT_BYTES - 1) + [0x7F])
+    ten = bytes([0xFF] * MAX_VARINT_BYTES + [0x01])
+    buf = np.frombuffer(nine + ten, dtype=np.uint8)
+    values = batch_decode_varints(buf, [0, len(nine)], [len(nine), len(buf)])
+    assert values[0] == decode_varint(nine, 0, len(nine))[0] == 2 ** 63 - 1
+    assert decode_varint(ten, 0, len(ten))[0] == 2 ** 64 - 1
+    assert values[1] == 2 ** 63 - 1
+
+
+def test_varint_array_byte_limit():
+    # bytes of an array element beyond MAX_VARINT_BYTES are dropped, the next element is unaffected
+    ten = bytes([0xFF] * MAX_VARINT_BYTES + [0x01])
+    payload = ten + bytes([0x05]) + ten
+    values, rows = batch_decode_varint_arrays(np.frombuffer(payload, dtype=np.uint8), [0], [len(payload)])
+    assert values.tolist() == [2 ** 63 - 1, 5, 2 ** 63 - 1] and rows.tolist() == [0, 3]
+    assert list(decode_varints(payload, 0, len(payload))) == [2 ** 64 - 1, 5, 2 ** 64 - 1]
+
+
+def test_frame_memo_uses_scalar_load():
+    assert can_load(BLEMessageAnalyzer(keep_raw=False))
+    analyzer = BLEMessageAnalyzer(keep_raw=False, frame_memo=16)
+    assert not can_load(analyzer)
+    with pytest.raises(ValueError):
+        load_batched(analyzer, [])
+
+
+@pytest.mark.parametrize('filename', SAMPLE_LOGS, ids=os.path.basename)
+def test_load_batched_matches_analyzer(filename):
+    scalar = analyze(filename)
+    batched = BLEMessageAnalyzer(keep_raw=False)
+    with open(filename, 'r') as f, contextlib.redirect_stdout(io.StringIO()):
+        load_batched(batched, iter_hex_file(f))
+    assert batched.store.series_keys() == scalar.store.series_keys()
+    assert batched.data_types == scalar.data_types
+    for key, series in scalar.store.items():
+        other = batched.store.series(key)
+        assert (other.values, other.times, other.scaled) == (series.values, series.times, series.scaled), key
+        stats, other_stats = scalar.id_stats[key], batched.id_stats[key]
+        assert (other_stats.count, other_stats.min, other_stats.max) == (stats.count, stats.min, stats.max), key
+        assert other_stats.recent == stats.recent, key
+        assert other_stats.mean == pytest.approx(stats.mean), key
+        assert other_stats.std == pytest.approx(stats.std), key
@@ -0,0 +1,116 @@
+"""
+BLE Notification Time Index
+
+nRF Connect logs only carry the time of day (07:29:12.441). The helpers here
+turn those millisecond times of day into a monotonic time line, adding a day
+each time the clock wraps at midnight, and slice time windows of a sorted
+time column with binary search.
+
+Usage:
+    unwrap = TimeUnwrapper()
+    times = [unwrap(tt) for tt in times_of_day]
+    lo, hi = TimeIndex(times).window("07:29", "07:45")
+    speed_in_window = values[lo:hi]
+"""
+
+from bisect import bisect_left, bisect_right
+
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def parse_time_of_day(text):
+    """
+    Convert "HH:MM", "HH:MM:SS" or "HH:MM:SS.mmm" to milliseconds since midnight.
+    """
+    parts = text.strip().split(':')
+    if not 2 <= len(parts) <= 3:
+        raise ValueError(f"Invalid time of day '{text}', expected HH:MM[:SS[.mmm]]")
+    seconds = float(parts[2]) if len(parts) == 3 else 0.0
+    return (int(parts[0]) * 60 + int(parts[1])) * 60000 + int(round(seconds * 1000))
+
+
+def format_time_of_day(tt):
+    """Format milliseconds (possibly unwrapped past midnight) as HH:MM:SS.mmm"""
+    tt %= DAY_MS
+    return f"{tt // 3600000:02d}:{tt // 60000 % 60:02d}:{tt // 1000 % 60:02d}.{tt % 1000:03d}"
+
+
+class TimeUnwrapper:
+    """Map times of day to a monotonic time line across midnight"""
+
+    def __init__(self):
+        self.day_offset = 0
+        self.last = None
+        self.latest = None      # largest time returned so far
+
+    def __call__(self, tt):
+        # a jump back by more than half a day is the clock passing midnight,
+        # smaller steps back are notification jitter and are held at the latest
+        # time, so time columns stay sorted for TimeIndex
+        if self.last is not None and tt < self.last - DAY_MS // 2:
+            self.day_offset += DAY_MS
+        self.last = tt
+        tt += self.day_offset
+        if self.latest is not None and tt < self.latest:
+            return self.latest
+        self.latest = tt
+        return tt
+
+
+class TimeIndex:
+    """Binary search over a sorted column of unwrapped millisecond times"""
+
+    def __init__(self, times, end_times=None):
+        """
+        Args:
+            times: Sorted times, of the first value of each run in a run length series
+            end_times: Times of the last value of each run; a run is in a window it overlaps
+        """
+        self.times = times
+        self.end_times = end_times
+
+    def __len__(self):
+        return len(self.times)
+
+    def resolve(self, when, after=None):
+        """
+        Convert a query time to the time line of the column.
+
+        Args:
+            when: Unwrapped milliseconds (int) or a time of day string
+            after: If given, a time of day maps to its first occurrence at or
+                after this time, so a window of "23:50" to "00:10" spans midnight
+
+        Without `after` a time of day maps to the occurrence within half a day
+        of the first sample.
+        """
+        if not isinstance(when, str):
+            return when
+        tod = parse_time_of_day(when)
+        if after is None:
+            first = self.times[0] if len(self.times) else 0
+            tt = tod + first // DAY_MS * DAY_MS
+            if tt < first - DAY_MS // 2:
+                tt += DAY_MS
+            return tt
+        tt = tod + after // DAY_MS * DAY_MS
+        if tt < after:
+            tt += DAY_MS
+        return tt
+
+    def window(self, start=None, end=None):
+        """
+        Return (lo, hi) so that times[lo:hi] lies within start <= t <= end.
+
+        Either bound may be None for an open ended window.
+        """
+        lo = 0
+        hi = len(self.times)
+        start_time = None
+        if start is not None:
+            start_time = self.resolve(start)
+            lo = bisect_left(self.times if self.end_times is None else self.end_times, start_time)
+        if end is not None:
+            end_time = self.resolve(end, after=start_time)
+            hi = bisect_right(self.times, end_time)
+        return lo, max(lo, hi)
@@ -0,0 +1,344 @@
+"""
+Vectorized Varint Decoder
+
+Decodes the varint payloads of many frames at once with NumPy instead of
+one byte per interpreter step. The frames of one data ID are packed into a
+contiguous uint8 buffer and addressed with start/end offsets, so tens of
+millions of 982D/985A/985B frames decode at array speed.
+
+Decoding rules are the same as frameDecoder.decode_varint/decode_varints:
+a varint ends on a byte without the 0x80 continuation bit or at the end of
+its payload, and an empty payload decodes to 0. Unlike the scalar decoder,
+which returns Python ints of any size, only the first MAX_VARINT_BYTES
+bytes (63 bits) of a varint are decoded; the analyzer's int64 columns could
+not hold more either.
+
+load_batched fills a BLEMessageAnalyzer this way: varint frames go to the
+batch decoder, every other frame through the analyzer as before. batchAnalysis
+uses it for _hex.txt rides when NumPy is installed.
+
+Usage:
+    batches = pack_lines(open("Log_hex.txt"))
+    columns = decode_batches(batches)
+    speed = columns[(0x982D, 0x08)]               # int64 array
+    values, rows = columns[(0xA252, 0x0A)]        # flat values + row offsets
+
+    analyzer = BLEMessageAnalyzer(keep_raw=False)
+    if can_load(analyzer):
+        load_batched(analyzer, iter_hex_file(open("Log_hex.txt")))
+"""
+
+from array import array
+
+from columnStore import HAS_NUMPY, NO_TIME
+from decoderRegistry import decode_varint_value, decode_short_varint
+from frameDecoder import (hex_to_bytes, iter_frame_spans, decode_frame, WIRE_VARINT,
+                          WIRE_VARINT_ARRAY, ID_SPEED1)
+from onlineStats import RunningStats, RecentValues
+
+if HAS_NUMPY:
+    import numpy as np
+
+MAX_VARINT_BYTES = 9        # 9 * 7 = 63 bits fit an int64
+
+
+class FrameBatch:
+    """Payloads of all frames of one (data_id, wire_type) packed into one buffer"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.starts = []
+        self.ends = []
+        self.times = array('q')     # notification time per frame, filled by load_batched
+
+    def __len__(self):
+        return len(self.starts)
+
+    def append(self, payload):
+        """Append one payload (bytes or memoryview slice)"""
+        self.starts.append(len(self.buffer))
+        self.buffer += payload
+        self.ends.append(len(self.buffer))
+
+    def arrays(self):
+        """Return (uint8 buffer, int64 starts, int64 ends) for the batch decoders"""
+        if not HAS_NUMPY:
+            raise ImportError("numpy is required for batch decoding, install with: pip install numpy")
+        return (np.frombuffer(bytes(self.buffer), dtype=np.uint8),
+                np.asarray(self.starts, dtype=np.int64),
+                np.asarray(self.ends, dtype=np.int64))
+
+
+def pack_lines(lines, ignore_ids=()):
+    """
+    Split _hex.txt lines into one FrameBatch per (data_id, wire_type).
+
+    The type byte itself is not part of the payload. Frames without one
+    (30-02-98-5A, the bike's value 0) are packed as empty varint payloads,
+    which decode to 0 like frameDecoder.decode_frame. 9808 frames are clipped
+    to their 3 byte varint like BLEMessageAnalyzer does.
+
+    Returns:
+        dict: {(data_id, wire_type): FrameBatch}
+    """
+    batches = {}
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        if ',' in line:  # "tt, hex" lines of hexExtractor
+            line = line.split(',', 1)[1]
+        view = memoryview(hex_to_bytes(line))
+        for offset, end in iter_frame_spans(view):
+            if end - offset < 4:
+                continue
+            data_id = (view[offset + 2] << 8) | view[offset + 3]
+            if data_id in ignore_ids:
+                continue
+            if end - offset == 4:
+                wire_type, start = WIRE_VARINT, end
+            else:
+                wire_type, start = view[offset + 4], offset + 5
+            if data_id == ID_SPEED1 and wire_type == WIRE_VARINT:
+                end = min(end, start + 3)
+            batch = batches.get((data_id, wire_type))
+            if batch is None:
+                batch = batches[(data_id, wire_type)] = FrameBatch()
+            batch.append(view[start:end])
+    return batches
+
+
+def batch_decode_varints(buf, starts, ends):
+    """
+    Decode the first varint of every payload buf[starts[i]:ends[i]].
+
+    Runs one vectorized pass per varint byte position (at most
+    MAX_VARINT_BYTES passes) over all frames. A longer varint keeps the
+    value of its first MAX_VARINT_BYTES bytes.
+
+    Returns:
+        numpy.ndarray: int64 value per frame
+    """
+    if not HAS_NUMPY:
+        raise ImportError("numpy is required for batch decoding, install with: pip install numpy")
+    buf = np.asarray(buf, dtype=np.uint8)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    values = np.zeros(len(starts), dtype=np.int64)
+    active = starts < ends
+    for k in range(MAX_VARINT_BYTES):
+        if not active.any():
+            break
+        idx = np.where(active, starts + k, 0)
+        byte = buf[idx].astype(np.int64)
+        values[active] |= (byte[active] & 0x7F) << (7 * k)
+        active &= (byte & 0x80).astype(bool) & (starts + k + 1 < ends)
+    return values
+
+
+def _gather(buf, starts, ends):
+    """Concatenate buf[starts[i]:ends[i]] without a Python loop"""
+    lengths = ends - starts
+    total = int(lengths.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.uint8), lengths
+    first = np.cumsum(lengths) - lengths
+    index = np.arange(total, dtype=np.int64) + np.repeat(starts - first, lengths)
+    return buf[index], lengths
+
+
+def batch_decode_varint_arrays(buf, starts, ends):
+    """
+    Decode packed varint arrays (wire type 0x0A) of every payload.
+
+    Bytes of a varint beyond MAX_VARINT_BYTES are dropped from its value.
+
+    Returns:
+        tuple: (values, row_offsets) where the values of frame i are
+        values[row_offsets[i]:row_offsets[i + 1]]. Empty payloads decode to [0].
+    """
+    if not HAS_NUMPY:
+        raise ImportError("numpy is required for batch decoding, install with: pip install numpy")
+    buf = np.asarray(buf, dtype=np.uint8)
+    starts = np.asarray(starts, dtype=np.int64)
+    ends = np.asarray(ends, dtype=np.int64)
+    data, lengths = _gather(buf, starts, ends)
+    n_rows = len(starts)
+    empty = lengths == 0
+
+    if len(data):
+        # a varint ends on a byte without continuation bit or at the end of its payload
+        is_end = (data & 0x80) == 0
+        is_end[np.cumsum(lengths[~empty]) - 1] = True
+        first = np.flatnonzero(np.concatenate(([True], is_end[:-1])))
+        varint_id = np.cumsum(is_end) - is_end
+        position = np.arange(len(data), dtype=np.int64) - first[varint_id]
+        # bytes beyond MAX_VARINT_BYTES add nothing, the shift is clamped only to stay in range
+        bits = np.where(position < MAX_VARINT_BYTES, (data & 0x7F).astype(np.int64), 0)
+        decoded = np.add.reduceat(bits << (7 * np.minimum(position, MAX_VARINT_BYTES - 1)), first)
+        row_ends = np.cumsum(lengths[~empty])
+        counts_nonempty = np.diff(np.concatenate(([0], np.cumsum(is_end)[row_ends - 1])))
+    else:
+        decoded = np.empty(0, dtype=np.int64)
+        counts_nonempty = np.empty(0, dtype=np.int64)
+
+    counts = np.ones(n_rows, dtype=np.int64)
+    counts[~empty] = counts_nonempty
+    row_offsets = np.concatenate(([0], np.cumsum(counts))).astype(np.int64)
+
+    values = np.zeros(int(row_offsets[-1]), dtype=np.int64)
+    if len(decoded):
+        rows = np.repeat(np.flatnonzero(~empty), counts_nonempty)
+        empties_before = np.cumsum(empty) - empty
+        values[np.arange(len(decoded)) + empties_before[rows]] = decoded
+    return values, row_offsets
+
+
+def array_columns(values, row_offsets, width=None, fill=0):
+    """
+    Spread packed array rows into a 2D int64 matrix, one column per array index.
+
+    Rows shorter than width are padded with fill.
+    """
+    if not HAS_NUMPY:
+        raise ImportError("numpy is required for batch decoding, install with: pip install numpy")
+    counts = np.diff(row_offsets)
+    if width is None:
+        width = int(counts.max()) if len(counts) else 0
+    matrix = np.full((len(counts), width), fill, dtype=np.int64)
+    rows = np.repeat(np.arange(len(counts)), counts)
+    cols = np.arange(len(values)) - np.repeat(row_offsets[:-1], counts)
+    keep = cols < width
+    matrix[rows[keep], cols[keep]] = values[keep]
+    return matrix
+
+
+def decode_batches(batches):
+    """
+    Decode every FrameBatch of pack_lines.
+
+    Returns:
+        dict: {(data_id, 0x08): int64 array,
+               (data_id, 0x0A): (values, row_offsets)}
+        Other wire types are left to the scalar decoder.
+    """
+    columns = {}
+    for key, batch in batches.items():
+        wire_type = key[1]
+        if wire_type == WIRE_VARINT:
+            columns[key] = batch_decode_varints(*batch.arrays())
+        elif wire_type == WIRE_VARINT_ARRAY:
+            columns[key] = batch_decode_varint_arrays(*batch.arrays())
+    return columns
+
+
+def can_load(analyzer):
+    """
+    True if load_batched can fill analyzer: NumPy is installed and the
+    analyzer keeps no message log, no run length series, no metrics, no
+    frame memo and does not reassemble split frames.
+    """
+    store = analyzer.store
+    return (HAS_NUMPY and not store.keep_rows and not store.run_length
+            and analyzer.metrics is None and analyzer.frame_memo is None and analyzer.reassembler is None)
+
+
+def load_batched(analyzer, records):
+    """
+    Add (line_num, tt, hex_data) records like BLEMessageAnalyzer.load_records.
+
+    Frames decoded by the plain varint decoders of the analyzer's registry
+    are packed per data ID and decoded in one batch at the end; every other
+    frame is stored line by line through analyzer.add_frames. Series, times,
+    type counts and statistics come out as the scalar load gives them, the
+    mean and std up to float rounding. See can_load for the analyzers this
+    works with.
+
+    Returns:
+        int: number of lines added
+    """
+    if not can_load(analyzer):
+        raise ValueError("analyzer keeps rows, runs, metrics, a frame memo or reassembles, use its own load_records")
+    registry = analyzer.registry
+    ignore_ids = analyzer._ignore_ids
+    store = analyzer.store
+    batches = {}        # data_id -> FrameBatch, None if its varints are not batch decoded
+    count = 0
+    for line_num, tt, hex_data in records:
+        try:
+            time = NO_TIME
+            if tt is not None:
+                tt = analyzer._unwrap_time(tt)
+                time = tt
+            buf = hex_to_bytes(hex_data)
+            view = memoryview(buf)
+            for offset, end in iter_frame_spans(view):
+                size = end - offset
+                if size >= 4 and (size == 4 or view[offset + 4] == WIRE_VARINT):
+                    data_id = (view[offset + 2] << 8) | view[offset + 3]
+                    if data_id in ignore_ids:
+                        continue
+                    batch = batches.get(data_id, False)
+                    if batch is False:
+                        batch = batches[data_id] = _new_batch(store, registry, data_id)
+                    if batch is not None:
+                        start = min(offset + 5, end)
+                        if batch.short:
+                            end = min(end, start + 3)
+                        batch.append(view[start:end])
+                        batch.times.append(time)
+                        continue
+                frame = decode_frame(view, offset, end, registry, ignore_ids)
+                if frame is not None:
+                    # one frame at a time, so new keys appear in the same order as in a scalar load
+                    analyzer.add_frames(buf, (frame,), tt)
+            count += 1
+        except Exception as e:
+            print(f"Error parsing line {line_num}: {hex_data}")
+            print(f"Error: {e}")
+    for data_id, batch in batches.items():
+        if batch:
+            _store_batch(analyzer, f"{data_id:04X}_{WIRE_VARINT}", batch)
+    return count
+
+
+def _new_batch(store, registry, data_id):
+    """FrameBatch for the varint frames of data_id, None if its decoder is not a plain varint"""
+    spec = registry.lookup(data_id, WIRE_VARINT)
+    if spec.decoder not in (decode_varint_value, decode_short_varint):
+        return None
+    batch = FrameBatch()
+    batch.short = spec.decoder is decode_short_varint
+    batch.scale = spec.scale
+    # reserve the series now, so keys keep their order of first appearance
+    batch.series = store.add_series(f"{data_id:04X}_{WIRE_VARINT}", spec.unit)
+    return batch
+
+
+def _store_batch(analyzer, key, batch):
+    values = batch_decode_varints(*batch.arrays())
+    times = np.frombuffer(batch.times, dtype=np.int64)
+    series = batch.series
+    series.values.frombytes(values.tobytes())
+    series.scaled.frombytes((values * batch.scale).tobytes())
+    series.times.frombytes(times.tobytes())
+    analyzer.data_types[WIRE_VARINT] += len(values)
+    stats = analyzer.id_stats[key]
+    for name, tracker in stats.trackers.items():
+        if type(tracker) is RunningStats:
+            tracker.merge(_running_stats(values))
+        elif type(tracker) is RecentValues:
+            tracker.values.extend(values[-tracker.values.maxlen:].tolist())
+        else:
+            for value, time in zip(values.tolist(), batch.times):
+                tracker.update(value, None if time == NO_TIME else time)
+
+
+def _running_stats(values):
+    stats = RunningStats()
+    stats.count = len(values)
+    stats.min = int(values.min())
+    stats.max = int(values.max())
+    stats.mean = float(values.mean())
+    stats._m2 = float(((values - stats.mean) ** 2).sum())
+    return stats